@@ -0,0 +1,268 @@
+"""
+可复现的性能基准测试。
+
+在临时工作目录中生成合成素材 (或链接 --assets 指定的真实素材)，
+每个用例在独立子进程中运行:
+    cold  每次采样都是全新进程且缓存目录为空，只计时渲染调用本身 (不含 import)
+    warm  同一进程先预热，再连续计时
+结果 (吞吐量、p50/p99 延迟、峰值RSS) 以 JSON 输出，便于跨提交比较。
+
+用法: python -m benchmarks.bench [-o result.json] [--cases cell panel ...]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from benchmarks import fixtures
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = ("cell", "panel", "rating_number", "outline_text", "b50")
+
+# 工作目录中链接到仓库的目录
+WORKSPACE_LINKS = ("modules", "benchmarks", "layouts", "output", "psd_analyzer")
+
+
+# --- 用例 (在子进程中执行) ---
+
+def _cell_inputs():
+    from modules.selection import select_b50
+    old_cells, new_cells = select_b50(fixtures.make_records())
+    return old_cells + new_cells
+
+
+def build_case(name):
+    """
+    :return: (inputs, call)，call(input) 为一次被计时的调用
+    """
+    if name == "cell":
+        from modules.song_cell import generate_song_cell
+        return _cell_inputs(), lambda params: generate_song_cell(**params)
+    if name == "panel":
+        from modules.top_panel import create_panel_image
+        player = fixtures.make_player()
+        ratings = [12000 + i * 97 for i in range(20)]
+        return ratings, lambda rating: create_panel_image(rating=rating, output_filename=None, **player)
+    if name == "rating_number":
+        from modules.top_panel import draw_rating_number_img
+        return [10000 + i * 37 for i in range(100)], draw_rating_number_img
+    if name == "outline_text":
+        from modules.top_panel import draw_text_with_outline_img, PANEL_FONT_NAME
+        font_path = os.path.join('assets', 'fonts', PANEL_FONT_NAME)
+        texts = [f"CREDIT(S) {i}" for i in range(50)]
+        return texts, lambda text: draw_text_with_outline_img(text, font_path, 22, outline_width=2)
+    if name == "b50":
+        from modules.b50 import generate_b50
+        player = fixtures.make_player()
+        records = fixtures.make_records()
+        return [records], lambda recs: generate_b50(player, recs)
+    raise ValueError(f"未知的用例: {name}")
+
+
+def peak_rss():
+    """当前进程的峰值RSS (字节)，不支持的平台返回 None"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def run_child(name, mode, iterations, trace=False):
+    """子进程入口: 运行用例并返回计时样本 (秒)，trace 时附带各阶段统计"""
+    from modules.tracing import tracer
+    # 渲染过程中的提示输出转到标准错误，标准输出只留给结果
+    with contextlib.redirect_stdout(sys.stderr):
+        inputs, call = build_case(name)
+        if mode == "warm":
+            for item in inputs:
+                call(item)
+        if trace:
+            tracer.enable()
+        samples = []
+        for i in range(iterations):
+            item = inputs[i % len(inputs)]
+            start = time.perf_counter()
+            call(item)
+            samples.append(time.perf_counter() - start)
+    result = {"samples": samples, "peak_rss": peak_rss()}
+    if trace:
+        result["stages"] = tracer.snapshot()
+    return result
+
+
+# --- 统计与调度 (在父进程中执行) ---
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def summarize(samples, rss_values):
+    ordered = sorted(samples)
+    total = sum(ordered)
+    rss_values = [v for v in rss_values if v is not None]
+    return {
+        "iterations": len(ordered),
+        "throughput": len(ordered) / total if total else 0.0,
+        "mean_ms": total / len(ordered) * 1000 if ordered else 0.0,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "min_ms": ordered[0] * 1000 if ordered else 0.0,
+        "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+        "peak_rss_bytes": max(rss_values) if rss_values else None,
+    }
+
+
+def prepare_workspace(workspace, assets=None, font=None):
+    """
+    建立临时工作目录: 代码 (modules/benchmarks) 与版面数据 (layouts 及其引用的分析结果)
+    指向仓库 (符号链接，不支持时复制)，assets 为合成素材或指向 assets 参数的链接。
+    各模块按 __file__ 与当前目录定位 assets/ 与 cache/，因此全部落在工作目录内。
+    """
+    for name in WORKSPACE_LINKS:
+        src, dst = os.path.join(REPO_ROOT, name), os.path.join(workspace, name)
+        try:
+            os.symlink(src, dst, target_is_directory=True)
+        except (OSError, NotImplementedError):
+            shutil.copytree(src, dst, ignore=shutil.ignore_patterns('__pycache__'))
+    assets_dir = os.path.join(workspace, 'assets')
+    if assets:
+        os.symlink(os.path.abspath(assets), assets_dir, target_is_directory=True)
+    else:
+        fixtures.make_assets(assets_dir, font)
+
+
+def spawn(workspace, name, mode, iterations, verbose=False, trace=False):
+    env = dict(os.environ, PYTHONPATH=workspace, PYTHONHASHSEED='0')
+    env.pop('B50_TRACE', None)
+    proc = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench', '--child', name, '--mode', mode,
+         '--iterations', str(iterations)] + (['--trace'] if trace else []),
+        cwd=workspace, env=env, stdout=subprocess.PIPE,
+        stderr=None if verbose else subprocess.DEVNULL, check=True,
+    )
+    return json.loads(proc.stdout)
+
+
+def run_case(workspace, name, iterations, cold_iterations, verbose=False, trace=False):
+    cache_dir = os.path.join(workspace, 'cache')
+    cold_samples, cold_rss, cold_stages = [], [], []
+    for _ in range(cold_iterations):
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        result = spawn(workspace, name, "cold", 1, verbose, trace)
+        cold_samples += result["samples"]
+        cold_rss.append(result["peak_rss"])
+        cold_stages.append(result.get("stages"))
+    # warm 用例同样从空的磁盘缓存开始，预热阶段负责填充
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    warm = spawn(workspace, name, "warm", iterations, verbose, trace)
+    summary = {
+        "cold": summarize(cold_samples, cold_rss),
+        "warm": summarize(warm["samples"], [warm["peak_rss"]]),
+    }
+    if trace:
+        # cold 模式各阶段只取最后一个进程的统计
+        summary["cold"]["stages"] = cold_stages[-1] if cold_stages else {}
+        summary["warm"]["stages"] = warm.get("stages", {})
+    return summary
+
+
+def environment():
+    import PIL
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, check=True, text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_benchmarks(cases=CASES, iterations=50, cold_iterations=5, assets=None, font=None,
+                   keep=False, verbose=False, trace=False):
+    """
+    运行基准测试。
+    :param cases: 要运行的用例名
+    :param iterations: warm 模式的计时次数
+    :param cold_iterations: cold 模式的采样次数 (每次一个新进程)
+    :param assets: 可选，真实素材目录；默认使用合成素材
+    :param font: 合成素材使用的替代字体
+    :param keep: 是否保留临时工作目录
+    :param trace: 是否附带各渲染阶段的统计 (modules.tracing)
+    :return: 结果字典
+    """
+    workspace = tempfile.mkdtemp(prefix='b50-bench-')
+    try:
+        prepare_workspace(workspace, assets, font)
+        results = {}
+        for name in cases:
+            results[name] = run_case(workspace, name, iterations, cold_iterations, verbose, trace)
+            print(f"{name}: cold p50 {results[name]['cold']['p50_ms']:.2f}ms, "
+                  f"warm p50 {results[name]['warm']['p50_ms']:.2f}ms", file=sys.stderr)
+    finally:
+        if keep:
+            print(f"工作目录已保留: {workspace}", file=sys.stderr)
+        else:
+            shutil.rmtree(workspace, ignore_errors=True)
+    return {
+        "environment": environment(),
+        "assets": "real" if assets else "synthetic",
+        "config": {"iterations": iterations, "cold_iterations": cold_iterations},
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='B50 图片生成器性能基准测试')
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=list(CASES), help='要运行的用例')
+    parser.add_argument('--iterations', '-n', type=int, default=50, help='warm 模式计时次数')
+    parser.add_argument('--cold-iterations', type=int, default=5, help='cold 模式采样次数 (每次一个新进程)')
+    parser.add_argument('--assets', default=None, help='使用真实素材目录代替合成素材')
+    parser.add_argument('--font', default=None, help='合成素材使用的替代字体 (默认自动查找系统字体)')
+    parser.add_argument('--output', '-o', default=None, help='结果JSON输出路径，默认为标准输出')
+    parser.add_argument('--keep', action='store_true', help='保留临时工作目录')
+    parser.add_argument('--verbose', '-v', action='store_true', help='显示子进程的输出')
+    parser.add_argument('--trace', action='store_true', help='附带各渲染阶段的耗时统计')
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--mode', default='warm', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.mode, args.iterations, args.trace)))
+        return
+
+    result = run_benchmarks(args.cases, args.iterations, args.cold_iterations,
+                            args.assets, args.font, args.keep, args.verbose, args.trace)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
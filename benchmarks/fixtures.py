@@ -0,0 +1,181 @@
+"""
+基准测试用的合成素材。
+
+真实素材 (曲绘、字体、UI贴图) 不在仓库中，这里按代码期望的文件名与尺寸生成
+随机图形的替代品，使基准测试可以在任何环境 (包括CI) 中运行。
+字体无法合成，需要提供任意一个 TrueType/OpenType 字体文件作为替代。
+"""
+import os
+import sys
+import random
+import shutil
+import argparse
+from PIL import Image, ImageDraw
+
+# 面板用的 frame / nameplate / icon ID
+FRAME_ID = 250401
+NAMEPLATE_ID = 400401
+ICON_ID = 400401
+
+# 合成曲绘的 cover_id
+COVER_IDS = (11, 22, 33, 44, 55, 66, 77, 88, 1394)
+JACKET_SIZE = (400, 400)
+
+# 代码用到的字体文件名 (song_cell.FONT_FACES 与 top_panel.PANEL_FONT_NAME)
+FONT_NAMES = ('combined.ttf', 'Torus-SemiBold.otf', 'SEGAMaruGothicDB.ttf')
+
+# 常见的系统字体位置，未指定 --font 时依次查找
+FONT_CANDIDATES = (
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/TTF/DejaVuSans.ttf',
+    '/Library/Fonts/Arial.ttf',
+    '/System/Library/Fonts/Supplemental/Arial.ttf',
+    'C:\\Windows\\Fonts\\arial.ttf',
+)
+
+RANK_NAMES = ('D', 'C', 'B', 'BB', 'BBB', 'A', 'AA', 'AAA', 'S', 'Sp', 'SS', 'SSp', 'SSS', 'SSSp')
+
+
+def asset_specs():
+    """
+    :return: {文件名: (宽, 高)}，尺寸取自 psd_analyzer/output.json、output/song_cell.json
+             及代码中的缩放参数 (段位、段位认证板、头像为2倍原图)
+    """
+    specs = {
+        'UI_TST_Infoicon_DeluxeMode.png': (106, 26),
+        'UI_TST_Infoicon_StandardMode.png': (106, 26),
+        'UI_MSS_MBase_Icon_Blank.png': (65, 65),
+        'UI_CMN_SubBG_Game.png': (1080, 452),
+        f'UI_Frame_{FRAME_ID}.png': (1080, 452),
+        f'UI_Plate_{NAMEPLATE_ID}.png': (720, 116),
+        f'UI_Icon_{ICON_ID}.png': (200, 200),
+        'NameBackground.png': (270, 42),
+        'On.png': (40, 40),
+    }
+    for name in RANK_NAMES:
+        specs[f'UI_GAM_Rank_{name}.png'] = (137, 54)
+    for name in ('FC', 'AP', 'FS', 'FSD', 'SP'):
+        specs[f'UI_MSS_MBase_Icon_{name}.png'] = (65, 65)
+    for name in ('FCp', 'APp', 'FSp', 'FSDp'):
+        specs[f'UI_MSS_MBase_Icon_{name}.png'] = (70, 65)
+    for i in range(1, 12):
+        specs[f'UI_CMN_DXRating_S_{i:02d}.png'] = (173, 36)
+    for i in range(26):
+        specs[f'UI_CMN_Class_S_{i:02d}.png'] = (216, 130)
+    for i in range(24):
+        specs[f'UI_CMN_DaniPlate_{i:02d}.png'] = (178, 82)
+    for name in ('Normal', 'Silver', 'Bronze', 'Gold', 'Rainbow'):
+        specs[f'UI_CMN_Shougou_{name}.png'] = (272, 26)
+    return specs
+
+
+def find_font():
+    """查找可用作替代的系统字体，找不到时返回 None"""
+    for path in FONT_CANDIDATES:
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def random_image(size, seed, background=None):
+    """生成由随机半透明椭圆组成的图片，种子相同则结果相同"""
+    rng = random.Random(seed)
+    img = Image.new('RGBA', size, background or (0, 0, 0, 0))
+    layer = Image.new('RGBA', size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(layer)
+    for _ in range(12):
+        x0, y0 = rng.randrange(size[0]), rng.randrange(size[1])
+        x1, y1 = x0 + rng.randrange(1, size[0] + 1), y0 + rng.randrange(1, size[1] + 1)
+        color = (rng.randrange(256), rng.randrange(256), rng.randrange(256), rng.randrange(120, 256))
+        draw.ellipse([x0, y0, x1, y1], fill=color)
+    return Image.alpha_composite(img, layer)
+
+
+def digit_atlas():
+    """生成 UI_CMN_Num_26p.png 的替代品: 4列3行、每格34x40的数字表"""
+    img = Image.new('RGBA', (136, 120), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    for digit in range(10):
+        cx, cy = digit % 4, digit // 4
+        draw.rectangle([cx * 34 + 5, cy * 40 + 5, cx * 34 + 28, cy * 40 + 34],
+                       outline=(255, 255, 255, 180), width=3)
+        draw.text((cx * 34 + 13, cy * 40 + 14), str(digit), fill=(255, 255, 255, 255))
+    return img
+
+
+def make_assets(root, font=None):
+    """
+    在 root 下生成完整的合成素材目录 (root/jackets、root/fonts)。
+    :param root: 素材目录，对应项目中的 assets/
+    :param font: 替代字体路径，None 时自动查找系统字体
+    :raises FileNotFoundError: 找不到可用字体时
+    """
+    font = font or find_font()
+    if not font or not os.path.isfile(font):
+        raise FileNotFoundError("找不到可用的替代字体，请通过 --font 指定任意 .ttf/.otf 文件")
+
+    os.makedirs(os.path.join(root, 'jackets'), exist_ok=True)
+    os.makedirs(os.path.join(root, 'fonts'), exist_ok=True)
+    for seed, (name, size) in enumerate(sorted(asset_specs().items())):
+        random_image(size, seed).save(os.path.join(root, name))
+    digit_atlas().save(os.path.join(root, 'UI_CMN_Num_26p.png'))
+    for cover_id in COVER_IDS:
+        jacket = random_image(JACKET_SIZE, cover_id, background=(40, 60, cover_id % 256, 255))
+        jacket.save(os.path.join(root, 'jackets', f'UI_Jacket_{cover_id:06d}.png'))
+    for name in FONT_NAMES:
+        shutil.copyfile(font, os.path.join(root, 'fonts', name))
+    return root
+
+
+def make_player():
+    """create_panel_image 参数 (不含 rating)"""
+    return {
+        "frame_id": FRAME_ID,
+        "nameplate_id": NAMEPLATE_ID,
+        "shougou_type": 3,
+        "class_id": 25,
+        "dani_id": 23,
+        "icon_id": ICON_ID,
+        "name": "PLAYER",
+        "shougou_text": "Benchmark",
+        "version_text": "Ver.DX1.55-E",
+    }
+
+
+def make_records(count=120, seed=1):
+    """生成 count 条随机成绩，约四分之一为新版本曲目"""
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        records.append({
+            "cover_id": str(rng.choice(COVER_IDS)),
+            "difficulty": rng.randrange(5),
+            "is_dx": rng.randrange(2),
+            "song_title": f"Synthetic Song {i}",
+            "achievement": rng.randint(950000, 1010000),
+            "dx_score": rng.randint(1000, 2000),
+            "dx_total": 2000,
+            "base": round(rng.uniform(10.0, 15.0), 1),
+            "fc_indicator": rng.randrange(5),
+            "fs_indicator": rng.randrange(6),
+            "is_new": i % 4 == 0,
+        })
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成基准测试用的合成素材')
+    parser.add_argument('output', help='输出的素材目录')
+    parser.add_argument('--font', default=None, help='替代字体路径 (默认自动查找系统字体)')
+    args = parser.parse_args()
+    try:
+        make_assets(args.output, args.font)
+    except FileNotFoundError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    print(f"合成素材已生成到: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+import os
+import sys
+import json
+import argparse
+
+from modules.b50 import generate_b50
+from modules.encoder import ENCODE_PRESETS
+from modules.quality import QUALITY_TIERS, DEFAULT_QUALITY
+from modules.layout import check_scale
+from modules.diagnostics import configure_logging, missing_assets
+
+
+def report_missing_assets():
+    """输出本进程内缺失素材的汇总 (进程池工作进程中的缺失已由各自的日志报告)"""
+    summary = missing_assets.summary()
+    if summary:
+        print(f"缺失素材 {len(summary)} 种，共 {sum(summary.values())} 次:", file=sys.stderr)
+        for asset, count in summary.items():
+            print(f"  {count:>5}  {asset}", file=sys.stderr)
+
+
+def scale_arg(value):
+    """argparse 类型: 缩放比例，超出允许范围时给出用法错误"""
+    try:
+        return check_scale(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def encode_options(args):
+    """由命令行参数得到编码参数"""
+    return {
+        "preset": args.preset,
+        "quality": args.quality,
+        "compress_level": args.compress_level,
+        "quantize": args.quantize,
+    }
+
+
+def add_encode_arguments(parser):
+    parser.add_argument('--preset', choices=list(ENCODE_PRESETS), default=None,
+                        help='编码预设 (默认按输出文件扩展名选择格式)')
+    parser.add_argument('--quality', type=int, default=None, help='WebP/JPEG 质量 (1-100)')
+    parser.add_argument('--compress-level', type=int, default=None, help='PNG 压缩级别 (0-9)，越低越快')
+    parser.add_argument('--quantize', type=int, default=None, help='PNG 调色板颜色数 (2-256)')
+
+
+def cmd_b50(args):
+    """根据JSON输入生成完整B50图片"""
+    with open(args.input, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if args.trace or args.trace_alloc:
+        from modules.tracing import tracer
+        tracer.enable(allocations=args.trace_alloc)
+    generate_b50(
+        data["player"],
+        data["records"],
+        jobs=args.jobs,
+        output_filename=args.output,
+        encode=encode_options(args),
+        quality=args.render_quality,
+        scale=args.scale,
+    )
+    print(f"B50图片已保存到: {args.output}")
+    report_missing_assets()
+    if args.trace or args.trace_alloc:
+        # 进程池中工作进程的阶段 (单元格、面板) 不在此统计内，需要时使用 -j 1
+        tracer.report()
+
+
+def cmd_batch(args):
+    """流式批量渲染JSONL任务，每个任务输出一行JSON结果"""
+    from modules.batch import run_batch
+
+    source = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8')
+    sink = sys.stdout if args.results == '-' else open(args.results, 'w', encoding='utf-8')
+    failed = 0
+    try:
+        for result in run_batch(
+            source,
+            jobs=args.jobs,
+            output_dir=args.output_dir,
+            ordered=not args.unordered,
+            max_in_flight=args.max_in_flight,
+            encode=encode_options(args),
+            max_jobs_per_worker=args.max_jobs_per_worker,
+        ):
+            if result["status"] != "ok":
+                failed += 1
+            sink.write(json.dumps(result, ensure_ascii=False) + '\n')
+            sink.flush()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+    report_missing_assets()
+    if failed:
+        sys.exit(1)
+
+
+def cmd_serve(args):
+    """启动本地HTTP渲染服务"""
+    from modules.render_service import run_service
+
+    run_service(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        max_pending=args.max_pending,
+        timeout=args.timeout,
+        max_jobs_per_worker=args.max_jobs_per_worker,
+    )
+
+
+def cmd_loadtest(args):
+    """对渲染服务进行压测"""
+    from modules.render_client import load_test
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        params = json.load(f)
+    result = load_test(
+        args.type,
+        params,
+        requests=args.requests,
+        concurrency=args.concurrency,
+        host=args.host,
+        port=args.port,
+    )
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+def cmd_layout(args):
+    """编译渲染计划并输出 (同时写入计划缓存)"""
+    from modules.layout import get_plan
+
+    plan = get_plan(args.name)
+    text = json.dumps(plan.plan, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+def cmd_atlas(args):
+    """将单元格与面板用到的小图标按版面尺寸预缩放，打包为图集"""
+    from modules import song_cell, top_panel
+    from modules.sprite_atlas import build_atlas, DEFAULT_ATLAS_PATH
+
+    scales = [1] + [scale for scale in args.scales if scale != 1]
+    sprites = song_cell.atlas_sprites(scales) + top_panel.atlas_sprites(scales)
+    result = build_atlas(sprites, args.output or DEFAULT_ATLAS_PATH)
+    print(f"图集已生成: {result['sprites']} 个图标，{result['sources']} 个源文件")
+    if result["missing"]:
+        print(f"缺失素材 {len(result['missing'])} 个: {', '.join(result['missing'])}", file=sys.stderr)
+
+
+def cmd_jackets(args):
+    """生成或增量更新预缩放封面包"""
+    from modules.jacket_pack import build_jacket_pack, pack_path, pack_width, DEFAULT_PACK_PATH
+
+    scales = [1] + [scale for scale in args.scales if scale != 1]
+    for width in dict.fromkeys(pack_width(scale) for scale in scales):
+        path = pack_path(width, args.output or DEFAULT_PACK_PATH)
+        result = build_jacket_pack(args.jackets_dir, path, width, full=args.full)
+        print(f"封面包已生成 ({width}px): 共 {result['total']} 张 (新增 {result['added']}，更新 {result['updated']}，"
+              f"复用 {result['reused']}，移除 {result['removed']}，失败 {result['failed']}) -> {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='maimai B50 图片生成器')
+    parser.add_argument('--log-level', default=None,
+                        help='日志级别 (DEBUG/INFO/WARNING/ERROR)，默认 WARNING，serve 默认 INFO')
+    parser.add_argument('--log-json', action='store_true', help='日志每行输出一条JSON')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    b50_parser = subparsers.add_parser('b50', help='生成完整B50图片')
+    b50_parser.add_argument('input', help='输入JSON文件: {"player": {...}, "records": [...]}')
+    b50_parser.add_argument('--output', '-o', default=os.path.join('output', 'b50.png'), help='输出图片路径')
+    b50_parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, help='并行进程数')
+    b50_parser.add_argument('--render-quality', choices=list(QUALITY_TIERS), default=DEFAULT_QUALITY,
+                            help='渲染质量档位: full 为原画质，fast/draft 使用更快的缩放与近似模糊 (用于预览)')
+    b50_parser.add_argument('--scale', type=scale_arg, default=1.0,
+                            help='缩放比例 (0.25 到 2)，例如 0.5、0.25: 直接以目标分辨率渲染缩略图')
+    add_encode_arguments(b50_parser)
+    b50_parser.add_argument('--trace', action='store_true', help='输出各渲染阶段耗时 (建议配合 -j 1)')
+    b50_parser.add_argument('--trace-alloc', action='store_true', help='同 --trace，并统计各阶段的 Python 堆分配峰值 (tracemalloc，不含 Pillow 像素缓冲区)')
+    b50_parser.set_defaults(func=cmd_b50)
+
+    batch_parser = subparsers.add_parser('batch', help='流式批量渲染JSONL任务')
+    batch_parser.add_argument('input', help='JSONL任务文件，"-" 表示标准输入。每行: {"id": ..., "type": "cell|panel|b50", "params": {...}, "output": ...}')
+    batch_parser.add_argument('--results', '-r', default='-', help='结果JSONL输出路径，默认为标准输出')
+    batch_parser.add_argument('--output-dir', '-o', default='output', help='任务未指定 output 时的图片输出目录')
+    batch_parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1, help='并行进程数')
+    batch_parser.add_argument('--max-in-flight', type=int, default=None, help='同时提交的任务上限 (默认: 并行进程数*2)')
+    batch_parser.add_argument('--unordered', action='store_true', help='按完成顺序输出结果 (默认按输入顺序)')
+    batch_parser.add_argument('--max-jobs-per-worker', type=int, default=None,
+                              help='每个工作进程执行多少个任务后替换为新进程 (默认不替换)')
+    add_encode_arguments(batch_parser)
+    batch_parser.set_defaults(func=cmd_batch)
+
+    serve_parser = subparsers.add_parser('serve', help='启动本地HTTP渲染服务')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    serve_parser.add_argument('--port', type=int, default=8050, help='监听端口')
+    serve_parser.add_argument('--workers', '-w', type=int, default=os.cpu_count() or 1, help='工作进程数')
+    serve_parser.add_argument('--max-pending', type=int, default=None, help='同时处理的请求上限 (默认: 工作进程数*4)')
+    serve_parser.add_argument('--timeout', type=float, default=30.0, help='单个请求超时 (秒)')
+    serve_parser.add_argument('--max-jobs-per-worker', type=int, default=None,
+                              help='每个工作进程执行多少个任务后替换为新进程 (默认不替换)')
+    serve_parser.set_defaults(func=cmd_serve)
+
+    load_parser = subparsers.add_parser('loadtest', help='对渲染服务进行压测')
+    load_parser.add_argument('type', choices=['cell', 'panel', 'b50'], help='任务类型')
+    load_parser.add_argument('input', help='请求参数JSON文件')
+    load_parser.add_argument('--host', default='127.0.0.1', help='服务地址')
+    load_parser.add_argument('--port', type=int, default=8050, help='服务端口')
+    load_parser.add_argument('--requests', '-n', type=int, default=100, help='请求总数')
+    load_parser.add_argument('--concurrency', '-c', type=int, default=8, help='并发数')
+    load_parser.set_defaults(func=cmd_loadtest)
+
+    layout_parser = subparsers.add_parser('layout', help='编译并输出渲染计划 (layouts/<name>.json)')
+    layout_parser.add_argument('name', help='版面名，例如 song_cell、top_panel')
+    layout_parser.add_argument('--output', '-o', default=None, help='计划JSON输出路径，默认为标准输出')
+    layout_parser.set_defaults(func=cmd_layout)
+
+    atlas_parser = subparsers.add_parser('atlas', help='生成预缩放小图标图集 (素材更新后重新执行)')
+    atlas_parser.add_argument('--output', '-o', default=None, help='图集输出路径 (默认 cache/sprites.atlas)')
+    atlas_parser.add_argument('--scales', type=scale_arg, nargs='*', default=[],
+                              help='同时打包的缩略图缩放比例，例如 0.5 0.25 (原尺寸总是包含)')
+    atlas_parser.set_defaults(func=cmd_atlas)
+
+    jackets_parser = subparsers.add_parser('jackets', help='生成预缩放封面包 (增量，游戏更新后重新执行)')
+    jackets_parser.add_argument('--jackets-dir', default=os.path.join('assets', 'jackets'), help='原始封面目录')
+    jackets_parser.add_argument('--output', '-o', default=None, help='封面包路径 (默认 cache/jackets.pack)')
+    jackets_parser.add_argument('--full', action='store_true', help='忽略已有封面包，全部重新生成')
+    jackets_parser.add_argument('--scales', type=scale_arg, nargs='*', default=[],
+                                help='同时生成的缩略图缩放比例的封面包，例如 0.5 0.25 (原尺寸总是包含)')
+    jackets_parser.set_defaults(func=cmd_jackets)
+
+    args = parser.parse_args()
+    configure_logging(args.log_level or ('INFO' if args.command == 'serve' else 'WARNING'), args.log_json)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+# 默认内存上限 (字节)，按 RGBA 每像素 4 字节估算
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def _source_stamp(path):
+    """:raises FileNotFoundError: 文件不存在时"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _image_nbytes(img):
+    """估算解码后图片占用的内存字节数"""
+    return img.width * img.height * len(img.getbands())
+
+
+class AssetCache:
+    """
+    进程内共享的素材解码缓存。
+
+    以 (素材路径, 源文件修改时间与大小, 目标尺寸, 重采样滤镜) 为键缓存已 convert('RGBA') 并缩放好的图片，
+    超过内存上限时按 LRU 淘汰。返回的图片为共享对象，调用方不可原地修改
+    (paste 到其他画布上是安全的)。
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, sizeof=_image_nbytes, check_interval=2.0):
+        """
+        :param max_bytes: 内存上限
+        :param sizeof: 条目大小的估算函数，默认按解码后的图片计算；
+                       缓存非图片对象时可传入 lambda _: 1，此时 max_bytes 即条目数上限
+        :param check_interval: get() 对同一素材两次 os.stat 之间的最小间隔 (秒)，
+                               间隔内沿用上次的修改时间与大小；None 表示每个进程只检查一次
+        """
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._stamps = {}
+        self._lock = threading.RLock()
+
+    def get_or_load(self, key, loader):
+        """
+        按键查找缓存，未命中时调用 loader() 生成图片并放入缓存。
+        :param key: 可哈希的缓存键
+        :param loader: 无参函数，返回 PIL.Image
+        :return: PIL.Image
+        """
+        with self._lock:
+            img = self._lookup(key)
+            if img is not None:
+                self.hits += 1
+                return img
+            self.misses += 1
+        # 解码放在锁外，避免阻塞其他线程的命中
+        return self._store(key, loader())
+
+    def get(self, path, size=None, resample=Image.Resampling.LANCZOS):
+        """
+        获取解码后的 RGBA 素材，可选缩放到指定尺寸。
+        键中包含源文件的修改时间与大小 (每个素材至多每 check_interval 秒检查一次)，
+        素材被替换后自动重新解码 (旧条目按 LRU 自然淘汰)。每次调用只计一次命中或未命中。
+        :param path: 素材文件路径
+        :param size: (w, h) 目标尺寸，None 表示原始尺寸
+        :param resample: 缩放使用的重采样滤镜
+        :return: PIL.Image (共享对象，只读使用)
+        :raises FileNotFoundError: 素材不存在时
+        """
+        stamp = self._source_stamp(path)
+        original_key = (path, stamp, None, None)
+        key = original_key
+        if size is not None:
+            size = (int(size[0]), int(size[1]))
+            key = (path, stamp, size, int(resample))
+        with self._lock:
+            img = self._lookup(key)
+            original = img if key is original_key else self._lookup(original_key)
+            # 与原图尺寸相同时直接使用原图条目，不重复计入内存
+            if img is None and original is not None and original.size == size:
+                img = original
+            if img is not None:
+                self.hits += 1
+                return img
+            self.misses += 1
+        if original is None:
+            original = self._store(original_key, self._decode(path))
+        if key is original_key or original.size == size:
+            return original
+        return self._store(key, original.resize(size, resample))
+
+    def warm_up(self, specs):
+        """
+        预热缓存。
+        :param specs: 可迭代对象，元素为 path 或 (path, size) 或 (path, size, resample)
+        :return: 成功加载的数量
+        """
+        loaded = 0
+        for spec in specs:
+            if isinstance(spec, str):
+                spec = (spec,)
+            try:
+                self.get(*spec)
+                loaded += 1
+            except FileNotFoundError:
+                continue
+        return loaded
+
+    def set_max_bytes(self, max_bytes):
+        """调整内存上限，立即按新上限淘汰"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stamps.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """返回命中/未命中等统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def _lookup(self, key):
+        """查找条目并刷新 LRU 顺序，不计入命中统计 (调用方持有锁)"""
+        img = self._entries.get(key)
+        if img is not None:
+            self._entries.move_to_end(key)
+        return img
+
+    def _store(self, key, img):
+        """放入条目；其他线程已先放入同一键时返回已有的条目"""
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = img
+                self.current_bytes += self.sizeof(img)
+                self._evict()
+            return self._entries.get(key, img)
+
+    def _source_stamp(self, path):
+        """按 check_interval 节流的 _source_stamp"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._stamps.get(path)
+        if cached is not None and (self.check_interval is None or now - cached[1] < self.check_interval):
+            return cached[0]
+        try:
+            stamp = _source_stamp(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._stamps.pop(path, None)
+            raise
+        with self._lock:
+            self._stamps[path] = (stamp, now)
+        return stamp
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, img = self._entries.popitem(last=False)
+            self.current_bytes -= self.sizeof(img)
+            self.evictions += 1
+
+    @staticmethod
+    def _decode(path):
+        with Image.open(path) as img:
+            return img.convert('RGBA')
+
+
+# 进程级共享实例，song_cell 与 top_panel 共用
+asset_cache = AssetCache()
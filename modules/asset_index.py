@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import threading
+from PIL import Image
+
+# 清单文件格式版本
+MANIFEST_VERSION = 1
+
+
+class AssetIndex:
+    """
+    assets 目录的文件名索引。
+
+    只在首次使用 (或目录发生变化) 时遍历一次目录树，建立 文件名 -> 路径 的映射，
+    并按需缓存图片元数据 (尺寸、模式、mtime)。索引可持久化为清单文件，
+    下次启动时若各目录 mtime 未变则直接加载，无需再次遍历。
+    """
+
+    def __init__(self, root, manifest_path=None, check_interval=2.0):
+        """
+        :param root: assets 根目录
+        :param manifest_path: 清单文件路径，默认为 root 同级的 .<目录名>_manifest.json
+                              (放在 root 之外，写入时不会改变被索引目录的 mtime)；传 False 表示不持久化
+        :param check_interval: 两次检查目录 mtime 之间的最小间隔 (秒)
+        """
+        self.root = os.path.abspath(root)
+        if manifest_path is None:
+            manifest_path = os.path.join(
+                os.path.dirname(self.root), f'.{os.path.basename(self.root)}_manifest.json'
+            )
+        self.manifest_path = manifest_path
+        self.check_interval = check_interval
+        self.scans = 0
+        self._files = {}
+        self._dirs = {}
+        self._meta = {}
+        self._last_check = 0.0
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    # --- 查询 ---
+
+    def find(self, asset_name):
+        """
+        按文件名查找素材。
+        :return: 完整路径，未找到时返回 None
+        """
+        self._ensure_fresh()
+        return self._files.get(asset_name)
+
+    def metadata(self, asset_name):
+        """
+        返回素材元数据 {"path", "width", "height", "mode", "mtime"}，文件被修改后自动重新读取。
+        未找到时返回 None。
+        """
+        path = self.find(asset_name)
+        if path is None:
+            return None
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            meta = self._meta.get(asset_name)
+            if meta is not None and meta["mtime"] == mtime and meta["path"] == path:
+                return meta
+        # 只读取文件头，不解码像素
+        with Image.open(path) as img:
+            width, height = img.size
+            mode = img.mode
+        meta = {"path": path, "width": width, "height": height, "mode": mode, "mtime": mtime}
+        with self._lock:
+            self._meta[asset_name] = meta
+        return meta
+
+    def names(self):
+        self._ensure_fresh()
+        return list(self._files)
+
+    # --- 构建与失效 ---
+
+    def refresh(self, force=False):
+        """
+        检查目录 mtime，发生变化 (或 force=True) 时重新扫描。
+        :return: 是否重新扫描
+        """
+        with self._lock:
+            self._last_check = time.monotonic()
+            if not force and self._loaded and not self._dirs_changed():
+                return False
+            self._scan()
+            return True
+
+    def save_manifest(self):
+        """将索引写入清单文件，目录不可写时静默跳过"""
+        if not self.manifest_path:
+            return False
+        with self._lock:
+            data = {
+                "version": MANIFEST_VERSION,
+                "root": self.root,
+                "dirs": {self._rel(d): m for d, m in self._dirs.items()},
+                "files": {n: self._rel(p) for n, p in self._files.items()},
+                "meta": {
+                    n: dict(m, path=self._rel(m["path"])) for n, m in self._meta.items()
+                },
+            }
+            tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.manifest_path)
+            except OSError:
+                return False
+            return True
+
+    def load_manifest(self):
+        """
+        从清单文件加载索引，清单记录的目录 mtime 与当前一致时才采用。
+        :return: 是否成功加载
+        """
+        if not self.manifest_path or not os.path.exists(self.manifest_path):
+            return False
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != MANIFEST_VERSION:
+            return False
+        with self._lock:
+            self._dirs = {self._abs(d): m for d, m in data.get("dirs", {}).items()}
+            if self._dirs_changed():
+                self._dirs = {}
+                return False
+            self._files = {n: self._abs(p) for n, p in data.get("files", {}).items()}
+            self._meta = {
+                n: dict(m, path=self._abs(m["path"])) for n, m in data.get("meta", {}).items()
+            }
+            self._loaded = True
+            self._last_check = time.monotonic()
+            return True
+
+    def _ensure_fresh(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded and not self.load_manifest():
+                    self._scan()
+            return
+        if time.monotonic() - self._last_check >= self.check_interval:
+            self.refresh()
+
+    def _scan(self):
+        files = {}
+        dirs = {}
+        for root, subdirs, filenames in os.walk(self.root):
+            subdirs.sort()
+            try:
+                dirs[root] = os.stat(root).st_mtime_ns
+            except OSError:
+                continue
+            for name in filenames:
+                # 与原 find_asset 一致: 同名文件取遍历顺序中的第一个
+                files.setdefault(name, os.path.join(root, name))
+        self._files = files
+        self._dirs = dirs
+        # 保留路径未变的元数据，mtime 在 metadata() 中再校验
+        self._meta = {n: m for n, m in self._meta.items() if files.get(n) == m["path"]}
+        self._loaded = True
+        self._last_check = time.monotonic()
+        self.scans += 1
+        self.save_manifest()
+
+    def _dirs_changed(self):
+        if not self._dirs:
+            return True
+        for path, mtime in self._dirs.items():
+            try:
+                if os.stat(path).st_mtime_ns != mtime:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def _rel(self, path):
+        return os.path.relpath(path, self.root)
+
+    def _abs(self, path):
+        return os.path.normpath(os.path.join(self.root, path))
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_asset_index(root):
+    """获取指定 assets 根目录对应的进程级共享索引"""
+    key = os.path.abspath(root)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = AssetIndex(key)
+        return index
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='生成 assets 清单文件')
+    parser.add_argument('assets_dir', nargs='?', default='assets', help='assets 目录 (默认: assets)')
+    parser.add_argument('--metadata', action='store_true', help='同时读取所有图片的尺寸与模式')
+    args = parser.parse_args()
+
+    index = AssetIndex(args.assets_dir)
+    index.refresh(force=True)
+    if args.metadata:
+        for name in index.names():
+            try:
+                index.metadata(name)
+            except Exception:
+                continue
+    index.save_manifest()
+    print(f"已索引 {len(index.names())} 个文件: {index.manifest_path}")
+
+
+if __name__ == '__main__':
+    main()
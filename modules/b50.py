@@ -0,0 +1,254 @@
+from PIL import Image
+
+from modules.song_cell import calculate_rating, CANVAS_WIDTH, CANVAS_HEIGHT
+from modules.top_panel import create_panel_image
+from modules.render_cache import cell_cache
+from modules.encoder import save_image
+from modules.tracing import tracer
+from modules.worker_pool import create_executor
+from modules.quality import DEFAULT_QUALITY, check_quality
+from modules.layout import get_plan, check_scale
+from modules.selection import OLD_SECTION_SIZE, NEW_SECTION_SIZE, CELL_FIELDS, select_b50
+
+# --- 常量 ---
+
+# 版面 (单位: 像素)
+COLUMNS = 5
+MARGIN = 24
+CELL_GAP = 12
+SECTION_GAP = 36
+PANEL_WIDTH = 1080
+PANEL_HEIGHT = 452
+BACKGROUND_COLOR = (24, 24, 32, 255)
+
+# create_panel_image 接受的玩家参数
+PLAYER_FIELDS = (
+    "frame_id", "nameplate_id", "shougou_type", "class_id", "dani_id", "icon_id",
+    "name", "shougou_text", "version_text", "rating",
+)
+
+# --- 区块与版面 ---
+
+def record_rating(record):
+    """单条成绩的Rating"""
+    return calculate_rating(record["achievement"], record["base"])
+
+def prepare_sections(records):
+    """
+    从完整成绩列表中选出旧版本前35、新版本前15，并按区块内顺序填写 section_rank。
+    同一谱面只取最好成绩，选曲规则见 selection.B50Selector。
+    :param records: 成绩列表，每条为包含 generate_song_cell 参数 (section_rank 除外) 及 is_new 的字典
+    :return: (old_cells, new_cells)，元素为可直接传给 generate_song_cell 的参数字典
+    """
+    return select_b50(records, OLD_SECTION_SIZE, NEW_SECTION_SIZE)
+
+def section_rows(size):
+    return (size + COLUMNS - 1) // COLUMNS
+
+def scaled_metrics(scale=1):
+    """
+    按缩放比例取整后的版面尺寸；单元格与面板尺寸取自缩放后的渲染计划，与实际渲染结果一致。
+    :return: (margin, cell_gap, section_gap, (cell_w, cell_h), (panel_w, panel_h))
+    """
+    scale = check_scale(scale)
+    if scale == 1:
+        return MARGIN, CELL_GAP, SECTION_GAP, (CANVAS_WIDTH, CANVAS_HEIGHT), (PANEL_WIDTH, PANEL_HEIGHT)
+    return (round(MARGIN * scale), round(CELL_GAP * scale), round(SECTION_GAP * scale),
+            get_plan('song_cell', scale).canvas, get_plan('top_panel', scale).canvas)
+
+def canvas_size(scale=1):
+    """B50整图尺寸"""
+    margin, cell_gap, section_gap, (cell_w, cell_h), (_, panel_h) = scaled_metrics(scale)
+    width = margin * 2 + COLUMNS * cell_w + (COLUMNS - 1) * cell_gap
+    rows = section_rows(OLD_SECTION_SIZE) + section_rows(NEW_SECTION_SIZE)
+    height = (margin * 2 + panel_h + section_gap * 2
+              + rows * cell_h + (rows - 2) * cell_gap)
+    return width, height
+
+def cell_position(is_new, index, scale=1):
+    """
+    返回区块内第 index 个单元格 (从0开始) 左上角在整图中的坐标。
+    """
+    margin, cell_gap, section_gap, (cell_w, cell_h), (_, panel_h) = scaled_metrics(scale)
+    row, col = divmod(index, COLUMNS)
+    y = margin + panel_h + section_gap
+    if is_new:
+        old_rows = section_rows(OLD_SECTION_SIZE)
+        y += old_rows * cell_h + (old_rows - 1) * cell_gap + section_gap
+    x = margin + col * (cell_w + cell_gap)
+    y += row * (cell_h + cell_gap)
+    return x, y
+
+def panel_rect(image_width, scale=1):
+    """面板在整图中的区域 (x0, y0, x1, y1)，水平居中"""
+    margin, _, _, _, (panel_w, panel_h) = scaled_metrics(scale)
+    panel_x = (image_width - panel_w) // 2
+    return panel_x, margin, panel_x + panel_w, margin + panel_h
+
+# --- 渲染 ---
+
+def _init_worker():
+    """工作进程预热，与渲染服务/批量任务的进程池相同，见 render_jobs.warm_up"""
+    # render_jobs 依赖本模块，在调用时导入
+    from modules.render_jobs import warm_up
+    warm_up()
+
+def _render_cell(params):
+    return cell_cache.get_cell(params)
+
+def _render_panel(params):
+    return create_panel_image(output_filename=None, **params)
+
+def render_cells(cells, jobs=1, executor=None):
+    """
+    渲染一组单元格，保持输入顺序。
+    :param cells: generate_song_cell 参数字典列表
+    :param jobs: 并行进程数，<=1 时在当前进程串行渲染
+    :param executor: 可选，复用已有的进程池
+    :return: PIL.Image 列表
+    """
+    if executor is None and jobs <= 1:
+        return [_render_cell(params) for params in cells]
+    if executor is not None:
+        return list(executor.map(_render_cell, cells))
+    with create_executor(jobs, _init_worker) as pool:
+        return list(pool.map(_render_cell, cells))
+
+def with_quality(params, quality, scale=1):
+    """为单元格/面板参数附加渲染质量档位与缩放比例"""
+    return dict(params, quality=quality, scale=scale)
+
+def panel_params_for(player, old_cells, new_cells):
+    """
+    由玩家信息生成 create_panel_image 参数；未提供 rating 时取各单元格Rating之和。
+    """
+    panel_params = {k: player[k] for k in PLAYER_FIELDS if k in player}
+    if "rating" not in panel_params:
+        panel_params["rating"] = sum(record_rating(c) for c in old_cells + new_cells)
+    return panel_params
+
+def compose_b50(panel_image, old_images, new_images, scale=1):
+    """将面板与两个区块的单元格拼接为整图 (各图层须已按 scale 渲染)"""
+    canvas = Image.new('RGBA', canvas_size(scale), BACKGROUND_COLOR)
+    canvas.paste(panel_image, panel_rect(canvas.width, scale)[:2], panel_image)
+    for is_new, images in ((False, old_images), (True, new_images)):
+        for index, img in enumerate(images):
+            canvas.paste(img, cell_position(is_new, index, scale), img)
+    return canvas
+
+def generate_b50(player, records, jobs=1, executor=None, output_filename=None, encode=None,
+                 quality=DEFAULT_QUALITY, scale=1):
+    """
+    生成完整的B50图片。
+
+    :param player: 玩家信息，create_panel_image 的参数字典 (output_filename 除外)；
+                   未提供 rating 时取50个单元格的Rating之和
+    :param records: 成绩列表，见 prepare_sections
+    :param jobs: 并行进程数 (默认1，串行)
+    :param executor: 可选，复用已有的进程池 (优先于 jobs)
+    :param output_filename: 输出文件路径或可写的文件对象，为 None 时不写入文件
+    :param encode: 可选，写入时的编码参数，见 encoder.save_image
+    :param quality: 渲染质量档位，作用于面板与全部单元格，见 quality.QUALITY_TIERS
+    :param scale: 缩放比例 (例如 0.5、0.25 用于预览)，面板与单元格直接以该比例渲染
+    :return: PIL.Image
+    :raises ValueError: 质量档位未知或缩放比例超出允许范围时
+    """
+    quality = check_quality(quality)
+    scale = check_scale(scale)
+    if executor is None and jobs > 1:
+        with create_executor(jobs, _init_worker) as pool:
+            return generate_b50(player, records, executor=pool, output_filename=output_filename,
+                                encode=encode, quality=quality, scale=scale)
+
+    laps = tracer.laps("b50")
+    old_cells, new_cells = prepare_sections(records)
+    panel_params = with_quality(panel_params_for(player, old_cells, new_cells), quality, scale)
+    laps.lap("select")
+
+    cells = [with_quality(params, quality, scale) for params in old_cells + new_cells]
+    if executor is not None:
+        # 面板与单元格一起提交到进程池
+        panel_future = executor.submit(_render_panel, panel_params)
+        images = render_cells(cells, executor=executor)
+        panel_image = panel_future.result()
+        laps.lap("render")
+    else:
+        panel_image = _render_panel(panel_params)
+        laps.lap("panel")
+        images = render_cells(cells)
+        laps.lap("cells")
+
+    result = compose_b50(panel_image, images[:len(old_cells)], images[len(old_cells):], scale)
+    laps.lap("compose")
+    if output_filename is not None:
+        save_image(result, output_filename, **(encode or {}))
+        laps.lap("save")
+    laps.done()
+    return result
+
+def update_b50(previous_image, previous_records, records, player, previous_player=None,
+               jobs=1, executor=None, quality=DEFAULT_QUALITY, scale=1):
+    """
+    增量更新B50图片: 对比新旧成绩列表的选曲结果，只重新渲染内容或 section_rank
+    发生变化的单元格，贴到旧图的副本上；面板仅在Rating或玩家信息变化时重新渲染。
+
+    :param previous_image: 上一次 generate_b50 / update_b50 的结果
+    :param previous_records: 生成 previous_image 时使用的成绩列表
+    :param records: 新的成绩列表
+    :param player: 玩家信息
+    :param previous_player: 生成 previous_image 时的玩家信息，默认与 player 相同
+    :param jobs: 并行进程数
+    :param executor: 可选，复用已有的进程池
+    :param quality: 渲染质量档位，应与生成 previous_image 时相同
+    :param scale: 缩放比例，应与生成 previous_image 时相同
+    :return: (image, dirty_rects)，dirty_rects 为发生变化的区域 (x0, y0, x1, y1) 列表，
+             调用方可据此只重新编码/传输这些区域
+    """
+    quality = check_quality(quality)
+    scale = check_scale(scale)
+    if previous_player is None:
+        previous_player = player
+    prev_old, prev_new = prepare_sections(previous_records)
+    old_cells, new_cells = prepare_sections(records)
+
+    # 按格位对比
+    changed = []
+    cleared = []
+    for is_new, prev_cells, cells in ((False, prev_old, old_cells), (True, prev_new, new_cells)):
+        for index in range(max(len(prev_cells), len(cells))):
+            if index >= len(cells):
+                cleared.append(cell_position(is_new, index, scale))
+            elif index >= len(prev_cells) or prev_cells[index] != cells[index]:
+                changed.append((cell_position(is_new, index, scale), cells[index]))
+
+    prev_panel = panel_params_for(previous_player, prev_old, prev_new)
+    panel_params = panel_params_for(player, old_cells, new_cells)
+    panel_changed = prev_panel != panel_params
+
+    image = previous_image.copy()
+    dirty_rects = []
+
+    if panel_changed:
+        rect = panel_rect(image.width, scale)
+        if executor is not None:
+            panel_image = executor.submit(_render_panel, with_quality(panel_params, quality, scale)).result()
+        else:
+            panel_image = _render_panel(with_quality(panel_params, quality, scale))
+        image.paste(BACKGROUND_COLOR, rect)
+        image.paste(panel_image, rect[:2], panel_image)
+        dirty_rects.append(rect)
+
+    cell_w, cell_h = scaled_metrics(scale)[3]
+    images = render_cells([with_quality(params, quality, scale) for _, params in changed],
+                          jobs=jobs, executor=executor)
+    for ((x, y), _), img in zip(changed, images):
+        rect = (x, y, x + cell_w, y + cell_h)
+        image.paste(BACKGROUND_COLOR, rect)
+        image.paste(img, (x, y), img)
+        dirty_rects.append(rect)
+    for x, y in cleared:
+        rect = (x, y, x + cell_w, y + cell_h)
+        image.paste(BACKGROUND_COLOR, rect)
+        dirty_rects.append(rect)
+
+    return image, dirty_rects
@@ -0,0 +1,136 @@
+import os
+import json
+import time
+from collections import deque
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+
+from modules.render_jobs import JOB_TYPES, JobError, render_job_image, warm_up
+from modules.encoder import EXTENSIONS, resolve_options, save_image
+from modules.worker_pool import create_executor
+
+
+def parse_job(line, line_no, output_dir, encode=None):
+    """
+    解析一行任务。
+    格式: {"id": "可选", "type": "cell|panel|b50", "params": {...}, "output": "可选输出路径", "encode": {...}}
+    未指定 output 时输出到 output_dir/<id>.<格式扩展名>，未指定 id 时以行号作为 id。
+    任务中的 encode 覆盖批量默认的编码参数 encode。
+    :raises JobError: 格式错误时
+    """
+    try:
+        job = json.loads(line)
+    except ValueError as e:
+        raise JobError(f"第{line_no}行不是合法的JSON: {e}") from e
+    if not isinstance(job, dict):
+        raise JobError(f"第{line_no}行必须是对象")
+    job_type = job.get("type")
+    if job_type not in JOB_TYPES:
+        raise JobError(f"第{line_no}行的任务类型无效: {job_type!r}")
+    job_id = str(job.get("id", line_no))
+    try:
+        options = resolve_options(**{**(encode or {}), **job.get("encode", {})})
+    except (TypeError, ValueError) as e:
+        raise JobError(f"第{line_no}行的编码参数无效: {e}") from e
+    output = job.get("output")
+    if not output:
+        ext = EXTENSIONS.get(options.get("format", "PNG").upper(), ".png")
+        output = os.path.join(output_dir, f"{job_id}{ext}")
+    return {"id": job_id, "type": job_type, "params": job.get("params", {}), "output": output, "encode": options}
+
+
+def run_job(job):
+    """
+    执行单个任务并直接在当前进程写出图片，只返回结果摘要 (图片不经进程间传输)。
+    :return: 结果字典，失败时包含 error 字段
+    """
+    start = time.perf_counter()
+    try:
+        img = render_job_image(job["type"], job["params"])
+        save_image(img, job["output"], **job["encode"])
+    except Exception as e:
+        return {"id": job["id"], "status": "error", "error": f"{type(e).__name__}: {e}"}
+    return {
+        "id": job["id"],
+        "status": "ok",
+        "output": job["output"],
+        "elapsed": round(time.perf_counter() - start, 4),
+    }
+
+
+def _iter_jobs(lines, output_dir, encode=None):
+    """逐行解析任务，跳过空行；解析失败的行返回 (None, 错误结果)"""
+    for line_no, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield parse_job(line, line_no, output_dir, encode), None
+        except JobError as e:
+            yield None, {"id": str(line_no), "status": "error", "error": str(e)}
+
+
+def _done(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def _result(job_id, future):
+    """取出任务结果；工作进程异常退出等情况也转为错误结果"""
+    try:
+        return future.result()
+    except Exception as e:
+        return {"id": job_id, "status": "error", "error": f"{type(e).__name__}: {e}"}
+
+
+def run_batch(lines, jobs=1, output_dir='output', ordered=True, max_in_flight=None, executor=None,
+              encode=None, max_jobs_per_worker=None):
+    """
+    流式批量渲染。
+    :param lines: 可迭代的JSONL行 (文件对象或 sys.stdin)
+    :param jobs: 并行进程数，1 表示在当前进程内顺序执行
+    :param output_dir: 任务未指定 output 时的输出目录
+    :param ordered: True 时按输入顺序输出结果，False 时按完成顺序输出
+    :param max_in_flight: 同时提交的任务上限，默认为 jobs * 2，读取输入随之暂停
+    :param executor: 可选，外部提供的执行器
+    :param encode: 可选，默认编码参数 (可含 preset)，任务可用自己的 encode 覆盖
+    :param max_jobs_per_worker: 可选，每个工作进程执行多少个任务后替换为新进程 (限制长批次的内存增长)
+    :return: 生成器，每个任务产出一个结果字典
+    """
+    parsed = _iter_jobs(lines, output_dir, encode)
+    max_in_flight = max_in_flight or max(jobs, 1) * 2
+    if executor is not None:
+        yield from _run_pooled(parsed, executor, ordered, max_in_flight)
+    elif jobs > 1:
+        with create_executor(jobs, warm_up, max_jobs_per_worker) as pool:
+            yield from _run_pooled(parsed, pool, ordered, max_in_flight)
+    else:
+        for job, error in parsed:
+            yield error if job is None else run_job(job)
+
+
+def _run_pooled(parsed, executor, ordered, max_in_flight):
+    in_flight = deque()
+    for job, error in parsed:
+        if job is None:
+            in_flight.append((error["id"], _done(error)))
+        else:
+            in_flight.append((job["id"], executor.submit(run_job, job)))
+        while len(in_flight) >= max_in_flight:
+            yield from _drain(in_flight, ordered)
+    while in_flight:
+        yield from _drain(in_flight, ordered)
+
+
+def _drain(in_flight, ordered):
+    """产出至少一个已完成任务的结果"""
+    if ordered:
+        yield _result(*in_flight.popleft())
+        # 顺带产出队首已经完成的任务，减少等待
+        while in_flight and in_flight[0][1].done():
+            yield _result(*in_flight.popleft())
+        return
+    done, _ = wait([future for _, future in in_flight], return_when=FIRST_COMPLETED)
+    for item in [item for item in in_flight if item[1] in done]:
+        in_flight.remove(item)
+        yield _result(*item)
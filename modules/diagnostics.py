@@ -0,0 +1,115 @@
+import json
+import logging
+import threading
+from collections import Counter
+
+# 所有模块的 logger 都在 "modules" 之下 (logging.getLogger(__name__))
+ROOT_LOGGER = "modules"
+
+# 库默认静默: 挂 NullHandler，未配置时不会落到 logging.lastResort 打印警告
+logging.getLogger(ROOT_LOGGER).addHandler(logging.NullHandler())
+
+# 结构化字段 (通过 extra= 传入)
+STRUCTURED_FIELDS = ("asset", "stage", "duration", "path", "count")
+
+logger = logging.getLogger(__name__)
+
+
+class MissingAssets:
+    """
+    缺失素材计数器。
+
+    同一素材只在第一次缺失时记录 WARNING，之后只累加计数 (DEBUG)，
+    避免批量渲染时同一条警告刷屏。计数可通过 counts()/summary() 查看。
+    """
+
+    def __init__(self, log=None):
+        self.log = log or logger
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def report(self, asset, stage, log=None):
+        """
+        记录一次素材缺失。
+        :param asset: 素材文件名或路径
+        :param stage: 所在渲染阶段 (例如 "song_cell.jacket"、"panel.frame")
+        :param log: 可选，记录日志用的 logger (默认为本模块的 logger)
+        """
+        with self._lock:
+            self._counts[(asset, stage)] += 1
+            count = self._counts[(asset, stage)]
+        log = log or self.log
+        extra = {"asset": asset, "stage": stage, "count": count}
+        if count == 1:
+            log.warning("素材缺失: %s", asset, extra=extra)
+        else:
+            log.debug("素材缺失: %s (第%d次)", asset, count, extra=extra)
+
+    def counts(self):
+        """:return: {(素材, 阶段): 次数}"""
+        with self._lock:
+            return dict(self._counts)
+
+    def total(self):
+        with self._lock:
+            return sum(self._counts.values())
+
+    def summary(self):
+        """按素材汇总的次数，便于一次性输出"""
+        totals = Counter()
+        for (asset, _), n in self.counts().items():
+            totals[asset] += n
+        return dict(totals.most_common())
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+# 进程级共享实例
+missing_assets = MissingAssets()
+
+
+class StructuredFormatter(logging.Formatter):
+    """文本格式，结构化字段以 key=value 附在消息后"""
+
+    def format(self, record):
+        text = super().format(record)
+        fields = [f"{k}={getattr(record, k)}" for k in STRUCTURED_FIELDS if hasattr(record, k)]
+        return f"{text} [{' '.join(fields)}]" if fields else text
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行JSON"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key in STRUCTURED_FIELDS:
+            if hasattr(record, key):
+                entry[key] = getattr(record, key)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def configure_logging(level=logging.WARNING, json_format=False, stream=None):
+    """
+    为命令行程序配置日志输出 (默认输出到标准错误)，库代码本身不调用。
+    :param level: 日志级别，可为名称 ("INFO") 或数值
+    :param json_format: 是否每行输出一条JSON
+    :return: 添加的 handler
+    """
+    handler = logging.StreamHandler(stream)
+    if json_format:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(StructuredFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger(ROOT_LOGGER)
+    root.addHandler(handler)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    return handler
@@ -0,0 +1,103 @@
+import threading
+from PIL import Image, ImageColor
+from modules.asset_cache import asset_cache
+
+# 数字图集 UI_CMN_Num_26p.png 的单元格尺寸
+CELL_W, CELL_H = 34, 40
+
+# 数字分布：0 1 2 3 | 4 5 6 7 | 8 9
+NUM_MAP = {
+    '0': (0, 0), '1': (1, 0), '2': (2, 0), '3': (3, 0),
+    '4': (0, 1), '5': (1, 1), '6': (2, 1), '7': (3, 1),
+    '8': (0, 2), '9': (1, 2)
+}
+
+
+def _normalize_color(color):
+    """接受 '#rrggbb' 或 (r, g, b)，返回 (r, g, b)"""
+    if isinstance(color, str):
+        color = ImageColor.getrgb(color)
+    return tuple(color[:3])
+
+
+def tint(img, color):
+    """
+    将图片中 alpha>0 的像素染为指定颜色，保留原 alpha；完全透明的像素保持不变。
+    使用通道运算完成，不逐像素遍历。
+    """
+    alpha = img.getchannel('A')
+    solid = Image.new('RGB', img.size, color)
+    tinted = Image.merge('RGBA', (*solid.split(), alpha))
+    mask = alpha.point(lambda a: 255 if a > 0 else 0)
+    return Image.composite(tinted, img, mask)
+
+
+class DigitSprites:
+    """
+    数字精灵: 图集只切分一次，按 (颜色, 高度) 缓存染色并缩放好的 0-9 字形。
+    """
+
+    def __init__(self, atlas_path):
+        self.atlas_path = atlas_path
+        self._glyph_sets = {}
+        self._lock = threading.Lock()
+
+    def glyphs(self, color, height):
+        """
+        获取 (color, height) 对应的全部数字字形。
+        :return: dict，'0'-'9' -> PIL.Image (只读使用)
+        """
+        key = (_normalize_color(color), int(height))
+        glyph_set = self._glyph_sets.get(key)
+        if glyph_set is None:
+            glyph_set = self._build(*key)
+            with self._lock:
+                glyph_set = self._glyph_sets.setdefault(key, glyph_set)
+        return glyph_set
+
+    def render(self, text, color=(246, 195, 4), height=21, spacing=-2):
+        """
+        将数字字符串拼接为一张透明底图片 (非数字字符被忽略)。
+        :param text: 数字或数字字符串
+        :param color: 字形颜色
+        :param height: 字高 (像素)
+        :param spacing: 字间距，负数表示重叠
+        :return: PIL.Image
+        """
+        glyph_set = self.glyphs(color, height)
+        digit_imgs = [glyph_set[d] for d in str(text) if d in glyph_set]
+        # 右对齐拼接
+        total_w = sum(img.width for img in digit_imgs)
+        if len(digit_imgs) > 1:
+            total_w += spacing * (len(digit_imgs) - 1)
+        result_img = Image.new('RGBA', (max(total_w, 0), int(height)), (0, 0, 0, 0))
+        x = result_img.width
+        for img in reversed(digit_imgs):
+            x -= img.width
+            result_img.paste(img, (x, 0), img)
+            x -= spacing
+        return result_img
+
+    def _build(self, color, height):
+        atlas = asset_cache.get(self.atlas_path)
+        scale = height / CELL_H
+        new_w = int(CELL_W * scale)
+        glyph_set = {}
+        for digit, (cx, cy) in NUM_MAP.items():
+            crop = atlas.crop((cx * CELL_W, cy * CELL_H, (cx + 1) * CELL_W, (cy + 1) * CELL_H))
+            glyph = crop.resize((new_w, height), Image.LANCZOS)
+            glyph_set[digit] = tint(glyph, color)
+        return glyph_set
+
+
+_sprites = {}
+_sprites_lock = threading.Lock()
+
+
+def get_digit_sprites(atlas_path):
+    """获取图集路径对应的进程级共享 DigitSprites"""
+    with _sprites_lock:
+        sprites = _sprites.get(atlas_path)
+        if sprites is None:
+            sprites = _sprites[atlas_path] = DigitSprites(atlas_path)
+        return sprites
@@ -0,0 +1,121 @@
+import io
+import os
+from PIL import Image
+from modules.tracing import tracer
+
+# 扩展名到编码格式
+FORMAT_BY_EXT = {
+    '.png': 'PNG',
+    '.webp': 'WEBP',
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+}
+
+# 编码格式到默认扩展名
+EXTENSIONS = {
+    'PNG': '.png',
+    'WEBP': '.webp',
+    'JPEG': '.jpg',
+}
+
+# 编码格式到 Content-Type
+MIME_TYPES = {
+    'PNG': 'image/png',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+
+# 常用编码预设
+ENCODE_PRESETS = {
+    # 与 PIL 默认相同的 PNG
+    "png": {"format": "PNG", "compress_level": 6},
+    # 低压缩级别的 PNG: 体积稍大，编码快数倍
+    "png-fast": {"format": "PNG", "compress_level": 1},
+    # 调色板 PNG: 体积最小，颜色有损
+    "png-palette": {"format": "PNG", "compress_level": 6, "quantize": 256},
+    "webp": {"format": "WEBP", "quality": 90},
+    "jpeg": {"format": "JPEG", "quality": 90},
+}
+
+
+def format_for_path(path, default='PNG'):
+    """根据文件扩展名推断编码格式"""
+    return FORMAT_BY_EXT.get(os.path.splitext(str(path))[1].lower(), default)
+
+
+def resolve_options(preset=None, **options):
+    """
+    合并预设与显式参数 (显式参数优先)，值为 None 的参数视为未指定。
+    :raises ValueError: 预设名未知时
+    """
+    if preset is not None and preset not in ENCODE_PRESETS:
+        raise ValueError(f"未知的编码预设: {preset} (可选: {', '.join(ENCODE_PRESETS)})")
+    resolved = dict(ENCODE_PRESETS.get(preset, {}))
+    resolved.update({k: v for k, v in options.items() if v is not None})
+    return resolved
+
+
+def encode_image(img, fp=None, format='PNG', compress_level=6, optimize=False,
+                 quality=90, quantize=None, background=(0, 0, 0)):
+    """
+    编码图片。
+    :param img: PIL.Image
+    :param fp: 可写的文件对象；为 None 时返回编码后的字节
+    :param format: "PNG" | "WEBP" | "JPEG"
+    :param compress_level: PNG 压缩级别 (0-9)，越低越快
+    :param optimize: 是否启用 PNG/JPEG 的额外优化 (明显更慢)，默认关闭
+    :param quality: WEBP/JPEG 质量 (1-100)
+    :param quantize: 调色板颜色数 (2-256)，None 表示不量化；仅用于 PNG
+    :param background: JPEG 不支持透明，半透明像素合成到此背景色上
+    :return: fp 为 None 时返回 bytes，否则返回 None
+    """
+    format = format.upper()
+    if format == 'JPG':
+        format = 'JPEG'
+    if format not in MIME_TYPES:
+        raise ValueError(f"不支持的编码格式: {format}")
+
+    if format == 'PNG':
+        if quantize:
+            # RGBA 图片只能用 FASTOCTREE 量化
+            method = Image.Quantize.FASTOCTREE if img.mode == 'RGBA' else Image.Quantize.MEDIANCUT
+            with tracer.stage("encode.quantize"):
+                img = img.quantize(colors=int(quantize), method=method)
+        save_args = {"compress_level": int(compress_level), "optimize": bool(optimize)}
+    elif format == 'WEBP':
+        save_args = {"quality": int(quality), "method": 4}
+    else:
+        if img.mode in ('RGBA', 'LA', 'P'):
+            rgba = img.convert('RGBA')
+            flat = Image.new('RGB', rgba.size, tuple(background))
+            flat.paste(rgba, (0, 0), rgba)
+            img = flat
+        save_args = {"quality": int(quality), "optimize": bool(optimize)}
+
+    with tracer.stage(f"encode.{format.lower()}"):
+        if fp is None:
+            buffer = io.BytesIO()
+            img.save(buffer, format=format, **save_args)
+            return buffer.getvalue()
+        img.save(fp, format=format, **save_args)
+    return None
+
+
+def save_image(img, target, preset=None, **options):
+    """
+    将图片写入文件路径或文件对象。
+    写入路径时未指定 format 则按扩展名推断，并自动创建所在目录。
+    :param target: 文件路径或可写的文件对象
+    :param preset: 可选，ENCODE_PRESETS 中的预设名
+    :param options: encode_image 的编码参数
+    """
+    options = resolve_options(preset, **options)
+    if hasattr(target, 'write'):
+        encode_image(img, target, **options)
+        return
+    options.setdefault("format", format_for_path(target))
+    output_dir = os.path.dirname(target)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(target, 'wb') as f:
+        encode_image(img, f, **options)
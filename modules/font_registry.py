@@ -0,0 +1,66 @@
+import io
+import threading
+from PIL import ImageFont
+
+# (path, size) -> FreeTypeFont
+_fonts = {}
+# path -> 字体文件字节
+_font_data = {}
+_lock = threading.Lock()
+
+
+def _read_font_data(path):
+    data = _font_data.get(path)
+    if data is None:
+        with open(path, 'rb') as f:
+            data = f.read()
+        _font_data[path] = data
+    return data
+
+
+def get_font(path, size):
+    """
+    获取 (path, size) 对应的字体对象，同一进程内只解析一次。
+
+    字体文件整体读入内存后再交给 FreeType，不持有文件句柄，
+    因此 fork 出的子进程可以直接复用父进程中已加载的字体。
+    :raises OSError: 字体文件不存在或无法解析时
+    """
+    key = (path, size)
+    font = _fonts.get(key)
+    if font is not None:
+        return font
+    with _lock:
+        font = _fonts.get(key)
+        if font is None:
+            data = _read_font_data(path)
+            font = ImageFont.truetype(io.BytesIO(data), size=size)
+            _fonts[key] = font
+        return font
+
+
+def preload_fonts(faces):
+    """
+    预加载字体。
+    :param faces: 可迭代对象，元素为 (path, size)
+    :return: 成功加载的数量
+    """
+    loaded = 0
+    for path, size in faces:
+        try:
+            get_font(path, size)
+            loaded += 1
+        except OSError:
+            continue
+    return loaded
+
+
+def loaded_fonts():
+    """返回已加载的 (path, size) 列表"""
+    return list(_fonts)
+
+
+def clear():
+    with _lock:
+        _fonts.clear()
+        _font_data.clear()
@@ -0,0 +1,216 @@
+import os
+import re
+import logging
+import threading
+from PIL import Image
+from modules.packfile import LazyPack, write_pack, PackFile, PackError
+from modules.layout import get_plan
+
+logger = logging.getLogger(__name__)
+
+# 封面包格式版本，修改缩放方式时递增
+JACKET_PACK_VERSION = 1
+
+try:
+    _project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+except NameError:
+    _project_root = os.path.abspath('.')
+
+DEFAULT_PACK_PATH = os.path.join(_project_root, 'cache', 'jackets.pack')
+
+# 单元格使用的封面宽度 (单元格渲染计划中 jacket 槽位的宽度)
+PACK_WIDTH = get_plan('song_cell').rect("jacket")[2]
+
+def pack_width(scale=1):
+    """:return: 以 scale 渲染时单元格使用的封面宽度"""
+    return get_plan('song_cell', scale).rect("jacket")[2]
+
+
+def pack_path(width, path=DEFAULT_PACK_PATH):
+    """
+    :return: 该宽度的封面包路径: 默认宽度为 path 本身，其余宽度为同目录下的 <名称>_w<宽度>.pack
+    """
+    if width == PACK_WIDTH:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}_w{width}{ext}"
+
+
+JACKET_PATTERN = re.compile(r'^UI_Jacket_(\d+)\.png$', re.IGNORECASE)
+
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def scale_jacket(source_path, width=PACK_WIDTH):
+    """
+    解码原始封面并等比缩放到指定宽度 (与 jacket_store.render_jacket_strip 的缩放完全相同)。
+    :raises FileNotFoundError: 封面文件不存在时
+    """
+    with Image.open(source_path) as src:
+        jacket_img = src.convert('RGBA')
+    w, h = jacket_img.size
+    return jacket_img.resize((width, int(width * h / w)), Image.Resampling.LANCZOS)
+
+
+def find_jackets(jackets_dir):
+    """:return: {6位cover_id: 路径}，遍历 jackets_dir 下全部 UI_Jacket_XXXXXX.png"""
+    jackets = {}
+    for dirpath, _, filenames in os.walk(jackets_dir):
+        for filename in filenames:
+            match = JACKET_PATTERN.match(filename)
+            if match:
+                jackets[match.group(1).zfill(6)] = os.path.join(dirpath, filename)
+    return dict(sorted(jackets.items()))
+
+
+def build_jacket_pack(jackets_dir, path=DEFAULT_PACK_PATH, width=PACK_WIDTH, full=False):
+    """
+    生成封面包: 每张封面缩放到 width 宽，以原始 RGBA 保存，按 cover_id 建立偏移索引。
+    默认增量构建: 已有封面包中源文件未变 (mtime 与大小相同) 的条目直接复制，
+    只解码新增或被修改的封面；源文件已删除的条目被移除。
+    :param jackets_dir: 原始封面目录
+    :param path: 封面包路径
+    :param width: 缩放宽度
+    :param full: 为 True 时忽略已有封面包，全部重新生成
+    :return: {"total", "added", "updated", "reused", "removed", "failed"}
+    """
+    old = None
+    if not full:
+        try:
+            old = PackFile(path)
+            if old.meta.get("version") != JACKET_PACK_VERSION or old.meta.get("width") != width:
+                old = None
+        except (OSError, PackError, ValueError):
+            old = None
+
+    jackets = find_jackets(jackets_dir)
+    counts = {"added": 0, "updated": 0, "reused": 0, "failed": 0}
+
+    def entries():
+        for cover_id, source_path in jackets.items():
+            try:
+                stamp = _source_stamp(source_path)
+            except OSError:
+                counts["failed"] += 1
+                continue
+            previous = old.entries.get(cover_id) if old else None
+            if previous is not None and previous["stamp"] == stamp:
+                counts["reused"] += 1
+                yield cover_id, {"size": previous["size"], "stamp": stamp}, old.view(cover_id)
+                continue
+            try:
+                jacket_img = scale_jacket(source_path, width)
+            except (OSError, ValueError) as e:
+                logger.warning("封面处理失败: %s (%s)", source_path, e, extra={"path": source_path})
+                counts["failed"] += 1
+                continue
+            counts["updated" if previous is not None else "added"] += 1
+            yield cover_id, {"size": list(jacket_img.size), "stamp": stamp}, jacket_img.tobytes()
+
+    total = write_pack(path, entries(), meta={"version": JACKET_PACK_VERSION, "width": width})
+    counts["total"] = total
+    counts["removed"] = len(set(old.entries) - set(jackets)) if old else 0
+    logger.info("封面包已生成: %d 张 (新增%d 更新%d 复用%d)", total, counts["added"], counts["updated"],
+                counts["reused"], extra={"path": path, "count": total})
+    return counts
+
+
+class JacketPack:
+    """
+    预缩放封面包的只读访问 (mmap)。
+
+    get() 返回直接引用映射内存的图片，省去打开文件、zlib 解压与 RGBA 转换；
+    多个工作进程映射同一文件时共享页缓存。源文件存在且在打包后被修改时视为过期，
+    返回 None 由调用方退回原始封面；源文件不存在时 (例如只部署了封面包) 仍使用包内数据。
+    默认宽度之外 (缩略图等) 的封面包见 pack_path，由 main.py jackets --scales 生成。
+    """
+
+    def __init__(self, path=DEFAULT_PACK_PATH):
+        self.path = path
+        self.pack = LazyPack(path)
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self._packs = {PACK_WIDTH: self.pack}
+        self._fresh = {}
+        self._unpacked = set()
+        self._lock = threading.Lock()
+
+    def get(self, cover_id, source_path=None, width=PACK_WIDTH):
+        """
+        :param cover_id: 封面ID
+        :param source_path: 可选，原始封面路径，用于检查包内数据是否过期 (每个进程每张封面只检查一次)
+        :param width: 需要的宽度，使用该宽度的封面包
+        :return: 缩放到 width 宽的 RGBA 图片 (引用映射内存，只读使用)，没有可用数据时返回 None
+        """
+        pack = self._pack_for(width).get()
+        key = str(cover_id).zfill(6)
+        if pack is None or pack.meta.get("width") != width:
+            self._notice_unpacked(width)
+            self.misses += 1
+            return None
+        if key not in pack:
+            self.misses += 1
+            return None
+        if not self._is_fresh(pack, width, key, source_path):
+            self.stale += 1
+            return None
+        self.hits += 1
+        return pack.image(key)
+
+    def reload(self):
+        """封面包重新生成后调用"""
+        with self._lock:
+            self._fresh.clear()
+            self._unpacked.clear()
+            packs = list(self._packs.values())
+        for pack in packs:
+            pack.reload()
+
+    def stats(self):
+        pack = self.pack.get()
+        with self._lock:
+            widths = sorted(width for width, lazy in self._packs.items() if lazy.get() is not None)
+        return {
+            "loaded": pack is not None,
+            "jackets": len(pack) if pack else 0,
+            "widths": widths,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+        }
+
+    def _pack_for(self, width):
+        lazy = self._packs.get(width)
+        if lazy is None:
+            with self._lock:
+                lazy = self._packs.setdefault(width, LazyPack(pack_path(width, self.path)))
+        return lazy
+
+    def _notice_unpacked(self, width):
+        """非默认宽度没有封面包时每个进程只提示一次"""
+        if width == PACK_WIDTH or width in self._unpacked:
+            return
+        with self._lock:
+            self._unpacked.add(width)
+        logger.info("没有宽度 %d 的封面包，该宽度的封面将由默认封面包缩小或解码原始封面"
+                    " (可用 main.py jackets --scales 生成)", width,
+                    extra={"path": pack_path(width, self.path)})
+
+    def _is_fresh(self, pack, width, key, source_path):
+        fresh = self._fresh.get((width, key))
+        if fresh is None:
+            try:
+                fresh = source_path is None or _source_stamp(source_path) == pack.entries[key]["stamp"]
+            except OSError:
+                fresh = True
+            with self._lock:
+                self._fresh[(width, key)] = fresh
+        return fresh
+
+
+# 进程级共享实例
+jacket_pack = JacketPack()
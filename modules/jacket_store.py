@@ -0,0 +1,214 @@
+import os
+import threading
+from PIL import Image
+from modules.asset_cache import AssetCache
+from modules.tracing import tracer
+from modules.layout import get_plan
+from modules.jacket_pack import jacket_pack, PACK_WIDTH
+from modules.quality import DEFAULT_QUALITY, blur, blur_reduce, check_quality, resample_filter
+
+# 背景条格式版本，修改生成算法后需要递增，旧缓存自然失效
+JACKET_STORE_VERSION = 1
+
+try:
+    _project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+except NameError:
+    _project_root = os.path.abspath('.')
+
+DEFAULT_CACHE_DIR = os.path.join(_project_root, 'cache', 'jackets')
+
+# 默认参数 (来自单元格渲染计划的 jacket / overlay 槽位)
+_cell_plan = get_plan('song_cell')
+STRIP_WIDTH, STRIP_HEIGHT = _cell_plan.canvas
+BLUR_RADIUS = _cell_plan.slot("jacket")["blur_radius"]
+OFFSET_Y = _cell_plan.rect("jacket")[1]
+OVERLAY_ALPHA = _cell_plan.slot("overlay")["opacity"]
+
+
+def render_jacket_strip(source_path, width=STRIP_WIDTH, height=STRIP_HEIGHT,
+                        blur_radius=BLUR_RADIUS, offset_y=OFFSET_Y, overlay_alpha=OVERLAY_ALPHA, scaled=None,
+                        quality=DEFAULT_QUALITY):
+    """
+    由原始封面生成单元格背景条: 等比缩放至宽度填满 -> 高斯模糊 -> 按偏移裁出画布区域 -> 叠加黑色半透明蒙版。
+    quality 为 full 时结果与逐步在画布上绘制完全一致，其他档位使用更快的缩放与近似模糊 (见 quality)。
+    :param scaled: 可选，已缩放到 width 宽的封面 (例如来自 jacket_pack)，提供时不读取 source_path
+    :param quality: 渲染质量档位
+    :raises FileNotFoundError: 封面文件不存在时
+    """
+    laps = tracer.laps("jacket_strip")
+    if scaled is not None:
+        jacket_img = scaled
+        laps.lap("pack")
+    else:
+        with Image.open(source_path) as src:
+            jacket_img = src.convert('RGBA')
+        laps.lap("decode")
+        w, h = jacket_img.size
+        new_h = int(width * h / w)
+        jacket_img = jacket_img.resize((width, new_h), resample_filter(quality))
+        laps.lap("resize")
+    paste_y = offset_y
+    if blur_reduce(quality) > 1:
+        # 近似模糊只处理画布可见的横条，上下各留 3 倍半径的余量，边缘与整图模糊无明显差别
+        margin = 3 * blur_radius
+        top = max(0, -offset_y - margin)
+        bottom = min(jacket_img.height, height - offset_y + margin)
+        jacket_img = jacket_img.crop((0, top, jacket_img.width, bottom))
+        paste_y = offset_y + top
+    jacket_img = blur(jacket_img, blur_radius, quality)
+    laps.lap("blur")
+    strip = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    strip.paste(jacket_img, (0, paste_y))
+    overlay = Image.new('RGBA', (width, height), (0, 0, 0, overlay_alpha))
+    strip = Image.alpha_composite(strip, overlay)
+    laps.lap("overlay")
+    laps.done()
+    return strip
+
+
+class JacketStore:
+    """
+    预模糊封面背景条的持久化存储。
+
+    每个 cover_id 与模糊参数组合只生成一次 432x216 的最终背景条 (已模糊、已压暗)，
+    写入磁盘缓存目录并保留在内存 LRU 中；之后的请求不再读取原始封面。
+    磁盘层总大小超过上限时按最近使用时间 (mtime，命中时刷新) 淘汰最旧的文件，
+    占用的估算方式与 render_cache.RenderCache 相同 (每个进程各自估计，淘汰前重新扫描)。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, memory_bytes=32 * 1024 * 1024,
+                 disk_bytes=256 * 1024 * 1024):
+        """
+        :param cache_dir: 磁盘缓存目录，None 表示只使用内存
+        :param memory_bytes: 内存层上限 (字节)
+        :param disk_bytes: 磁盘层上限 (字节)
+        """
+        self.cache_dir = cache_dir
+        self.disk_bytes = disk_bytes
+        self.memory = AssetCache(max_bytes=memory_bytes)
+        self.disk_hits = 0
+        self.renders = 0
+        self.disk_evictions = 0
+        self._disk_usage = None
+        self._lock = threading.Lock()
+
+    def key(self, cover_id, width=STRIP_WIDTH, height=STRIP_HEIGHT,
+            blur_radius=BLUR_RADIUS, offset_y=OFFSET_Y, overlay_alpha=OVERLAY_ALPHA, quality=DEFAULT_QUALITY):
+        """返回带版本号的缓存键，同时用作磁盘文件名"""
+        jacket_id_str = str(cover_id).zfill(6)
+        return (f"v{JACKET_STORE_VERSION}_{jacket_id_str}_{width}x{height}"
+                f"_b{blur_radius}_y{offset_y}_a{overlay_alpha}_{check_quality(quality)}")
+
+    def get(self, cover_id, source_path, **params):
+        """
+        获取背景条 (共享对象，只读使用)。
+        :param cover_id: 封面ID
+        :param source_path: 原始封面路径，仅在缓存未命中时读取
+        :param params: width/height/blur_radius/offset_y/overlay_alpha/quality
+        :raises FileNotFoundError: 缓存未命中且原始封面不存在时
+        """
+        key = self.key(cover_id, **params)
+        return self.memory.get_or_load(key, lambda: self._load(key, cover_id, source_path, params))
+
+    def stats(self):
+        stats = self.memory.stats()
+        with self._lock:
+            stats["disk_hits"] = self.disk_hits
+            stats["renders"] = self.renders
+            stats["disk_bytes"] = self._disk_usage
+            stats["disk_max_bytes"] = self.disk_bytes
+            stats["disk_evictions"] = self.disk_evictions
+        return stats
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.png")
+
+    def _load(self, key, cover_id, source_path, params):
+        if self.cache_dir:
+            disk_path = self._disk_path(key)
+            try:
+                with Image.open(disk_path) as cached:
+                    strip = cached.convert('RGBA')
+                # 刷新 mtime，作为LRU淘汰依据
+                os.utime(disk_path)
+            except (OSError, ValueError):
+                pass
+            else:
+                with self._lock:
+                    self.disk_hits += 1
+                return strip
+        # 封面包中有预缩放的封面时省去解码与缩放；缩略图优先使用同宽度的封面包 (main.py jackets --scales)，
+        # 没有时由默认宽度的包内封面再缩小
+        width = params.get("width", STRIP_WIDTH)
+        scaled = jacket_pack.get(cover_id, source_path, width)
+        if scaled is None and width < PACK_WIDTH:
+            packed = jacket_pack.get(cover_id, source_path)
+            if packed is not None:
+                scaled = packed.resize((width, int(width * packed.height / packed.width)),
+                                       resample_filter(params.get("quality", DEFAULT_QUALITY)))
+        strip = render_jacket_strip(source_path, scaled=scaled, **params)
+        with self._lock:
+            self.renders += 1
+        if self.cache_dir:
+            self._save(strip, key)
+        return strip
+
+    def _save(self, strip, key):
+        disk_path = self._disk_path(key)
+        tmp_path = f"{disk_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # 低压缩级别: 背景条读多写少，解码速度优先
+            strip.save(tmp_path, format='PNG', compress_level=1)
+            os.replace(tmp_path, disk_path)
+            size = os.path.getsize(disk_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self._lock:
+            if self._disk_usage is None:
+                self._disk_usage = sum(entry[2] for entry in self._iter_disk_entries())
+            else:
+                self._disk_usage += size
+            over = self._disk_usage > self.disk_bytes
+        if over:
+            self._evict_disk()
+
+    def _iter_disk_entries(self):
+        """遍历磁盘缓存中的背景条，返回 (mtime, path, size)"""
+        try:
+            entries = list(os.scandir(self.cache_dir))
+        except OSError:
+            return
+        for entry in entries:
+            if not entry.name.endswith('.png'):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            yield st.st_mtime, entry.path, st.st_size
+
+    def _evict_disk(self):
+        """淘汰最久未使用的文件，直到占用降到上限的90%"""
+        entries = sorted(self._iter_disk_entries())
+        total = sum(size for _, _, size in entries)
+        target = self.disk_bytes * 0.9
+        evicted = 0
+        for _, path, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._disk_usage = total
+            self.disk_evictions += evicted
+
+
+# 进程级共享实例
+jacket_store = JacketStore()
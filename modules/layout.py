@@ -0,0 +1,433 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+
+from modules.asset_cache import AssetCache
+
+logger = logging.getLogger(__name__)
+
+# 渲染计划格式版本，修改编译规则时递增，旧的缓存计划自然失效
+PLAN_VERSION = 1
+
+try:
+    _project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+except NameError:
+    _project_root = os.path.abspath('.')
+
+# 绑定文件目录: layouts/<name>.json
+LAYOUTS_DIR = os.path.join(_project_root, 'layouts')
+DEFAULT_CACHE_DIR = os.path.join(_project_root, 'cache', 'layouts')
+
+# 编译时消耗的几何字段，其余字段原样带入计划 (字体、模糊半径、素材名等)
+GEOMETRY_KEYS = ("layer", "index", "rect", "x", "y", "w", "h", "position", "resize",
+                 "offset", "scale", "fit_scale", "point", "variants", "default")
+
+ANCHORS = ("left", "right", "center", "bottom-right")
+
+# 按比例缩放计划时随之缩放的字段: 坐标 (可为0或负) 与尺寸 (至少为1)；
+# raw (素材原始尺寸) 等与画布分辨率无关的字段保持不变
+SCALED_POSITIONS = ("point", "offset", "spacing", "letter_spacing")
+SCALED_SIZES = ("resize", "target", "font_size", "height", "outline_width")
+
+# 允许的渲染缩放比例范围: 缩放比例来自 HTTP 请求与批量任务，上限防止分配巨大画布
+MIN_SCALE = 0.25
+MAX_SCALE = 2.0
+
+# 每个计划记忆的缩放计划数量上限 (LRU)
+MAX_SCALED_PLANS = 16
+
+
+class LayoutError(ValueError):
+    """绑定文件与分析结果不匹配 (图层不存在、字段非法等)"""
+
+
+def _layer_rects(analysis):
+    """:return: {图层名: [([x, y, w, h], 不透明度), ...]}，同名图层按出现顺序排列"""
+    rects = {}
+    for layer in analysis.get("layers", []):
+        pos, size = layer["position"], layer["size"]
+        rects.setdefault(layer["name"], []).append(
+            ([pos["x"], pos["y"], size["width"], size["height"]], layer.get("opacity", 255))
+        )
+    return rects
+
+
+def _compile_slot(name, spec, layers, context=None):
+    """
+    将单个图层槽位的绑定编译为最终几何。
+    规则依次为: 取分析结果中的图层矩形 (或显式 rect) -> x/y/w/h/position 覆盖 ->
+    resize 指定缩放目标 -> scale 以中心缩放 -> fit_scale 计算等比缩放的目标框 -> 锚点。
+    """
+    if "rect" in spec:
+        rect = list(spec["rect"])
+        opacity = None
+    elif "layer" in spec:
+        candidates = layers.get(spec["layer"])
+        index = spec.get("index", 0)
+        if not candidates or index >= len(candidates):
+            raise LayoutError(f"槽位 {name}: 分析结果中没有图层 {spec['layer']!r} (#{index})")
+        rect, opacity = candidates[index]
+        rect = list(rect)
+    elif "point" in spec:
+        rect = list(spec["point"]) + [0, 0]
+        opacity = None
+    else:
+        raise LayoutError(f"槽位 {name}: 需要 layer、rect 或 point 之一")
+
+    for i, key in enumerate(("x", "y", "w", "h")):
+        if key in spec:
+            rect[i] = spec[key]
+    if "position" in spec:
+        rect[0], rect[1] = spec["position"]
+
+    slot = {k: v for k, v in spec.items() if k not in GEOMETRY_KEYS}
+    if "layer" in spec:
+        slot["layer"] = spec["layer"]
+    if opacity is not None:
+        slot["opacity"] = opacity
+    if "asset" in slot and context:
+        slot["asset"] = slot["asset"].format(**context)
+
+    offset_x, offset_y = spec.get("offset", (0, 0))
+    if "resize" in spec:
+        rect[2], rect[3] = spec["resize"]
+        slot["resize"] = list(spec["resize"])
+    if "scale" in spec:
+        # 以 (带偏移的) 中心为基准缩放，偏移在此一并计入
+        center_x = rect[0] + rect[2] // 2 + offset_x
+        center_y = rect[1] + rect[3] // 2 + offset_y
+        new_w, new_h = int(rect[2] * spec["scale"]), int(rect[3] * spec["scale"])
+        rect = [center_x - new_w // 2, center_y - new_h // 2, new_w, new_h]
+        slot["resize"] = [new_w, new_h]
+    elif "fit" in spec:
+        # 等比缩放依赖素材原始尺寸，只能在渲染时确定；这里预先算好目标框，偏移留到放置时
+        fit_scale = spec.get("fit_scale", 1)
+        slot["target"] = [int(rect[2] * fit_scale), int(rect[3] * fit_scale)]
+        slot["offset"] = [offset_x, offset_y]
+    else:
+        rect[0] += offset_x
+        rect[1] += offset_y
+    slot["rect"] = rect
+
+    anchor = spec.get("anchor")
+    if anchor is not None:
+        if anchor not in ANCHORS:
+            raise LayoutError(f"槽位 {name}: 未知的锚点 {anchor!r}")
+        if "point" in spec:
+            slot["point"] = list(spec["point"])
+        elif anchor == "right":
+            slot["point"] = [rect[0] + rect[2], rect[1]]
+        elif anchor == "center":
+            slot["point"] = [rect[0] + rect[2] // 2, rect[1] + rect[3] // 2]
+        elif anchor == "bottom-right":
+            slot["point"] = [rect[0] + rect[2], rect[1] + rect[3]]
+        else:
+            slot["point"] = rect[:2]
+    return slot
+
+
+def _compile_variants(name, spec, layers):
+    """
+    编译按参数取值的变体 (例如段位ID -> 各自的坐标与素材)。
+    variants 为 {"range": [起, 止), "layer": 图层名模板, ...公共字段, "overrides": {键: 字段}}
+    或显式的 {键: 字段}；字段与槽位本身合并后编译，槽位级字段为默认值。
+    """
+    base = {k: v for k, v in spec.items() if k not in ("variants", "default", "variant_by")}
+    variants_spec = spec["variants"]
+    variant_by = spec.get("variant_by")
+    if "range" in variants_spec:
+        common = {k: v for k, v in variants_spec.items() if k not in ("range", "overrides")}
+        overrides = variants_spec.get("overrides", {})
+        items = []
+        for key in range(*variants_spec["range"]):
+            item = dict(common, **overrides.get(str(key), {}))
+            if "layer" in item:
+                item["layer"] = item["layer"].format(key=key)
+            items.append((key, item))
+    else:
+        items = list(variants_spec.items())
+
+    variants = {}
+    for key, item in items:
+        merged = dict(base, **item)
+        context = {variant_by: int(key)} if variant_by else None
+        variants[str(key)] = _compile_slot(f"{name}[{key}]", merged, layers, context)
+    return variants
+
+
+def compile_layout(analysis, binding):
+    """
+    由 psd_analyzer 的分析结果与绑定文件编译渲染计划。
+
+    :param analysis: 分析结果字典 (document_size + layers)
+    :param binding: 绑定字典，slots 为 {槽位名: 绑定字段}，按绘制顺序排列
+    :return: 可直接序列化为JSON的计划字典 {"version", "canvas", "order", "slots"}
+    :raises LayoutError: 绑定引用了不存在的图层或字段非法时
+    """
+    layers = _layer_rects(analysis)
+    size = analysis["document_size"]
+    slots = {}
+    for name, spec in binding["slots"].items():
+        if "variants" in spec:
+            base = {k: v for k, v in spec.items() if k not in ("variants", "default", "variant_by")}
+            slot = {k: v for k, v in spec.items() if k not in GEOMETRY_KEYS}
+            slot["variants"] = _compile_variants(name, spec, layers)
+            if "default" in spec:
+                slot["default"] = _compile_slot(f"{name}[default]", dict(base, **spec["default"]), layers)
+        else:
+            slot = _compile_slot(name, spec, layers)
+        slots[name] = slot
+    return {
+        "version": PLAN_VERSION,
+        "canvas": [size["width"], size["height"]],
+        "order": list(binding["slots"]),
+        "slots": slots,
+    }
+
+
+def check_scale(scale):
+    """
+    :return: 规范化后的缩放比例 (float)
+    :raises ValueError: 不是数字或不在 [MIN_SCALE, MAX_SCALE] 范围内时
+    """
+    try:
+        value = float(scale)
+    except (TypeError, ValueError):
+        raise ValueError(f"缩放比例必须为数字: {scale!r}") from None
+    if not MIN_SCALE <= value <= MAX_SCALE:
+        raise ValueError(f"缩放比例必须在 {MIN_SCALE:g} 到 {MAX_SCALE:g} 之间: {scale!r}")
+    return value
+
+
+def _scale_number(value, scale, minimum=None):
+    scaled = int(round(value * scale))
+    return max(minimum, scaled) if minimum is not None and value > 0 else scaled
+
+
+def _scale_slot(slot, scale):
+    scaled = dict(slot)
+    if "rect" in slot:
+        x, y, w, h = slot["rect"]
+        scaled["rect"] = [_scale_number(x, scale), _scale_number(y, scale),
+                          _scale_number(w, scale, 1), _scale_number(h, scale, 1)]
+    for key in SCALED_POSITIONS + SCALED_SIZES:
+        if key in slot:
+            minimum = 1 if key in SCALED_SIZES else None
+            value = slot[key]
+            if isinstance(value, list):
+                scaled[key] = [_scale_number(v, scale, minimum) for v in value]
+            else:
+                scaled[key] = _scale_number(value, scale, minimum)
+    if "blur_radius" in slot:
+        scaled["blur_radius"] = slot["blur_radius"] * scale
+    if "variants" in slot:
+        scaled["variants"] = {k: _scale_slot(v, scale) for k, v in slot["variants"].items()}
+    if "default" in slot:
+        scaled["default"] = _scale_slot(slot["default"], scale)
+    return scaled
+
+
+def scale_plan(plan, scale):
+    """
+    按比例缩放已编译的计划 (画布、坐标、尺寸、字号、模糊半径等)，用于直接以目标分辨率渲染缩略图。
+    坐标与尺寸各自取整，尺寸至少为1。
+    :return: 新的计划字典
+    """
+    scale = check_scale(scale)
+    return {
+        "version": plan["version"],
+        "canvas": [_scale_number(v, scale, 1) for v in plan["canvas"]],
+        "order": list(plan["order"]),
+        "slots": {name: _scale_slot(slot, scale) for name, slot in plan["slots"].items()},
+        "scale": scale * plan.get("scale", 1.0),
+    }
+
+
+class LayoutPlan:
+    """
+    编译后的渲染计划 (只读)。
+
+    槽位几何在编译时已全部算好；唯一依赖素材尺寸的等比缩放 (fit) 由 place() 计算，
+    结果按 (槽位, 原始尺寸) 记忆，同一素材只计算一次。
+    scaled() 得到按比例缩放的计划 (按 LRU 记忆最近的 MAX_SCALED_PLANS 个)，用于以较低分辨率直接渲染。
+    """
+
+    def __init__(self, plan, key=None):
+        self.plan = plan
+        self.key = key
+        self.scale = plan.get("scale", 1.0)
+        self.canvas = tuple(plan["canvas"])
+        self.order = list(plan["order"])
+        self.slots = plan["slots"]
+        self._placements = {}
+        self._scaled = AssetCache(max_bytes=MAX_SCALED_PLANS, sizeof=lambda plan: 1)
+
+    def slot(self, name):
+        return self.slots[name]
+
+    def rect(self, name):
+        return tuple(self.slots[name]["rect"])
+
+    def point(self, name):
+        return tuple(self.slots[name]["point"])
+
+    def scaled(self, scale):
+        """
+        :param scale: 相对于本计划的缩放比例，1 返回自身
+        :return: 缩放后的 LayoutPlan，键为 "<原键>@<比例>"
+        :raises ValueError: 比例超出允许范围时
+        """
+        scale = check_scale(scale)
+        if scale == 1:
+            return self
+        return self._scaled.get_or_load(
+            scale, lambda: LayoutPlan(scale_plan(self.plan, scale), f"{self.key}@{scale:g}"))
+
+    def variant(self, name, key):
+        """
+        :return: 槽位在 key 下的变体；没有该变体时返回 default，两者都没有时返回 None
+        """
+        slot = self.slots[name]
+        variant = slot["variants"].get(str(key))
+        return variant if variant is not None else slot.get("default")
+
+    def resolve(self, name, context):
+        """
+        按渲染参数选取槽位并展开素材名模板。
+        :param context: 渲染参数字典，需包含槽位的 variant_by 及素材名模板中用到的字段
+        :return: (槽位, 素材名)；没有匹配的变体时返回 (None, None)
+        """
+        slot = self.slots[name]
+        if "variants" in slot:
+            slot = self.variant(name, context.get(slot["variant_by"]))
+            if slot is None:
+                return None, None
+        asset = slot.get("asset")
+        return slot, asset.format(**context) if asset else None
+
+    def place(self, slot, src_size):
+        """
+        计算素材在槽位中的缩放尺寸与粘贴坐标。
+        :param slot: slot()/variant() 返回的槽位字典
+        :param src_size: 素材原始尺寸 (w, h)
+        :return: ((new_w, new_h), (paste_x, paste_y))，new 尺寸与原始相同时无需缩放
+        """
+        cache_key = (id(slot), tuple(src_size))
+        placement = self._placements.get(cache_key)
+        if placement is None:
+            placement = self._placements.setdefault(cache_key, _place(slot, src_size, self.scale))
+        return placement
+
+
+def _place(slot, src_size, scale=1.0):
+    x, y, w, h = slot["rect"]
+    src_w, src_h = src_size
+    fit = slot.get("fit")
+    if fit == "height":
+        # 按高度等比缩放，左上角对齐
+        return (int(src_w * h / src_h), h), (x, y)
+    if fit == "contain":
+        target_w, target_h = slot["target"]
+        fit_scale = min(target_w / src_w, target_h / src_h)
+        new_w, new_h = int(src_w * fit_scale), int(src_h * fit_scale)
+        offset_x, offset_y = slot.get("offset", (0, 0))
+        if slot.get("align") == "center":
+            x += (w - new_w) // 2
+            y += (h - new_h) // 2
+        return (new_w, new_h), (x + offset_x, y + offset_y)
+    if "resize" in slot:
+        return tuple(slot["resize"]), (x, y)
+    # 未指定尺寸的图层按原尺寸粘贴；缩放后的计划中按同一比例缩放素材
+    if scale != 1:
+        return (_scale_number(src_w, scale, 1), _scale_number(src_h, scale, 1)), (x, y)
+    return (src_w, src_h), (x, y)
+
+
+def load_binding(name, layouts_dir=LAYOUTS_DIR):
+    """:return: (binding, 分析结果, 用于缓存键的原始字节)"""
+    binding_path = os.path.join(layouts_dir, f"{name}.json")
+    with open(binding_path, 'rb') as f:
+        binding_bytes = f.read()
+    binding = json.loads(binding_bytes)
+    analysis_path = os.path.join(os.path.dirname(layouts_dir), binding["analysis"])
+    with open(analysis_path, 'rb') as f:
+        analysis_bytes = f.read()
+    return binding, json.loads(analysis_bytes), binding_bytes + b'\0' + analysis_bytes
+
+
+class LayoutStore:
+    """
+    渲染计划的两级缓存: 进程内按名称缓存 LayoutPlan，磁盘上按
+    (计划格式版本, 绑定文件, 分析结果) 的内容哈希保存编译结果，输入不变时不再重新编译。
+    """
+
+    def __init__(self, layouts_dir=LAYOUTS_DIR, cache_dir=DEFAULT_CACHE_DIR):
+        """
+        :param layouts_dir: 绑定文件目录 (其中 analysis 路径相对于此目录的上一级)
+        :param cache_dir: 编译结果的磁盘缓存目录，None 表示不写磁盘
+        """
+        self.layouts_dir = layouts_dir
+        self.cache_dir = cache_dir
+        self.compiles = 0
+        self._plans = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """
+        :return: 名为 name 的 LayoutPlan
+        :raises FileNotFoundError: 绑定文件或分析结果不存在时
+        :raises LayoutError: 编译失败时
+        """
+        plan = self._plans.get(name)
+        if plan is None:
+            with self._lock:
+                plan = self._plans.get(name)
+                if plan is None:
+                    plan = self._plans[name] = self._load(name)
+        return plan
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+    def _load(self, name):
+        binding, analysis, source = load_binding(name, self.layouts_dir)
+        key = hashlib.sha256(f"v{PLAN_VERSION}\0".encode('ascii') + source).hexdigest()
+        disk_path = os.path.join(self.cache_dir, f"{name}-{key[:16]}.json") if self.cache_dir else None
+        if disk_path:
+            try:
+                with open(disk_path, 'r', encoding='utf-8') as f:
+                    return LayoutPlan(json.load(f), key)
+            except (OSError, ValueError):
+                pass
+        plan = compile_layout(analysis, binding)
+        self.compiles += 1
+        logger.debug("编译渲染计划: %s", name, extra={"path": disk_path})
+        if disk_path:
+            self._save(plan, disk_path)
+        return LayoutPlan(plan, key)
+
+    def _save(self, plan, disk_path):
+        tmp_path = f"{disk_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(plan, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, disk_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+# 进程级共享实例
+layout_store = LayoutStore()
+
+
+def get_plan(name, scale=1):
+    """
+    获取名为 name 的渲染计划 (layouts/<name>.json)。
+    :param scale: 可选，缩放比例 (例如 0.5 用于缩略图)，见 LayoutPlan.scaled
+    """
+    return layout_store.get(name).scaled(scale)
@@ -0,0 +1,99 @@
+import threading
+from collections import OrderedDict
+from PIL import Image, ImageDraw
+from modules import font_registry
+
+
+class OutlineTextRenderer:
+    """
+    描边文字渲染器。
+
+    每个字形只光栅化一次，得到覆盖率蒙版 (L)；绘制时按与逐偏移重复 draw.text 相同的顺序
+    以该蒙版粘贴描边色与字体颜色 (draw.text 在 RGBA 上即为以覆盖率蒙版粘贴纯色)，
+    结果与原实现逐像素一致。字形蒙版按 (字体, 字号, 字符) LRU 缓存，
+    版面由缓存的字宽计算，整串结果另有一层 LRU 缓存。
+    """
+
+    def __init__(self, max_strings=256, max_glyphs=4096):
+        self.max_strings = max_strings
+        self.max_glyphs = max_glyphs
+        self._glyphs = OrderedDict()
+        self._strings = OrderedDict()
+        self._lock = threading.Lock()
+
+    def glyph(self, font_path, font_size, char):
+        """
+        获取字形蒙版。
+        :return: (mask, origin_x, origin_y, advance, height)
+                 mask 为字形覆盖率蒙版，笔位 (x, y) 处的字形应贴在 (x - origin_x, y - origin_y)；
+                 advance 为字形宽度 (bbox 宽)，height 为字形高度 (bbox 高)
+        """
+        key = (font_path, font_size, char)
+        with self._lock:
+            cached = self._glyphs.get(key)
+            if cached is not None:
+                self._glyphs.move_to_end(key)
+                return cached
+        font = font_registry.get_font(font_path, font_size)
+        left, top, right, bottom = font.getbbox(char)
+        # 字形可能画到笔位左侧或上方，留出余量以免被裁掉
+        origin_x, origin_y = max(0, -left), max(0, -top)
+        mask = Image.new('L', (max(origin_x + right, 1), max(origin_y + bottom, 1)), 0)
+        ImageDraw.Draw(mask).text((origin_x, origin_y), char, font=font, fill=255)
+        cached = (mask, origin_x, origin_y, right - left, bottom - top)
+        with self._lock:
+            self._glyphs[key] = cached
+            while len(self._glyphs) > self.max_glyphs:
+                self._glyphs.popitem(last=False)
+        return cached
+
+    def render(self, text, font_path, font_size, letter_spacing=0, outline_width=2,
+               fill=(255, 255, 255, 255), outline_fill=(0, 0, 0, 255)):
+        """
+        生成带描边文字的透明底图片 (共享对象，只读使用)。
+        版面与原逐字绘制一致: 字宽取 bbox 宽度，字距为 letter_spacing，
+        图片高 = 最大字高 + 2*描边宽度 + descent。
+        """
+        key = (text, font_path, font_size, letter_spacing, outline_width, tuple(fill), tuple(outline_fill))
+        with self._lock:
+            img = self._strings.get(key)
+            if img is not None:
+                self._strings.move_to_end(key)
+                return img
+
+        glyphs = [self.glyph(font_path, font_size, char) for char in text]
+        total_width = sum(advance for _, _, _, advance, _ in glyphs)
+        if glyphs:
+            total_width += letter_spacing * (len(glyphs) - 1)  # 最后一个字不加字距
+        max_height = max((height for _, _, _, _, height in glyphs), default=0)
+        _, descent = font_registry.get_font(font_path, font_size).getmetrics()
+        img = Image.new(
+            'RGBA',
+            (max(total_width + 2 * outline_width, 0), max_height + 2 * outline_width + descent),
+            (0, 0, 0, 0),
+        )
+        outline_fill, fill = tuple(outline_fill), tuple(fill)
+        x = y = outline_width
+        for mask, origin_x, origin_y, advance, _ in glyphs:
+            # 逐字先画 (2w+1)²-1 个偏移的描边，再画字体颜色，后一个字覆盖前一个字
+            for dx in range(-outline_width, outline_width + 1):
+                for dy in range(-outline_width, outline_width + 1):
+                    if dx or dy:
+                        img.paste(outline_fill, (x + dx - origin_x, y + dy - origin_y), mask)
+            img.paste(fill, (x - origin_x, y - origin_y), mask)
+            x += advance + letter_spacing
+
+        with self._lock:
+            self._strings[key] = img
+            while len(self._strings) > self.max_strings:
+                self._strings.popitem(last=False)
+        return img
+
+    def clear(self):
+        with self._lock:
+            self._glyphs.clear()
+            self._strings.clear()
+
+
+# 进程级共享实例
+outline_renderer = OutlineTextRenderer()
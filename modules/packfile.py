@@ -0,0 +1,144 @@
+import os
+import json
+import mmap
+import struct
+import threading
+from PIL import Image
+
+# 打包文件格式:
+#   文件头  MAGIC(8) + 格式版本(u32) + 索引偏移(u64) + 索引长度(u32)
+#   数据区  各条目的原始字节 (RGBA 像素)，起始位置按 ALIGNMENT 对齐
+#   索引    UTF-8 JSON: {"meta": {...}, "entries": {键: {"offset", "length", "size", ...}}}
+MAGIC = b"B50PACK\0"
+PACK_VERSION = 1
+HEADER = struct.Struct("<8sIQI")
+ALIGNMENT = 64
+
+
+class PackError(ValueError):
+    """打包文件损坏或版本不兼容"""
+
+
+def write_pack(path, entries, meta=None):
+    """
+    写入打包文件 (先写临时文件再原子替换，读取中的旧文件不受影响)。
+    :param path: 输出路径
+    :param entries: 可迭代对象，元素为 (键, 附加信息字典, 字节数据)；附加信息原样写入索引
+    :param meta: 可选，写入索引的全局信息
+    :return: 条目数量
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    index = {}
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, PACK_VERSION, 0, 0))
+            for key, info, data in entries:
+                padding = -f.tell() % ALIGNMENT
+                f.write(b"\0" * padding)
+                entry = dict(info)
+                entry["offset"] = f.tell()
+                entry["length"] = len(data)
+                f.write(data)
+                index[key] = entry
+            index_offset = f.tell()
+            index_bytes = json.dumps({"meta": meta or {}, "entries": index},
+                                     ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            f.write(index_bytes)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, PACK_VERSION, index_offset, len(index_bytes)))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(index)
+
+
+class PackFile:
+    """
+    以 mmap 只读映射的打包文件。
+
+    条目数据以 memoryview 切片返回，不复制；由 image() 得到的 PIL.Image 直接引用映射内存
+    (只读，粘贴到其他画布上是安全的)。多个进程映射同一文件时共享操作系统的页缓存。
+    映射在对象存活期间一直保持打开 (切片仍可能被图片引用)。
+    """
+
+    def __init__(self, path):
+        """
+        :raises FileNotFoundError: 文件不存在时
+        :raises PackError: 文件损坏或版本不兼容时
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < HEADER.size:
+            raise PackError(f"打包文件过短: {path}")
+        magic, version, index_offset, index_length = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != PACK_VERSION:
+            raise PackError(f"不支持的打包文件: {path}")
+        try:
+            index = json.loads(self._mmap[index_offset:index_offset + index_length])
+        except ValueError as e:
+            raise PackError(f"打包文件索引损坏: {path}") from e
+        self.meta = index["meta"]
+        self.entries = index["entries"]
+        self._view = memoryview(self._mmap)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def view(self, key):
+        """:return: 条目数据的 memoryview 切片 (不复制)"""
+        entry = self.entries[key]
+        return self._view[entry["offset"]:entry["offset"] + entry["length"]]
+
+    def image(self, key):
+        """:return: 引用映射内存的 RGBA 图片 (条目需带 size 字段)"""
+        return Image.frombuffer('RGBA', tuple(self.entries[key]["size"]), self.view(key), 'raw', 'RGBA', 0, 1)
+
+
+class LazyPack:
+    """
+    按需打开的 PackFile: 首次使用时映射文件，文件不存在或损坏时视为空。
+    文件被重新生成 (mtime 变化) 后，在 reload() 时重新映射。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._pack = None
+        self._checked = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        """:return: PackFile，不可用时返回 None"""
+        if not self._checked:
+            with self._lock:
+                if not self._checked:
+                    self._pack = self._open()
+                    self._checked = True
+        return self._pack
+
+    def reload(self):
+        """文件有变化时重新映射 (旧映射随引用它的图片一起释放)"""
+        with self._lock:
+            try:
+                mtime_ns = os.stat(self.path).st_mtime_ns
+            except OSError:
+                mtime_ns = None
+            if self._pack is None or self._pack.mtime_ns != mtime_ns:
+                self._pack = self._open()
+            self._checked = True
+        return self._pack
+
+    def _open(self):
+        try:
+            return PackFile(self.path)
+        except (OSError, PackError, ValueError):
+            return None
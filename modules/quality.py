@@ -0,0 +1,73 @@
+import math
+from PIL import Image, ImageFilter
+
+# 渲染质量档位
+#
+# | 档位  | 素材缩放  | 封面模糊                                          | 背景条生成 | 与 full 的差异 (0-255)       |
+# |-------|-----------|---------------------------------------------------|------------|------------------------------|
+# | full  | LANCZOS   | 整张封面原尺寸 GaussianBlur                       | 6.4ms (1x) | 无，与既有输出逐像素一致     |
+# | fast  | BICUBIC   | 可见横条缩小1/2 -> BoxBlur -> BILINEAR 放大       | 2.4ms      | 平均约0.5，最大约10          |
+# | draft | BILINEAR  | 可见横条缩小1/4 -> BoxBlur -> BILINEAR 放大       | 2.3ms      | 平均约0.5，最大约17          |
+#
+# 背景条耗时为单张 400x400 封面由封面包取得缩放结果后的模糊、裁切与蒙版 (单核，Pillow 12)；
+# 差异为叠加40%黑色蒙版后的像素差，目视无法分辨。
+# 背景条由 jacket_store 按封面缓存，档位只影响缓存未命中的请求；文字绘制等其余步骤各档位相同。
+# 预缩放图集 (sprite_atlas) 与封面包 (jacket_pack) 在所有档位下都直接使用 (LANCZOS 预缩放，无缩放开销)，
+# 因此有图集时各档位的小图标完全相同，素材缩放滤镜只作用于图集之外的素材。
+# 单元格与背景条的缓存键都包含档位，不同档位的结果互不覆盖。
+# 适用场景: full 用于最终出图；fast/draft 用于聊天预览等对画质不敏感、需要低CPU占用的请求。
+QUALITY_TIERS = {
+    "full": {"resample": Image.Resampling.LANCZOS, "blur_reduce": 1},
+    "fast": {"resample": Image.Resampling.BICUBIC, "blur_reduce": 2},
+    "draft": {"resample": Image.Resampling.BILINEAR, "blur_reduce": 4},
+}
+
+DEFAULT_QUALITY = "full"
+
+
+def check_quality(quality):
+    """
+    :return: 档位名 (None 视为 DEFAULT_QUALITY)
+    :raises ValueError: 未知档位时
+    """
+    if quality is None:
+        return DEFAULT_QUALITY
+    if quality not in QUALITY_TIERS:
+        raise ValueError(f"未知的渲染质量: {quality} (可选: {', '.join(QUALITY_TIERS)})")
+    return quality
+
+
+def resample_filter(quality=DEFAULT_QUALITY):
+    """:return: 该档位缩放素材使用的重采样滤镜"""
+    return QUALITY_TIERS[check_quality(quality)]["resample"]
+
+
+def blur_reduce(quality=DEFAULT_QUALITY):
+    """:return: 该档位近似模糊时的缩小倍数，1 表示原尺寸高斯模糊"""
+    return QUALITY_TIERS[check_quality(quality)]["blur_reduce"]
+
+
+def box_radius(sigma):
+    """
+    与标准差 sigma 的高斯模糊方差相同的单次 BoxBlur 半径 (窗口 2r+1 的方差为 r(r+1)/3)。
+    """
+    return (math.sqrt(1 + 12 * sigma * sigma) - 1) / 2
+
+
+def blur(img, radius, quality=DEFAULT_QUALITY):
+    """
+    按档位模糊图片。full 为原尺寸 GaussianBlur (与既有输出一致)；
+    其他档位先按 blur_reduce 缩小 (区域平均)，在小图上做等效方差的单次 BoxBlur，再 BILINEAR 放大回原尺寸。
+    :param radius: GaussianBlur 半径 (标准差)
+    :return: 与 img 尺寸相同的新图片
+    """
+    factor = blur_reduce(quality)
+    if factor <= 1 or min(img.size) < factor * 4:
+        return img.filter(ImageFilter.GaussianBlur(radius=radius))
+    # 完全不透明的图片 (封面) 在 RGB 下处理，放大的开销约为 RGBA 的一半
+    opaque = img.mode == 'RGBA' and img.getchannel('A').getextrema() == (255, 255)
+    work = img.convert('RGB') if opaque else img
+    small = work.reduce(factor)
+    small = small.filter(ImageFilter.BoxBlur(box_radius(radius / factor)))
+    result = small.resize(img.size, Image.Resampling.BILINEAR)
+    return result.convert('RGBA') if opaque else result
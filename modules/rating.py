@@ -0,0 +1,171 @@
+import math
+from bisect import bisect_right
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖 (不在 requirements.txt 中)，缺失时批量接口逐条 bisect
+    np = None
+
+# --- 常量 ---
+
+# Rating 计算表
+RATING_TABLE = [
+    {"min": 0, "max": 0, "offset": 0},
+    {"min": 100000, "max": 199999, "offset": 16},
+    {"min": 200000, "max": 299999, "offset": 32},
+    {"min": 300000, "max": 399999, "offset": 48},
+    {"min": 400000, "max": 499999, "offset": 64},
+    {"min": 500000, "max": 599999, "offset": 80},
+    {"min": 600000, "max": 699999, "offset": 96},
+    {"min": 700000, "max": 749999, "offset": 112},
+    {"min": 750000, "max": 799999, "offset": 120},
+    {"min": 800000, "max": 899999, "offset": 136},
+    {"min": 900000, "max": 939999, "offset": 152},
+    {"min": 940000, "max": 969999, "offset": 168},
+    {"min": 970000, "max": 979999, "offset": 200},
+    {"min": 980000, "max": 989999, "offset": 203},
+    {"min": 990000, "max": 994999, "offset": 208},
+    {"min": 995000, "max": 999999, "offset": 211},
+    {"min": 1000000, "max": 1004999, "offset": 216},
+    {"min": 1005000, "max": float('inf'), "offset": 224}
+]
+
+# --- Rank辅助函数 ---
+RANK_TABLE = [
+    (0, "D"),
+    (100000, "D"),
+    (200000, "D"),
+    (300000, "D"),
+    (400000, "D"),
+    (500000, "C"),
+    (600000, "B"),
+    (700000, "BB"),
+    (750000, "BBB"),
+    (799999, "BBB"),
+    (800000, "A"),
+    (900000, "AA"),
+    (940000, "AAA"),
+    (969999, "AAA"),
+    (970000, "S"),
+    (980000, "S+"),
+    (989999, "S+"),
+    (990000, "SS"),
+    (995000, "SS+"),
+    (999999, "SS+"),
+    (1000000, "SSS"),
+    (1004999, "SSS"),
+    (1005000, "SSS+")
+]
+
+# Rank -> assets下的图片文件名
+RANK_ASSETS = {
+    "D": "UI_GAM_Rank_D.png",
+    "C": "UI_GAM_Rank_C.png",
+    "B": "UI_GAM_Rank_B.png",
+    "BB": "UI_GAM_Rank_BB.png",
+    "BBB": "UI_GAM_Rank_BBB.png",
+    "A": "UI_GAM_Rank_A.png",
+    "AA": "UI_GAM_Rank_AA.png",
+    "AAA": "UI_GAM_Rank_AAA.png",
+    "S": "UI_GAM_Rank_S.png",
+    "S+": "UI_GAM_Rank_Sp.png",
+    "SS": "UI_GAM_Rank_SS.png",
+    "SS+": "UI_GAM_Rank_SSp.png",
+    "SSS": "UI_GAM_Rank_SSS.png",
+    "SSS+": "UI_GAM_Rank_SSSp.png"
+}
+
+# 达成率上限 (100.5000%)
+ACHIEVEMENT_CAP = 1005000
+
+# --- 预计算断点 ---
+
+_RATING_MINS = [record["min"] for record in RATING_TABLE]
+_RATING_MAXS = [record["max"] for record in RATING_TABLE]
+_RATING_OFFSETS = [record["offset"] for record in RATING_TABLE]
+_RANK_THRESHOLDS = [threshold for threshold, _ in RANK_TABLE]
+_RANK_NAMES = [rank for _, rank in RANK_TABLE]
+
+# --- 单条计算 ---
+
+def rating_offset(achievement):
+    """
+    返回达成率所在区间的系数，不在任何区间内时为0。
+    """
+    i = bisect_right(_RATING_MINS, achievement) - 1
+    if i >= 0 and achievement <= _RATING_MAXS[i]:
+        return _RATING_OFFSETS[i]
+    return 0
+
+def calculate_rating(achievement, base):
+    """
+    根据达成率和谱面定数计算Rating。
+    """
+    if achievement == 0:
+        return 0
+
+    offset = rating_offset(achievement)
+
+    # 公式: floor(min(达成率, 100.5000%) * offset * base / 1000000 / 10)
+    return math.floor(min(achievement, ACHIEVEMENT_CAP) * offset * base / 1000000 / 10)
+
+def get_rank_by_achievement(achievement):
+    """
+    根据达成率返回Rank字符串。
+    """
+    i = bisect_right(_RANK_THRESHOLDS, achievement) - 1
+    return _RANK_NAMES[i] if i >= 0 else "D"
+
+def rank_to_asset_name(rank):
+    """
+    根据Rank字符串返回assets下的图片文件名。
+    """
+    return RANK_ASSETS.get(rank, "UI_GAM_Rank_D.png")
+
+# --- 批量计算 ---
+
+RatingBatch = namedtuple("RatingBatch", ["ratings", "ranks", "rank_assets"])
+
+def rate_batch(achievements, bases):
+    """
+    批量计算Rating、Rank及Rank图标文件名，结果与逐条调用
+    calculate_rating / get_rank_by_achievement / rank_to_asset_name 完全一致。
+
+    按 requirements.txt 安装时没有 numpy，逐条 bisect 并返回列表，这是常规路径；
+    另行安装了 numpy 时使用 searchsorted 向量化计算，返回 numpy 数组。
+    两条路径与原线性查表的一致性见 test/test_rating.py。
+    :param achievements: 达成率序列 (整数, e.g., 1010000)
+    :param bases: 谱面定数序列，与 achievements 等长
+    :return: RatingBatch(ratings, ranks, rank_assets)
+    :raises ValueError: achievements 与 bases 长度不一致时
+    """
+    if np is None:
+        achievements, bases = list(achievements), list(bases)
+        if len(achievements) != len(bases):
+            raise ValueError("achievements 与 bases 长度不一致")
+        ratings = [calculate_rating(a, b) for a, b in zip(achievements, bases)]
+        ranks = [get_rank_by_achievement(a) for a in achievements]
+        return RatingBatch(ratings, ranks, [rank_to_asset_name(r) for r in ranks])
+
+    achievements = np.asarray(achievements)
+    bases = np.asarray(bases, dtype=np.float64)
+    if achievements.shape != bases.shape:
+        raise ValueError("achievements 与 bases 长度不一致")
+
+    # Rating: 定位区间后校验上界，区间外系数为0
+    i = np.searchsorted(_RATING_MINS, achievements, side='right') - 1
+    safe_i = np.clip(i, 0, None)
+    in_range = (i >= 0) & (achievements <= np.asarray(_RATING_MAXS)[safe_i])
+    offsets = np.where(in_range, np.asarray(_RATING_OFFSETS)[safe_i], 0)
+    # 与单条公式相同的运算顺序，保证浮点结果逐位一致
+    ratings = np.floor(np.minimum(achievements, ACHIEVEMENT_CAP) * offsets * bases / 1000000 / 10)
+    ratings = ratings.astype(np.int64)
+
+    # Rank
+    j = np.searchsorted(_RANK_THRESHOLDS, achievements, side='right') - 1
+    rank_names = np.asarray(["D"] + _RANK_NAMES)
+    ranks = rank_names[j + 1]
+    asset_names = np.asarray([rank_to_asset_name(r) for r in rank_names])
+    rank_assets = asset_names[j + 1]
+    return RatingBatch(ratings, ranks, rank_assets)
@@ -0,0 +1,237 @@
+import io
+import os
+import json
+import hashlib
+import threading
+from PIL import Image
+
+from modules.asset_cache import AssetCache
+from modules.encoder import encode_image
+from modules.song_cell import generate_song_cell, LAYOUT_VERSION, CELL_PLAN
+from modules.quality import DEFAULT_QUALITY, check_quality
+from modules.layout import check_scale
+
+try:
+    _project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+except NameError:
+    _project_root = os.path.abspath('.')
+
+DEFAULT_CACHE_DIR = os.path.join(_project_root, 'cache', 'cells')
+
+# generate_song_cell 的参数及默认值
+CELL_DEFAULTS = {
+    "fc_indicator": 0,
+    "fs_indicator": 0,
+    "quality": DEFAULT_QUALITY,
+    "scale": 1,
+}
+
+
+def cell_cache_key(params, asset_version=''):
+    """
+    单元格缓存键: generate_song_cell 全部参数 (含质量档位与缩放比例) + 版面版本 + 渲染计划 + 素材版本 的稳定哈希。
+    :raises ValueError: 质量档位未知或缩放比例超出允许范围时
+    """
+    args = dict(CELL_DEFAULTS)
+    args.update(params)
+    args["cover_id"] = str(args["cover_id"]).zfill(6)
+    args["quality"] = check_quality(args["quality"])
+    args["scale"] = check_scale(args["scale"])
+    payload = json.dumps(
+        {"args": args, "layout": LAYOUT_VERSION, "plan": CELL_PLAN.key, "assets": asset_version},
+        sort_keys=True, ensure_ascii=False, separators=(',', ':'),
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    """
+    单元格渲染结果的两级缓存 (内容寻址)。
+
+    内存层为按字节上限淘汰的 LRU；磁盘层以 PNG 文件保存，总大小超过上限时
+    按最近使用时间 (mtime，命中时刷新) 淘汰最旧的文件。磁盘层可被多个进程共享。
+
+    磁盘占用 (_disk_usage) 是每个进程各自的估计值: 首次写入时扫描目录，之后只累加本进程的写入，
+    淘汰前会重新扫描得到实际占用。多个进程共享目录时，其他进程的写入要到下次扫描才会计入，
+    因此目录实际大小可能短暂超过 disk_bytes (至多为各进程自上次扫描以来写入量之和)。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, memory_bytes=64 * 1024 * 1024,
+                 disk_bytes=512 * 1024 * 1024, asset_version='', render=generate_song_cell):
+        """
+        :param cache_dir: 磁盘层目录，None 表示只使用内存层
+        :param memory_bytes: 内存层上限 (字节)
+        :param disk_bytes: 磁盘层上限 (字节)
+        :param asset_version: 素材版本标识 (例如游戏版本号)，素材更新后修改即可使旧缓存失效
+        :param render: 渲染函数，默认为 generate_song_cell
+        """
+        self.cache_dir = cache_dir
+        self.disk_bytes = disk_bytes
+        self.asset_version = asset_version
+        self.render = render
+        self.memory = AssetCache(max_bytes=memory_bytes)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_evictions = 0
+        self._disk_usage = None
+        self._lock = threading.Lock()
+
+    def key(self, params):
+        return cell_cache_key(params, self.asset_version)
+
+    def get_cell(self, params):
+        """
+        获取单元格图片 (共享对象，只读使用)，未命中时渲染并写入两级缓存。
+        :param params: generate_song_cell 参数字典
+        :return: PIL.Image
+        """
+        key = self.key(params)
+        loaded = []
+
+        def load():
+            loaded.append(True)
+            data = self._read_disk(key)
+            if data is not None:
+                with Image.open(io.BytesIO(data)) as cached:
+                    return cached.convert('RGBA')
+            img = self._render(params)
+            self._write_disk(key, _encode(img))
+            return img
+
+        img = self.memory.get_or_load(key, load)
+        if not loaded:
+            with self._lock:
+                self.memory_hits += 1
+        return img
+
+    def get_cell_bytes(self, params):
+        """
+        获取单元格的PNG编码字节，磁盘层命中时不解码图片。
+        """
+        key = self.key(params)
+        data = self._read_disk(key)
+        if data is not None:
+            return data
+        data = _encode(self.get_cell(params))
+        if self.cache_dir and not os.path.exists(self._disk_path(key)):
+            self._write_disk(key, data)
+        return data
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory": self.memory.stats(),
+                "disk_bytes": self._disk_usage,  # 本进程的估计值，见类说明
+                "disk_max_bytes": self.disk_bytes,
+                "disk_evictions": self.disk_evictions,
+            }
+
+    # --- 内部实现 ---
+
+    def _render(self, params):
+        with self._lock:
+            self.misses += 1
+        return self.render(**params)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.png")
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # 刷新 mtime，作为LRU淘汰依据
+            os.utime(path)
+        except OSError:
+            return None
+        with self._lock:
+            self.disk_hits += 1
+        return data
+
+    def _write_disk(self, key, data):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self._lock:
+            if self._disk_usage is None:
+                self._disk_usage = self._scan_disk_usage()
+            else:
+                self._disk_usage += len(data)
+            over = self._disk_usage > self.disk_bytes
+        if over:
+            self._evict_disk()
+
+    def _scan_disk_usage(self):
+        total = 0
+        for entry in self._iter_disk_entries():
+            total += entry[2]
+        return total
+
+    def _iter_disk_entries(self):
+        """遍历磁盘层文件，返回 (mtime, path, size)"""
+        try:
+            shards = list(os.scandir(self.cache_dir))
+        except OSError:
+            return
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            try:
+                entries = list(os.scandir(shard.path))
+            except OSError:  # 分片目录可能刚被其他进程删除
+                continue
+            for entry in entries:
+                if not entry.name.endswith('.png'):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                yield st.st_mtime, entry.path, st.st_size
+
+    def _evict_disk(self):
+        """淘汰最久未使用的文件，直到占用降到上限的90%"""
+        entries = sorted(self._iter_disk_entries())
+        total = sum(size for _, _, size in entries)
+        target = self.disk_bytes * 0.9
+        evicted = 0
+        for _, path, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._disk_usage = total
+            self.disk_evictions += evicted
+
+
+def _encode(img):
+    # 缓存文件只在本机读写，用最快的压缩级别
+    return encode_image(img, format='PNG', compress_level=1)
+
+
+# 进程级共享实例
+cell_cache = RenderCache()
@@ -0,0 +1,112 @@
+import json
+import time
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RenderClient:
+    """
+    渲染服务的同步客户端，每个线程各自持有一条 keep-alive 连接。
+    """
+
+    def __init__(self, host='127.0.0.1', port=8050, timeout=60.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def request(self, method, path, payload=None):
+        """
+        发送请求。
+        :return: (status, content_type, body_bytes)
+        """
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8') if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+                if resp.getheader("Connection", "").lower() == "close":
+                    self.close()
+                return resp.status, resp.getheader("Content-Type", ""), data
+            except (ConnectionError, http.client.HTTPException):
+                # 服务端关闭了空闲连接时重连一次
+                self.close()
+                if attempt:
+                    raise
+
+    def render(self, job_type, params):
+        """
+        渲染并返回PNG字节。
+        :raises RuntimeError: 服务返回非200状态时
+        """
+        status, _, data = self.request("POST", f"/render/{job_type}", params)
+        if status != 200:
+            raise RuntimeError(f"渲染失败 ({status}): {data.decode('utf-8', 'replace')}")
+        return data
+
+    def health(self):
+        _, _, data = self.request("GET", "/health")
+        return json.loads(data)
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def load_test(job_type, params, requests=100, concurrency=8, host='127.0.0.1', port=8050):
+    """
+    对渲染服务做简单压测。
+    :return: dict，包含状态码分布、吞吐量与延迟分位数 (秒)
+    """
+    client = RenderClient(host, port)
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def one(_):
+        start = time.perf_counter()
+        try:
+            status, _, _ = client.request("POST", f"/render/{job_type}", params)
+        except OSError:
+            status = "error"
+        elapsed = time.perf_counter() - start
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "wall_time": wall,
+        "throughput": len(latencies) / wall if wall else 0.0,
+        "p50": _percentile(latencies, 0.50),
+        "p90": _percentile(latencies, 0.90),
+        "p99": _percentile(latencies, 0.99),
+    }
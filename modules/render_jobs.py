@@ -0,0 +1,89 @@
+from modules import song_cell, top_panel
+from modules.b50 import generate_b50
+from modules.render_cache import cell_cache
+from modules.sprite_atlas import sprite_atlas
+from modules.jacket_pack import jacket_pack
+from modules.quality import check_quality
+from modules.layout import check_scale
+from modules.top_panel import create_panel_image
+from modules.encoder import encode_image, resolve_options
+
+# 支持的任务类型
+JOB_TYPES = ("cell", "panel", "b50")
+
+
+class JobError(ValueError):
+    """任务格式或参数错误"""
+
+
+def warm_up():
+    """
+    预加载字体、常用素材、静态模板与素材索引，并映射图集与封面包，
+    用作工作进程的 initializer 或 worker_pool 孵化进程的预热函数。
+    """
+    song_cell.warm_up_fonts()
+    song_cell.warm_up_assets()
+    song_cell.warm_up_templates()
+    top_panel.warm_up_fonts()
+    top_panel.warm_up_assets()
+    sprite_atlas.pack.get()
+    jacket_pack.pack.get()
+    return True
+
+
+def check_params(params):
+    """
+    校验与任务类型无关的参数: 参数须为对象，渲染质量档位已知，缩放比例在允许范围内。
+    :raises JobError: 参数无效时
+    """
+    if not isinstance(params, dict):
+        raise JobError("params 必须是对象")
+    try:
+        check_quality(params.get("quality"))
+        check_scale(params.get("scale", 1))
+    except ValueError as e:
+        raise JobError(str(e)) from e
+
+
+def render_job_image(job_type, params):
+    """
+    执行一个渲染任务。
+    :param job_type: "cell" | "panel" | "b50"
+    :param params: cell 为 generate_song_cell 参数；panel 为 create_panel_image 参数；
+                   b50 为 {"player": {...}, "records": [...]}；
+                   均可带 "quality" (渲染质量档位) 与 "scale" (缩放比例)
+    :return: PIL.Image
+    :raises JobError: 任务类型未知或参数不完整时
+    """
+    check_params(params)
+    try:
+        if job_type == "cell":
+            return cell_cache.get_cell(params)
+        if job_type == "panel":
+            params = dict(params)
+            params.pop("output_filename", None)
+            params.pop("encode", None)
+            return create_panel_image(output_filename=None, **params)
+        if job_type == "b50":
+            return generate_b50(params["player"], params["records"],
+                                quality=params.get("quality"), scale=params.get("scale", 1))
+    except (KeyError, TypeError) as e:
+        raise JobError(f"参数错误: {e}") from e
+    raise JobError(f"未知的任务类型: {job_type}")
+
+
+def render_job(job_type, params, encode=None):
+    """
+    执行渲染任务并编码为字节，可直接提交到进程池。
+    :param encode: 可选，编码参数 (可含 preset)，见 encoder.resolve_options / encode_image；默认为PNG
+    :raises JobError: 任务或编码参数错误时
+    """
+    try:
+        options = resolve_options(**(encode or {}))
+    except (TypeError, ValueError) as e:
+        raise JobError(f"编码参数错误: {e}") from e
+    img = render_job_image(job_type, params)
+    try:
+        return encode_image(img, **options)
+    except (TypeError, ValueError) as e:
+        raise JobError(f"编码参数错误: {e}") from e
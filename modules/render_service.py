@@ -0,0 +1,339 @@
+import json
+import time
+import signal
+import itertools
+import asyncio
+import logging
+from urllib.parse import parse_qsl
+
+from modules.render_jobs import JOB_TYPES, JobError, check_params, render_job, warm_up
+from modules.worker_pool import WorkerSupervisor, create_executor
+from modules.encoder import MIME_TYPES, resolve_options
+
+logger = logging.getLogger(__name__)
+
+# HTTP 状态码说明
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+# 可通过查询参数指定的编码参数及其类型
+ENCODE_PARAMS = {
+    "preset": str,
+    "format": str,
+    "quality": int,
+    "compress_level": int,
+    "quantize": int,
+}
+
+
+def parse_encode_options(query):
+    """
+    解析查询参数中的编码选项，例如 ?format=webp&quality=80 或 ?preset=png-fast。
+    :return: resolve_options 合并后的编码参数
+    :raises ValueError: 参数无效时
+    """
+    options = {}
+    for name, value in parse_qsl(query):
+        if name not in ENCODE_PARAMS:
+            raise ValueError(f"未知的参数: {name}")
+        options[name] = ENCODE_PARAMS[name](value)
+    options = resolve_options(**options)
+    options["format"] = options.get("format", "PNG").upper()
+    if options["format"] == "JPG":
+        options["format"] = "JPEG"
+    if options["format"] not in MIME_TYPES:
+        raise ValueError(f"不支持的编码格式: {options['format']}")
+    return options
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class RenderService:
+    """
+    本地渲染服务: asyncio HTTP 前端 + 预热的进程池。
+
+    路由:
+        POST /render/cell   body 为 generate_song_cell 参数
+        POST /render/panel  body 为 create_panel_image 参数
+        POST /render/b50    body 为 {"player": {...}, "records": [...]}
+        GET  /health        运行状态与计数
+
+    渲染结果默认为PNG，可用查询参数选择编码，例如 /render/b50?format=webp&quality=80。
+
+    同时处理 (排队 + 渲染中) 的请求数超过 max_pending 时直接返回 429；
+    单个请求超过 timeout 秒返回 504 (已提交到进程池的任务无法中断，会在后台跑完)。
+    """
+
+    def __init__(self, host='127.0.0.1', port=8050, workers=2, max_pending=None,
+                 timeout=30.0, max_body=4 * 1024 * 1024, executor=None, max_jobs_per_worker=None,
+                 max_header_lines=100, max_header_bytes=16 * 1024):
+        """
+        :param workers: 工作进程数
+        :param max_pending: 同时处理的请求上限，默认为 workers * 4
+        :param timeout: 单个请求的超时时间 (秒)
+        :param max_body: 请求体大小上限 (字节)
+        :param executor: 可选，外部提供的执行器 (需实现 submit/shutdown)
+        :param max_jobs_per_worker: 可选，每个工作进程执行多少个任务后替换为新进程
+        :param max_header_lines: 请求头行数上限
+        :param max_header_bytes: 请求行与请求头的总大小上限 (字节)
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_pending = max_pending or workers * 4
+        self.timeout = timeout
+        self.max_body = max_body
+        self.max_header_lines = max_header_lines
+        self.max_header_bytes = max_header_bytes
+        self.executor = executor
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.pending = 0
+        self.counters = {"requests": 0, "rendered": 0, "rejected": 0, "timeouts": 0, "errors": 0}
+        self.started_at = None
+        self._server = None
+        self._idle = None
+        self._stopping = False
+        self._connections = {}
+
+    # --- 生命周期 ---
+
+    async def start(self):
+        """启动进程池 (并等待全部工作进程预热完成) 与 HTTP 监听"""
+        loop = asyncio.get_running_loop()
+        if self.executor is None:
+            self.executor = create_executor(self.workers, warm_up, self.max_jobs_per_worker)
+        if isinstance(self.executor, WorkerSupervisor):
+            # 预热一次后 fork 全部工作进程；在开始监听前同步完成，监听套接字不会被工作进程继承
+            self.executor.start()
+        else:
+            # 同时提交与进程数相同的任务，促使进程池一次性拉起全部工作进程
+            await asyncio.gather(*(
+                loop.run_in_executor(self.executor, warm_up) for _ in range(self.workers)
+            ))
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port,
+                                                  limit=self.max_header_bytes)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.started_at = time.time()
+
+    async def shutdown(self, grace=30.0):
+        """
+        优雅关闭: 停止接受新连接，等待处理中的请求完成 (最多 grace 秒)，再关闭进程池。
+        """
+        self._stopping = True
+        if self._server is not None:
+            self._server.close()
+        if self._idle is not None:
+            try:
+                await asyncio.wait_for(self._idle.wait(), grace)
+            except asyncio.TimeoutError:
+                pass
+        # 关闭空闲的 keep-alive 连接，并等待各连接的处理协程退出
+        handlers = list(self._connections.items())
+        for writer, _ in handlers:
+            writer.close()
+        await asyncio.gather(*(task for _, task in handlers), return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+    async def serve_forever(self):
+        """启动服务并阻塞，直到收到 SIGINT/SIGTERM 后优雅关闭"""
+        await self.start()
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        logger.info("渲染服务已启动: http://%s:%d (workers=%d)", self.host, self.port, self.workers)
+        await stop.wait()
+        logger.info("正在关闭渲染服务...")
+        await self.shutdown()
+
+    def health(self):
+        return {
+            "status": "stopping" if self._stopping else "ok",
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "uptime": time.time() - self.started_at if self.started_at else 0.0,
+            **self.counters,
+            **({"pool": self.executor.health()} if isinstance(self.executor, WorkerSupervisor) else {}),
+        }
+
+    # --- HTTP 处理 ---
+
+    async def _handle_connection(self, reader, writer):
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while not self._stopping:
+                try:
+                    request = await self._read_request(reader)
+                except HttpError as e:
+                    await self._send_json(writer, e.status, {"error": e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, query, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                status, content_type, payload = await self._dispatch(method, path, query, body)
+                await self._send(writer, status, content_type, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader):
+        header_bytes = 0
+
+        async def read_line():
+            nonlocal header_bytes
+            try:
+                line = await reader.readline()
+            except ValueError:  # 单行超过 StreamReader 的 limit
+                raise HttpError(431, "请求头过大")
+            header_bytes += len(line)
+            if header_bytes > self.max_header_bytes:
+                raise HttpError(431, "请求头过大")
+            return line
+
+        line = await read_line()
+        if not line:
+            return None
+        try:
+            method, path, _ = line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise HttpError(400, "无效的请求行")
+        headers = {}
+        for count in itertools.count():
+            line = await read_line()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            if count >= self.max_header_lines:
+                raise HttpError(431, "请求头行数过多")
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HttpError(400, "无效的 Content-Length")
+        if length > self.max_body:
+            raise HttpError(413, "请求体过大")
+        body = await reader.readexactly(length) if length else b''
+        path, _, query = path.partition('?')
+        return method.upper(), path, query, headers, body
+
+    async def _dispatch(self, method, path, query, body):
+        self.counters["requests"] += 1
+        if path == "/health":
+            if method != "GET":
+                return self._json(405, {"error": "仅支持 GET"})
+            return self._json(200, self.health())
+
+        if not path.startswith("/render/"):
+            return self._json(404, {"error": "未知路径"})
+        job_type = path[len("/render/"):]
+        if job_type not in JOB_TYPES:
+            return self._json(404, {"error": f"未知的任务类型: {job_type}"})
+        if method != "POST":
+            return self._json(405, {"error": "仅支持 POST"})
+        if self._stopping:
+            return self._json(503, {"error": "服务正在关闭"})
+        try:
+            params = json.loads(body or b'{}')
+        except ValueError:
+            return self._json(400, {"error": "请求体不是合法的JSON"})
+        # 渲染质量与缩放比例在提交到进程池前校验，超出范围直接返回 400
+        try:
+            check_params(params)
+        except JobError as e:
+            return self._json(400, {"error": str(e)})
+        try:
+            encode = parse_encode_options(query)
+        except ValueError as e:
+            return self._json(400, {"error": f"编码参数错误: {e}"})
+
+        # 背压: 超出上限立即拒绝，而不是无限排队
+        if self.pending >= self.max_pending:
+            self.counters["rejected"] += 1
+            return self._json(429, {"error": "服务繁忙，请稍后重试"})
+
+        self.pending += 1
+        self._idle.clear()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, render_job, job_type, params, encode)
+        # 计数在任务真正结束时释放: 超时返回后任务仍占用工作进程，继续计入背压
+        future.add_done_callback(self._release)
+        try:
+            data = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            logger.warning("渲染超时: %s", job_type, extra={"stage": job_type, "duration": self.timeout})
+            return self._json(504, {"error": "渲染超时"})
+        except JobError as e:
+            self.counters["errors"] += 1
+            return self._json(400, {"error": str(e)})
+        except Exception as e:
+            self.counters["errors"] += 1
+            logger.error("渲染失败: %s", e, extra={"stage": job_type})
+            return self._json(500, {"error": f"渲染失败: {e}"})
+        self.counters["rendered"] += 1
+        return 200, MIME_TYPES[encode["format"]], data
+
+    def _release(self, future):
+        if not future.cancelled():
+            # 取出异常，避免超时后无人等待时打印 "exception was never retrieved"
+            future.exception()
+        self.pending -= 1
+        if self.pending == 0:
+            self._idle.set()
+
+    @staticmethod
+    def _json(status, obj):
+        return status, "application/json; charset=utf-8", json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+    async def _send_json(self, writer, status, obj, keep_alive=True):
+        await self._send(writer, *self._json(status, obj), keep_alive)
+
+    @staticmethod
+    async def _send(writer, status, content_type, payload, keep_alive):
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n"
+        )
+        writer.write(head.encode('latin-1') + payload)
+        await writer.drain()
+
+
+def run_service(**kwargs):
+    """以阻塞方式运行渲染服务，参数同 RenderService"""
+    asyncio.run(RenderService(**kwargs).serve_forever())
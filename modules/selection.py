@@ -0,0 +1,150 @@
+import heapq
+from modules.rating import calculate_rating, rate_batch
+
+# 各版本区块的单元格数量
+OLD_SECTION_SIZE = 35
+NEW_SECTION_SIZE = 15
+
+# generate_song_cell 接受的参数
+CELL_FIELDS = (
+    "cover_id", "difficulty", "is_dx", "song_title", "achievement",
+    "dx_score", "dx_total", "base", "section_rank", "fc_indicator", "fs_indicator",
+)
+
+
+def chart_key(record):
+    """
+    谱面唯一标识: (乐曲ID, 是否DX谱面, 难度)。成绩中有 song_id 时优先使用，否则使用 cover_id。
+    """
+    song = record.get("song_id", record["cover_id"])
+    return (str(song), 1 if record.get("is_dx") else 0, int(record["difficulty"]))
+
+
+class _Entry:
+    """堆元素。排序规则 (由好到差): Rating 高 > 达成率高 > 定数高 > 谱面标识小。"""
+
+    __slots__ = ("rating", "record", "key", "valid")
+
+    def __init__(self, rating, record):
+        self.rating = rating
+        self.record = record
+        self.key = chart_key(record)
+        self.valid = True
+
+    def order(self):
+        return (self.rating, self.record["achievement"], self.record["base"])
+
+    def __lt__(self, other):
+        # "小于" 表示更差，堆顶即为区块中最差的一条
+        a, b = self.order(), other.order()
+        if a != b:
+            return a < b
+        return self.key > other.key
+
+
+class _Section:
+    """单个区块的 Top-K 维护，堆中可能残留被同一谱面更好成绩替换掉的失效元素。"""
+
+    def __init__(self, size):
+        self.size = size
+        self.heap = []
+        self.members = {}
+
+    def add(self, entry):
+        current = self.members.get(entry.key)
+        if current is not None:
+            if not current < entry:
+                return False
+            # 同一谱面出现更好的成绩: 旧元素惰性删除
+            current.valid = False
+            del self.members[entry.key]
+        elif len(self.members) >= self.size:
+            self._drop_invalid_top()
+            if not self.heap or not self.heap[0] < entry:
+                return False
+            worst = heapq.heapreplace(self.heap, entry)
+            del self.members[worst.key]
+            self.members[entry.key] = entry
+            return True
+        heapq.heappush(self.heap, entry)
+        self.members[entry.key] = entry
+        if len(self.heap) > 2 * self.size:
+            self._compact()
+        return True
+
+    def ordered(self):
+        return sorted(self.members.values(), reverse=True)
+
+    def _drop_invalid_top(self):
+        while self.heap and not self.heap[0].valid:
+            heapq.heappop(self.heap)
+
+    def _compact(self):
+        self.heap = list(self.members.values())
+        heapq.heapify(self.heap)
+
+
+class B50Selector:
+    """
+    B50选曲引擎: 在完整成绩列表中用堆做部分选择，保留旧版本前35、新版本前15。
+
+    支持增量更新: add() 合并一条新成绩只需 O(log k)，无需对全部成绩重新排序。
+    同一谱面只保留最好的一条成绩，相同Rating时按达成率、定数、谱面标识决定先后，结果确定。
+    """
+
+    def __init__(self, old_size=OLD_SECTION_SIZE, new_size=NEW_SECTION_SIZE):
+        self.old = _Section(old_size)
+        self.new = _Section(new_size)
+
+    def add(self, record, rating=None):
+        """
+        合并一条成绩。
+        :param record: 包含 generate_song_cell 参数 (section_rank 除外) 及 is_new 的字典
+        :param rating: 可选，预先计算好的Rating
+        :return: 该成绩是否进入了B50
+        """
+        if rating is None:
+            rating = calculate_rating(record["achievement"], record["base"])
+        section = self.new if record.get("is_new") else self.old
+        return section.add(_Entry(int(rating), record))
+
+    def extend(self, records):
+        """批量合并成绩，Rating 由 rate_batch 一次性计算"""
+        records = list(records)
+        if not records:
+            return
+        ratings = rate_batch(
+            [r["achievement"] for r in records], [r["base"] for r in records]
+        ).ratings
+        for record, rating in zip(records, ratings):
+            self.add(record, int(rating))
+
+    def sections(self):
+        """
+        :return: (old_cells, new_cells)，按Rating从高到低排列并填好 section_rank 的
+                 generate_song_cell 参数字典列表
+        """
+        return self._cells(self.old), self._cells(self.new)
+
+    def total_rating(self):
+        return sum(e.rating for s in (self.old, self.new) for e in s.members.values())
+
+    @staticmethod
+    def _cells(section):
+        cells = []
+        for rank, entry in enumerate(section.ordered(), start=1):
+            cell = {k: entry.record[k] for k in CELL_FIELDS if k in entry.record}
+            cell["section_rank"] = rank
+            cells.append(cell)
+        return cells
+
+
+def select_b50(records, old_size=OLD_SECTION_SIZE, new_size=NEW_SECTION_SIZE):
+    """
+    从完整成绩列表中选出B50。
+    :param records: 成绩列表，见 B50Selector.add
+    :return: (old_cells, new_cells)
+    """
+    selector = B50Selector(old_size, new_size)
+    selector.extend(records)
+    return selector.sections()
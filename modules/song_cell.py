@@ -1,6 +1,20 @@
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+from PIL import Image, ImageDraw, ImageFont
 import os
-import math
+import logging
+from modules.asset_cache import AssetCache, asset_cache
+from modules.asset_index import get_asset_index
+from modules import font_registry
+from modules.jacket_store import jacket_store
+from modules.tracing import tracer
+from modules.diagnostics import missing_assets
+from modules.layout import get_plan, check_scale
+from modules.sprite_atlas import sprite_atlas
+from modules.quality import DEFAULT_QUALITY, check_quality, resample_filter
+from modules.rating import (
+    RATING_TABLE, RANK_TABLE, calculate_rating, get_rank_by_achievement, rank_to_asset_name
+)
+
+logger = logging.getLogger(__name__)
 
 # --- 常量 ---
 
@@ -9,9 +23,20 @@ ASSETS_DIR = 'assets'
 JACKETS_DIR = os.path.join(ASSETS_DIR, 'jackets')
 FONTS_DIR = os.path.join(ASSETS_DIR, 'fonts')
 
-# 尺寸 (来自 song_cell.json)
-CANVAS_WIDTH = 432
-CANVAS_HEIGHT = 216
+# 版面版本，修改单元格绘制代码时递增，使渲染缓存失效 (坐标变化由渲染计划的键体现)
+LAYOUT_VERSION = 1
+
+# 渲染计划 (layouts/song_cell.json 由 output/song_cell.json 编译而来)
+CELL_PLAN = get_plan('song_cell')
+
+# 尺寸
+CANVAS_WIDTH, CANVAS_HEIGHT = CELL_PLAN.canvas
+
+# 单元格用到的全部字体 (文件名, 字号)，来自渲染计划中的文字槽位
+FONT_FACES = sorted(
+    {(slot["font"], slot["font_size"]) for slot in CELL_PLAN.slots.values() if "font" in slot},
+    key=lambda face: (face[0], -face[1]),
+)
 
 # 难度颜色
 DIFF_COLORS = {
@@ -23,83 +48,26 @@ DIFF_COLORS = {
     10: '#FF6FFD' # UTAGE
 }
 
-# Rating 计算表
-RATING_TABLE = [
-    {"min": 0, "max": 0, "offset": 0},
-    {"min": 100000, "max": 199999, "offset": 16},
-    {"min": 200000, "max": 299999, "offset": 32},
-    {"min": 300000, "max": 399999, "offset": 48},
-    {"min": 400000, "max": 499999, "offset": 64},
-    {"min": 500000, "max": 599999, "offset": 80},
-    {"min": 600000, "max": 699999, "offset": 96},
-    {"min": 700000, "max": 749999, "offset": 112},
-    {"min": 750000, "max": 799999, "offset": 120},
-    {"min": 800000, "max": 899999, "offset": 136},
-    {"min": 900000, "max": 939999, "offset": 152},
-    {"min": 940000, "max": 969999, "offset": 168},
-    {"min": 970000, "max": 979999, "offset": 200},
-    {"min": 980000, "max": 989999, "offset": 203},
-    {"min": 990000, "max": 994999, "offset": 208},
-    {"min": 995000, "max": 999999, "offset": 211},
-    {"min": 1000000, "max": 1004999, "offset": 216},
-    {"min": 1005000, "max": float('inf'), "offset": 224}
-]
-
-# --- Rank辅助函数 ---
-RANK_TABLE = [
-    (0, "D"),
-    (100000, "D"),
-    (200000, "D"),
-    (300000, "D"),
-    (400000, "D"),
-    (500000, "C"),
-    (600000, "B"),
-    (700000, "BB"),
-    (750000, "BBB"),
-    (799999, "BBB"),
-    (800000, "A"),
-    (900000, "AA"),
-    (940000, "AAA"),
-    (969999, "AAA"),
-    (970000, "S"),
-    (980000, "S+"),
-    (989999, "S+"),
-    (990000, "SS"),
-    (995000, "SS+"),
-    (999999, "SS+"),
-    (1000000, "SSS"),
-    (1004999, "SSS"),
-    (1005000, "SSS+")
-]
-
 # --- 辅助函数 ---
 
-def calculate_rating(achievement, base):
-    """
-    根据达成率和谱面定数计算Rating。
-    """
-    if achievement == 0:
-        return 0
-    
-    offset = 0
-    for record in RATING_TABLE:
-        if record["min"] <= achievement <= record["max"]:
-            offset = record["offset"]
-            break
-            
-    # 公式: floor(min(达成率, 100.5000%) * offset * base / 1000000 / 10)
-    return math.floor(min(achievement, 1005000) * offset * base / 1000000 / 10)
-
 def get_font(path, size):
     """
-    加载字体文件，如果失败则返回Pillow默认字体。
+    加载字体文件 (经由font_registry按 (path, size) 缓存)，如果失败则返回Pillow默认字体。
     """
     try:
-        return ImageFont.truetype(path, size=size)
+        return font_registry.get_font(path, size)
     except IOError:
-        print(f"字体文件未找到: {path}，将使用默认字体。")
+        missing_assets.report(path, "font", logger)
         return ImageFont.load_default()
 
+def warm_up_fonts():
+    """
+    预加载FONT_FACES中的全部字体，返回成功加载的数量。
+    """
+    return font_registry.preload_fonts(
+        (os.path.join(FONTS_DIR, name), size) for name, size in FONT_FACES
+    )
+
 def truncate_title(title, max_len=11.5):
     """
     裁剪过长的标题。一个全角字符计为1，半角为0.5。
@@ -121,38 +89,213 @@ def truncate_title(title, max_len=11.5):
         return title[:truncate_at] + '...'
     return title
 
-def get_rank_by_achievement(achievement):
+# --- 素材加载 (优先取自预缩放图集 sprite_atlas，其余经由进程级 asset_cache 缓存) ---
+
+def asset_path(asset_name, default_dir=ASSETS_DIR):
     """
-    根据达成率返回Rank字符串。
+    通过asset_index查找素材路径，索引中没有时退回 default_dir 下的同名路径。
     """
-    last_rank = "D"
-    for threshold, rank in RANK_TABLE:
-        if achievement < threshold:
-            break
-        last_rank = rank
-    return last_rank
-
-def rank_to_asset_name(rank):
-    """
-    根据Rank字符串返回assets下的图片文件名。
-    """
-    mapping = {
-        "D": "UI_GAM_Rank_D.png",
-        "C": "UI_GAM_Rank_C.png",
-        "B": "UI_GAM_Rank_B.png",
-        "BB": "UI_GAM_Rank_BB.png",
-        "BBB": "UI_GAM_Rank_BBB.png",
-        "A": "UI_GAM_Rank_A.png",
-        "AA": "UI_GAM_Rank_AA.png",
-        "AAA": "UI_GAM_Rank_AAA.png",
-        "S": "UI_GAM_Rank_S.png",
-        "S+": "UI_GAM_Rank_Sp.png",
-        "SS": "UI_GAM_Rank_SS.png",
-        "SS+": "UI_GAM_Rank_SSp.png",
-        "SSS": "UI_GAM_Rank_SSS.png",
-        "SSS+": "UI_GAM_Rank_SSSp.png"
-    }
-    return mapping.get(rank, "UI_GAM_Rank_D.png")
+    path = get_asset_index(ASSETS_DIR).find(asset_name)
+    return path if path else os.path.join(default_dir, asset_name)
+
+def load_asset(asset_name, size=None, quality=DEFAULT_QUALITY):
+    """
+    从assets目录加载素材 (RGBA)，可选缩放到指定尺寸。
+    图集中有该尺寸时直接引用图集 (任何档位)，否则按档位的滤镜解码缩放并由asset_cache缓存；结果只读使用。
+    :raises FileNotFoundError: 素材不存在时
+    """
+    sprite = sprite_atlas.get(asset_name, size)
+    if sprite is not None:
+        return sprite
+    return asset_cache.get(asset_path(asset_name), size, resample_filter(quality))
+
+def asset_size(asset_name):
+    """
+    素材原始尺寸，图集中有记录时无需解码。
+    :raises FileNotFoundError: 素材不存在时
+    """
+    return sprite_atlas.source_size(asset_name) or load_asset(asset_name).size
+
+def load_slot_asset(slot, asset_name, quality=DEFAULT_QUALITY, scale=1):
+    """
+    按渲染计划中的槽位加载素材 (已缩放)。
+    :param slot: 缩放比例为 scale 的计划中的槽位
+    :return: (img, (paste_x, paste_y))
+    """
+    size, position = CELL_PLAN.scaled(scale).place(slot, asset_size(asset_name))
+    return load_asset(asset_name, size, quality), position
+
+def get_mode_icon(is_dx, quality=DEFAULT_QUALITY, scale=1):
+    """
+    获取DX/标谱指示器图标 (按槽位高度等比缩放)。
+    :return: (icon_img, (paste_x, paste_y))
+    """
+    icon_name = 'UI_TST_Infoicon_DeluxeMode.png' if is_dx else 'UI_TST_Infoicon_StandardMode.png'
+    return load_slot_asset(CELL_PLAN.scaled(scale).slot("mode_icon"), icon_name, quality, scale)
+
+def get_rank_icon(rank_asset, quality=DEFAULT_QUALITY, scale=1):
+    """
+    获取Rank图标，等比缩放并居中到rank_icon槽位内。
+    :return: (icon_img, (paste_x, paste_y))
+    """
+    return load_slot_asset(CELL_PLAN.scaled(scale).slot("rank_icon"), rank_asset, quality, scale)
+
+def indicator_geometry(new_w, new_h, raw_w, raw_h):
+    """
+    计算FC/FS图标在指示器区域 (new_w x new_h) 内的缩放尺寸与偏移。
+    :return: (img_w, img_h, offset_x, offset_y)
+    """
+    # 判断是否为带+图标
+    if raw_w == 70:
+        scale = min(new_w / 65, new_h / 65)
+        img_w = int(70 * scale)
+        img_h = int(65 * scale)
+        offset_x = (new_w - int(65 * scale)) // 2 - int((70 - 65) * scale // 2)
+    else:
+        scale = min(new_w / raw_w, new_h / raw_h)
+        img_w = int(raw_w * scale)
+        img_h = int(raw_h * scale)
+        offset_x = (new_w - img_w) // 2
+    offset_y = (new_h - img_h) // 2
+    return img_w, img_h, offset_x, offset_y
+
+def get_indicator_icon(icon_name, new_w, new_h, raw_w, raw_h, quality=DEFAULT_QUALITY):
+    """
+    获取缩放到指示器区域 (new_w x new_h) 内的FC/FS图标。
+    :return: (icon_img, offset_x, offset_y) 图标及其相对区域左上角的粘贴偏移
+    """
+    img_w, img_h, offset_x, offset_y = indicator_geometry(new_w, new_h, raw_w, raw_h)
+    return load_asset(icon_name, (img_w, img_h), quality), offset_x, offset_y
+
+def atlas_sprites(scales=(1,)):
+    """
+    单元格用到的全部小图标及其缩放尺寸，供 sprite_atlas.build_atlas 打包。
+    只读取源文件头获取尺寸，缺失的素材跳过。
+    :param scales: 需要打包的渲染缩放比例 (见 generate_song_cell 的 scale)
+    :return: [(素材名, 素材路径, (w, h)), ...]
+    """
+    index = get_asset_index(ASSETS_DIR)
+    sprites = []
+    for scale in scales:
+        plan = CELL_PLAN.scaled(scale)
+
+        def add_fitted(slot, asset_name):
+            meta = index.metadata(asset_name)
+            if meta:
+                size, _ = plan.place(slot, (meta["width"], meta["height"]))
+                sprites.append((asset_name, meta["path"], size))
+
+        for icon_name in ('UI_TST_Infoicon_DeluxeMode.png', 'UI_TST_Infoicon_StandardMode.png'):
+            add_fitted(plan.slot("mode_icon"), icon_name)
+        for rank in sorted(set(rank for _, rank in RANK_TABLE)):
+            add_fitted(plan.slot("rank_icon"), rank_to_asset_name(rank))
+        for name in ("blank_fc", "blank_fs"):
+            slot = plan.slot(name)
+            sprites.append((slot["asset"], asset_path(slot["asset"]), tuple(slot["resize"])))
+        for name in ("fc_icon", "fs_icon"):
+            for slot in plan.slot(name)["variants"].values():
+                img_w, img_h, _, _ = indicator_geometry(*slot["rect"][2:], *slot["raw"])
+                sprites.append((slot["asset"], asset_path(slot["asset"]), (img_w, img_h)))
+    return sprites
+
+def warm_up_assets():
+    """
+    预先解码并缩放单元格用到的全部小图标，返回asset_cache统计信息。
+    """
+    for is_dx in (0, 1):
+        try:
+            get_mode_icon(is_dx)
+        except FileNotFoundError:
+            pass
+    for rank in set(rank for _, rank in RANK_TABLE):
+        try:
+            get_rank_icon(rank_to_asset_name(rank))
+        except FileNotFoundError:
+            pass
+    asset_cache.warm_up([
+        (asset_path(slot["asset"]), tuple(slot["resize"]))
+        for slot in (CELL_PLAN.slot("blank_fc"), CELL_PLAN.slot("blank_fs"))
+    ])
+    for name in ("fc_icon", "fs_icon"):
+        for slot in CELL_PLAN.slot(name)["variants"].values():
+            try:
+                get_indicator_icon(slot["asset"], *slot["rect"][2:], *slot["raw"])
+            except FileNotFoundError:
+                pass
+    return asset_cache.stats()
+
+# --- 静态模板 ---
+
+# (difficulty, is_dx, quality, scale) -> 预合成的静态图层，按字节上限 LRU 淘汰 (满尺寸模板约 370KB)
+CELL_TEMPLATE_CACHE_BYTES = 16 * 1024 * 1024
+_cell_templates = AssetCache(max_bytes=CELL_TEMPLATE_CACHE_BYTES)
+
+def build_cell_template(difficulty, is_dx, quality=DEFAULT_QUALITY, scale=1):
+    """
+    预合成单元格中与成绩无关的静态图层: 左侧难度条、DX/标谱指示器、两个空白底图标。
+    :return: 透明底的画布大小 (按 scale 缩放) 的 RGBA 图片
+    """
+    plan = CELL_PLAN.scaled(scale)
+    template = Image.new('RGBA', plan.canvas, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(template)
+
+    # 左侧难度条
+    bar_color = DIFF_COLORS.get(difficulty, '#FFFFFF') # 默认为白色
+    x, y, w, h = plan.rect("difficulty_bar")
+    draw.rectangle([(x, y), (x + w, y + h)], fill=bar_color)
+
+    # DX/标谱指示器
+    try:
+        dx_icon, position = get_mode_icon(is_dx, quality, scale)
+        template.alpha_composite(dx_icon, position)
+    except FileNotFoundError as e:
+        missing_assets.report(e.filename, "song_cell.template", logger)
+
+    # 两个空白底图标 (计划中已是以中心为基准缩放后的位置)
+    for name in ("blank_fc", "blank_fs"):
+        slot = plan.slot(name)
+        try:
+            blank_icon = load_asset(slot["asset"], tuple(slot["resize"]), quality)
+            template.alpha_composite(blank_icon, tuple(slot["rect"][:2]))
+        except FileNotFoundError as e:
+            missing_assets.report(e.filename, "song_cell.template", logger)
+
+    return template
+
+def get_cell_template(difficulty, is_dx, quality=DEFAULT_QUALITY, scale=1):
+    """
+    获取 (difficulty, is_dx, quality, scale) 对应的静态模板，首次使用时构建并缓存 (只读使用)。
+    """
+    key = (difficulty, 1 if is_dx else 0, quality, check_scale(scale))
+    return _cell_templates.get_or_load(key, lambda: build_cell_template(*key))
+
+def warm_up_templates():
+    """
+    预先构建默认档位下全部 (difficulty, is_dx) 组合的静态模板，返回模板数量。
+    """
+    for difficulty in DIFF_COLORS:
+        for is_dx in (0, 1):
+            get_cell_template(difficulty, is_dx)
+    return _cell_templates.stats()["entries"]
+
+def get_slot_font(name, scale=1):
+    """获取渲染计划中文字槽位的字体 (字号随 scale 缩放)"""
+    slot = CELL_PLAN.scaled(scale).slot(name)
+    return get_font(os.path.join(FONTS_DIR, slot["font"]), slot["font_size"])
+
+def paste_indicator(canvas, name, value, quality=DEFAULT_QUALITY, scale=1):
+    """
+    按渲染计划粘贴FC/FS指示器图标，value 没有对应变体 (例如0) 时不绘制。
+    """
+    slot = CELL_PLAN.scaled(scale).slot(name)["variants"].get(str(value))
+    if slot is None:
+        return
+    x, y, w, h = slot["rect"]
+    try:
+        icon_img, offset_x, offset_y = get_indicator_icon(slot["asset"], w, h, *slot["raw"], quality)
+        canvas.paste(icon_img, (x + offset_x, y + offset_y), icon_img)
+    except FileNotFoundError as e:
+        missing_assets.report(e.filename, f"song_cell.{name}", logger)
 
 # --- 主要生成函数 ---
 
@@ -167,7 +310,9 @@ def generate_song_cell(
     base: float,
     section_rank: int,
     fc_indicator: int = 0,
-    fs_indicator: int = 0
+    fs_indicator: int = 0,
+    quality: str = DEFAULT_QUALITY,
+    scale: float = 1
 ) -> Image.Image:
     """
     生成单个乐曲单元格的图像。
@@ -183,212 +328,90 @@ def generate_song_cell(
     :param section_rank: 在section中的排名 (e.g., 1)
     :param fc_indicator: FC指示器 (0-4)
     :param fs_indicator: FS指示器 (0-4)
+    :param quality: 渲染质量档位 "full" | "fast" | "draft" (见 quality.QUALITY_TIERS)
+    :param scale: 缩放比例 (例如 0.5)，直接以缩放后的坐标、字号、图标与封面渲染，不先渲染原尺寸
     :return: PIL.Image.Image 对象
+    :raises ValueError: 质量档位未知或缩放比例超出允许范围时
     """
-    # 1. 创建画布
-    canvas = Image.new('RGBA', (CANVAS_WIDTH, CANVAS_HEIGHT), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(canvas)
-
-    # 2. 绘制歌曲封面 (底层)
+    quality = check_quality(quality)
+    scale = check_scale(scale)
+    plan = CELL_PLAN.scaled(scale)
+    canvas_width, canvas_height = plan.canvas
+    laps = tracer.laps("song_cell")
+
+    # 1-3. 歌曲封面背景 (底层): 缩放、高斯模糊、按计划中jacket槽位的位置裁切并叠加overlay蒙版
+    #      由jacket_store按cover_id缓存最终背景条，命中时不再读取原始封面
     jacket_id_str = str(cover_id).zfill(6)
-    jacket_path = os.path.join(JACKETS_DIR, f'UI_Jacket_{jacket_id_str}.png')
+    jacket_path = asset_path(f'UI_Jacket_{jacket_id_str}.png', JACKETS_DIR)
+    jacket_params = {"quality": quality}
+    if scale != 1:
+        jacket_params.update(width=canvas_width, height=canvas_height, offset_y=plan.rect("jacket")[1],
+                             blur_radius=plan.slot("jacket")["blur_radius"])
     try:
-        jacket_img = Image.open(jacket_path).convert('RGBA')
-        
-        # 等比缩放至宽度填满
-        w, h = jacket_img.size
-        new_h = int(CANVAS_WIDTH * h / w)
-        jacket_img = jacket_img.resize((CANVAS_WIDTH, new_h), Image.Resampling.LANCZOS)
-        
-        # 高斯模糊
-        jacket_img = jacket_img.filter(ImageFilter.GaussianBlur(radius=8))
-        
-        # 根据json中的位置粘贴
-        canvas.paste(jacket_img, (0, -107))
+        canvas = jacket_store.get(jacket_id_str, jacket_path, **jacket_params).copy()
     except FileNotFoundError:
-        print(f"封面文件未找到: {jacket_path}")
-        # 可以在这里绘制一个占位符矩形
-        draw.rectangle([(0,0), (CANVAS_WIDTH, CANVAS_HEIGHT)], fill=(20, 20, 20))
-
-
-    # 3. 疊加黑色半透明蒙版
-    overlay = Image.new('RGBA', (CANVAS_WIDTH, CANVAS_HEIGHT), (0, 0, 0, 102))
-    canvas = Image.alpha_composite(canvas, overlay)
-    draw = ImageDraw.Draw(canvas) # 重新获取Draw对象
-
-    # 4. 绘制左侧难度条
-    bar_color = DIFF_COLORS.get(difficulty, '#FFFFFF') # 默认为白色
-    draw.rectangle([(0, 0), (9, CANVAS_HEIGHT)], fill=bar_color)
-
-    # 5. 绘制DX/标谱指示器
-    icon_name = 'UI_TST_Infoicon_DeluxeMode.png' if is_dx else 'UI_TST_Infoicon_StandardMode.png'
-    icon_path = os.path.join(ASSETS_DIR, icon_name)
-    try:
-        dx_icon = Image.open(icon_path).convert('RGBA')
-
-        # 根据要求调整图标大小 (基于高度26px进行等比缩放)
-        w, h = dx_icon.size
-        new_h = 26
-        new_w = int(w * new_h / h)
-        dx_icon = dx_icon.resize((new_w, new_h), Image.Resampling.LANCZOS)
+        missing_assets.report(jacket_path, "song_cell.jacket", logger)
+        # 绘制占位矩形并叠加黑色半透明蒙版
+        canvas = Image.new('RGBA', (canvas_width, canvas_height), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(canvas)
+        draw.rectangle([(0,0), (canvas_width, canvas_height)], fill=(20, 20, 20))
+        overlay_alpha = plan.slot("overlay")["opacity"]
+        overlay = Image.new('RGBA', (canvas_width, canvas_height), (0, 0, 0, overlay_alpha))
+        canvas = Image.alpha_composite(canvas, overlay)
+    draw = ImageDraw.Draw(canvas)
+    laps.lap("jacket")
 
-        canvas.paste(dx_icon, (24, 13), dx_icon)
-    except FileNotFoundError:
-        print(f"指示器图标未找到: {icon_path}")
+    # 4-5. 叠加静态模板: 左侧难度条、DX/标谱指示器、两个空白底图标 (9.6)
+    canvas.alpha_composite(get_cell_template(difficulty, is_dx, quality, scale))
+    laps.lap("template")
 
     # 6. 绘制歌曲标题
-    title_font = get_font(os.path.join(FONTS_DIR, 'combined.ttf'), size=30)
     truncated_title = truncate_title(song_title)
-    draw.text((30, 48), truncated_title, font=title_font, fill=(255, 255, 255))
+    draw.text(plan.point("title"), truncated_title, font=get_slot_font("title", scale), fill=(255, 255, 255))
+    laps.lap("title")
 
     # 7. 绘制达成率
-    ach_font = get_font(os.path.join(FONTS_DIR, 'Torus-SemiBold.otf'), size=50)
     ach_text = f"{(achievement / 10000):.4f}%"
-    draw.text((30, 75), ach_text, font=ach_font, fill=(255, 255, 255))
+    draw.text(plan.point("achievement"), ach_text, font=get_slot_font("achievement", scale), fill=(255, 255, 255))
+    laps.lap("achievement")
 
     # 8. 绘制DX分数
-    dx_font = get_font(os.path.join(FONTS_DIR, 'Torus-SemiBold.otf'), size=30)
     dx_text = f"{dx_score}/{dx_total}"
-    draw.text((30, 132), dx_text, font=dx_font, fill=(255, 255, 255))
+    draw.text(plan.point("dx_score"), dx_text, font=get_slot_font("dx_score", scale), fill=(255, 255, 255))
+    laps.lap("dx_score")
 
     # 9. 绘制定数和Rating
-    rating_font = get_font(os.path.join(FONTS_DIR, 'combined.ttf'), size=28)
     rating_val = calculate_rating(achievement, base)
     rating_text = f"{base:.1f} -> {rating_val}"
-    draw.text((30, 175), rating_text, font=rating_font, fill=(255, 255, 255))
+    draw.text(plan.point("rating"), rating_text, font=get_slot_font("rating", scale), fill=(255, 255, 255))
+    laps.lap("rating")
 
-    # 10. 绘制排名
-    rank_font = get_font(os.path.join(FONTS_DIR, 'combined.ttf'), size=28)
+    # 10. 绘制排名 (右上角对齐，锚点为json中"#1"图层的右边缘)
+    rank_font = get_slot_font("section_rank", scale)
     rank_text = f"#{section_rank}"
-    
-    # 右上角对齐
-    # json中位置为(383, 14), 尺寸为(28, 18), 右边缘 x = 383 + 28 = 411
     text_bbox = rank_font.getbbox(rank_text)
     text_width = text_bbox[2] - text_bbox[0]
-    rank_x = 411 - text_width
-    draw.text((rank_x, 14), rank_text, font=rank_font, fill=(255, 255, 255))
+    right_x, rank_y = plan.point("section_rank")
+    draw.text((right_x - text_width, rank_y), rank_text, font=rank_font, fill=(255, 255, 255))
+    laps.lap("section_rank")
 
     # 9.5. 绘制Rank图标
     rank = get_rank_by_achievement(achievement)
     rank_asset = rank_to_asset_name(rank)
-    rank_icon_path = os.path.join(ASSETS_DIR, rank_asset)
     try:
-        rank_icon = Image.open(rank_icon_path).convert('RGBA')
-        # 等比缩放到137x54的95%内
-        scale_factor = 0.95
-        target_w, target_h = int(137 * scale_factor), int(54 * scale_factor)
-        w, h = rank_icon.size
-        scale = min(target_w / w, target_h / h)
-        new_w, new_h = int(w * scale), int(h * scale)
-        rank_icon = rank_icon.resize((new_w, new_h), Image.Resampling.LANCZOS)
-        # 居中贴到(276,85)的区域
-        paste_x = 276 + (137 - new_w) // 2 + 5
-        paste_y = 85 + (54 - new_h) // 2
-        canvas.paste(rank_icon, (paste_x, paste_y), rank_icon)
-    except FileNotFoundError:
-        print(f"Rank图标未找到: {rank_icon_path}")
-
-    # 指示器整体缩放比例
-    indicator_scale = 1.2
-
-    # 9.6. 绘制两个空白底图标
-    blank_icon_path = os.path.join(ASSETS_DIR, 'UI_MSS_MBase_Icon_Blank.png')
-    for pos_x in [302, 360]:
-        try:
-            # 原始参数
-            base_x, base_y, base_w, base_h = pos_x, 152, 44, 44
-            # 以中心为基准缩放
-            center_x = base_x + base_w // 2
-            center_y = base_y + base_h // 2
-            new_w = int(base_w * indicator_scale)
-            new_h = int(base_h * indicator_scale)
-            new_x = center_x - new_w // 2
-            new_y = center_y - new_h // 2
-            blank_icon = Image.open(blank_icon_path).convert('RGBA')
-            blank_icon = blank_icon.resize((new_w, new_h), Image.Resampling.LANCZOS)
-            canvas.paste(blank_icon, (new_x, new_y), blank_icon)
-        except FileNotFoundError:
-            print(f"空白底图标未找到: {blank_icon_path}")
-
-    # 指示器整体偏移量，便于整体调整
-    indicator_offset_x = 2
-    indicator_offset_y = 2
-    fc_indicator_extra_offset_y = 1
+        rank_icon, position = get_rank_icon(rank_asset, quality, scale)
+        canvas.paste(rank_icon, position, rank_icon)
+    except FileNotFoundError as e:
+        missing_assets.report(e.filename, "song_cell.rank_icon", logger)
+    laps.lap("rank_icon")
 
     # 9.7. 绘制fc/ap图标
-    fc_icon_map = {
-        1: ("UI_MSS_MBase_Icon_FC.png", 301, 149, 44, 44, 65, 65),
-        2: ("UI_MSS_MBase_Icon_FCp.png", 301, 149, 44, 44, 70, 65),
-        3: ("UI_MSS_MBase_Icon_AP.png", 301, 149, 44, 44, 65, 65),
-        4: ("UI_MSS_MBase_Icon_APp.png", 301, 149, 44, 44, 70, 65)
-    }
-    if fc_indicator in fc_icon_map:
-        icon_name, x, y, w, h, raw_w, raw_h = fc_icon_map[fc_indicator]
-        # 以中心为基准缩放
-        center_x = x + w // 2 + indicator_offset_x
-        center_y = y + h // 2 + indicator_offset_y + fc_indicator_extra_offset_y
-        new_w = int(w * indicator_scale)
-        new_h = int(h * indicator_scale)
-        x = center_x - new_w // 2
-        y = center_y - new_h // 2
-        icon_path = os.path.join(ASSETS_DIR, icon_name)
-        try:
-            icon_img = Image.open(icon_path).convert('RGBA')
-            # 判断是否为带+图标
-            if raw_w == 70:
-                scale = min(new_w / 65, new_h / 65)
-                img_w = int(70 * scale)
-                img_h = int(65 * scale)
-                icon_img = icon_img.resize((img_w, img_h), Image.Resampling.LANCZOS)
-                paste_x = x + (new_w - int(65 * scale)) // 2 - int((70 - 65) * scale // 2)
-                paste_y = y + (new_h - img_h) // 2
-            else:
-                scale = min(new_w / raw_w, new_h / raw_h)
-                img_w = int(raw_w * scale)
-                img_h = int(raw_h * scale)
-                icon_img = icon_img.resize((img_w, img_h), Image.Resampling.LANCZOS)
-                paste_x = x + (new_w - img_w) // 2
-                paste_y = y + (new_h - img_h) // 2
-            canvas.paste(icon_img, (paste_x, paste_y), icon_img)
-        except FileNotFoundError:
-            print(f"FC/AP图标未找到: {icon_path}")
+    paste_indicator(canvas, "fc_icon", fc_indicator, quality, scale)
+    laps.lap("fc_icon")
 
     # 9.8. 绘制fs/fdx图标
-    fs_icon_map = {
-        1: ("UI_MSS_MBase_Icon_FS.png", 358, 150, 44, 44, 65, 65),
-        2: ("UI_MSS_MBase_Icon_FSp.png", 358, 150, 44, 44, 70, 65),
-        3: ("UI_MSS_MBase_Icon_FSD.png", 358, 150, 44, 44, 65, 65),
-        4: ("UI_MSS_MBase_Icon_FSDp.png", 361, 150, 44, 44, 70, 65),
-        5: ("UI_MSS_MBase_Icon_SP.png", 358, 150, 44, 44, 65, 65)
-    }
-    if fs_indicator in fs_icon_map:
-        icon_name, x, y, w, h, raw_w, raw_h = fs_icon_map[fs_indicator]
-        # 以中心为基准缩放
-        center_x = x + w // 2 + indicator_offset_x
-        center_y = y + h // 2 + indicator_offset_y
-        new_w = int(w * indicator_scale)
-        new_h = int(h * indicator_scale)
-        x = center_x - new_w // 2
-        y = center_y - new_h // 2
-        icon_path = os.path.join(ASSETS_DIR, icon_name)
-        try:
-            icon_img = Image.open(icon_path).convert('RGBA')
-            if raw_w == 70:
-                scale = min(new_w / 65, new_h / 65)
-                img_w = int(70 * scale)
-                img_h = int(65 * scale)
-                icon_img = icon_img.resize((img_w, img_h), Image.Resampling.LANCZOS)
-                paste_x = x + (new_w - int(65 * scale)) // 2 - int((70 - 65) * scale // 2)
-                paste_y = y + (new_h - img_h) // 2
-            else:
-                scale = min(new_w / raw_w, new_h / raw_h)
-                img_w = int(raw_w * scale)
-                img_h = int(raw_h * scale)
-                icon_img = icon_img.resize((img_w, img_h), Image.Resampling.LANCZOS)
-                paste_x = x + (new_w - img_w) // 2
-                paste_y = y + (new_h - img_h) // 2
-            canvas.paste(icon_img, (paste_x, paste_y), icon_img)
-        except FileNotFoundError:
-            print(f"FS/FDX图标未找到: {icon_path}")
+    paste_indicator(canvas, "fs_icon", fs_indicator, quality, scale)
+    laps.lap("fs_icon")
+    laps.done()
 
     return canvas
\ No newline at end of file
@@ -0,0 +1,142 @@
+import os
+import logging
+import threading
+from PIL import Image
+from modules.packfile import LazyPack, write_pack
+
+logger = logging.getLogger(__name__)
+
+# 图集格式版本，修改打包内容的生成方式时递增
+ATLAS_VERSION = 1
+
+try:
+    _project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+except NameError:
+    _project_root = os.path.abspath('.')
+
+DEFAULT_ATLAS_PATH = os.path.join(_project_root, 'cache', 'sprites.atlas')
+
+
+def sprite_key(asset_name, size):
+    return f"{asset_name}@{size[0]}x{size[1]}"
+
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def build_atlas(sprites, path=DEFAULT_ATLAS_PATH, resample=Image.Resampling.LANCZOS):
+    """
+    将小图标按版面用到的尺寸预先缩放，打包为一个原始 RGBA 图集。
+    缩放方式与 asset_cache 相同，图集中的像素与运行时解码缩放的结果完全一致。
+    :param sprites: 可迭代对象，元素为 (素材名, 素材路径, (w, h))；同一素材可出现多个尺寸
+    :param path: 图集输出路径
+    :return: {"sprites": 图集条目数, "sources": 源文件数, "missing": [缺失的素材名]}
+    """
+    by_source = {}
+    for asset_name, asset_path, size in sprites:
+        by_source.setdefault((asset_name, asset_path), set()).add((int(size[0]), int(size[1])))
+
+    sources = {}
+    missing = []
+
+    def entries():
+        for (asset_name, asset_path), sizes in sorted(by_source.items()):
+            try:
+                with Image.open(asset_path) as src:
+                    original = src.convert('RGBA')
+                stamp = _source_stamp(asset_path)
+            except (OSError, TypeError):
+                missing.append(asset_name)
+                continue
+            sources[asset_name] = {"path": os.path.abspath(asset_path), "size": list(original.size), "stamp": stamp}
+            for size in sorted(sizes):
+                img = original if size == original.size else original.resize(size, resample)
+                yield sprite_key(asset_name, size), {"size": list(size)}, img.tobytes()
+
+    count = write_pack(path, entries(), meta={"version": ATLAS_VERSION, "sources": sources})
+    logger.info("图集已生成: %d 个图标，%d 个源文件", count, len(sources), extra={"path": path, "count": count})
+    return {"sprites": count, "sources": len(sources), "missing": sorted(missing)}
+
+
+class SpriteAtlas:
+    """
+    预缩放小图标的只读图集 (mmap)。
+
+    图标以 PIL.Image.frombuffer 直接引用映射内存，不解码、不复制；
+    fork 出的工作进程与各自打开图集的进程都共享同一份页缓存。
+    图集不存在、版本不符或源文件在打包后被修改 (mtime/大小变化) 时，
+    对应的查询返回 None，调用方退回逐个解码 PNG。
+    """
+
+    def __init__(self, path=DEFAULT_ATLAS_PATH):
+        self.pack = LazyPack(path)
+        self.hits = 0
+        self.misses = 0
+        self._sprites = {}
+        self._fresh = {}
+        self._lock = threading.Lock()
+
+    def source_size(self, asset_name):
+        """:return: 打包时源文件的原始尺寸 (w, h)，不可用时返回 None"""
+        source = self._source(asset_name)
+        return tuple(source["size"]) if source else None
+
+    def get(self, asset_name, size=None):
+        """
+        获取图标。
+        :param size: (w, h) 目标尺寸，None 表示原始尺寸
+        :return: PIL.Image (引用映射内存，只读使用)，图集中没有时返回 None
+        """
+        source = self._source(asset_name)
+        if source is None:
+            self.misses += 1
+            return None
+        key = sprite_key(asset_name, size or source["size"])
+        img = self._sprites.get(key)
+        if img is None:
+            pack = self.pack.get()
+            if key not in pack:
+                self.misses += 1
+                return None
+            with self._lock:
+                img = self._sprites.setdefault(key, pack.image(key))
+        self.hits += 1
+        return img
+
+    def reload(self):
+        """图集重新生成后调用，重新映射文件并清空查询缓存"""
+        with self._lock:
+            self._sprites.clear()
+            self._fresh.clear()
+        self.pack.reload()
+
+    def stats(self):
+        pack = self.pack.get()
+        return {
+            "loaded": pack is not None,
+            "sprites": len(pack) if pack else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _source(self, asset_name):
+        """源文件信息；每个进程对每个源文件只检查一次是否在打包后被修改"""
+        fresh = self._fresh.get(asset_name)
+        if fresh is None:
+            pack = self.pack.get()
+            source = pack.meta.get("sources", {}).get(asset_name) if pack else None
+            if source is not None and pack.meta.get("version") == ATLAS_VERSION:
+                try:
+                    fresh = source if _source_stamp(source["path"]) == source["stamp"] else False
+                except OSError:
+                    fresh = False
+            else:
+                fresh = False
+            self._fresh[asset_name] = fresh
+        return fresh or None
+
+
+# 进程级共享实例
+sprite_atlas = SpriteAtlas()
@@ -1,64 +1,38 @@
 import os
+import time
+import logging
 from PIL import Image, ImageFont, ImageDraw
 import unicodedata
+from modules.asset_cache import AssetCache, asset_cache
+from modules.asset_index import get_asset_index
+from modules import font_registry
+from modules.digit_sprites import get_digit_sprites
+from modules.outline_text import outline_renderer
+from modules.encoder import save_image
+from modules.tracing import tracer
+from modules.diagnostics import missing_assets
+from modules.layout import get_plan, check_scale
+from modules.sprite_atlas import sprite_atlas
+from modules.quality import DEFAULT_QUALITY, check_quality, resample_filter
 
-# class 坐标和尺寸表
-CLASS_GEOM = {
-    0: (333, 21, 69, 42),
-    1: (333, 21, 69, 42),
-    2: (333, 21, 69, 42),
-    3: (333, 21, 69, 42),
-    4: (333, 21, 69, 42),
-    5: (328, 19, 77, 46),
-    6: (328, 19, 77, 46),
-    7: (328, 20, 77, 46),
-    8: (328, 19, 77, 46),
-    9: (328, 19, 77, 46),
-    10: (326, 14, 85, 57),
-    11: (326, 14, 85, 58),
-    12: (326, 14, 85, 57),
-    13: (326, 14, 85, 58),
-    14: (326, 14, 85, 58),
-    15: (317, 12, 100, 61),
-    16: (317, 12, 100, 61),
-    17: (317, 12, 100, 61),
-    18: (317, 12, 100, 61),
-    19: (317, 12, 100, 61),
-    20: (317, 9, 104, 65),
-    21: (314, 9, 107, 65),
-    22: (314, 9, 107, 65),
-    23: (315, 9, 106, 65),
-    24: (315, 9, 105, 65),
-    25: (313, 9, 108, 65),
-}
+logger = logging.getLogger(__name__)
 
-# dani 坐标表
-DANI_POSITIONS = {
-    0: (325, 70), 1: (326, 70), 2: (326, 70), 3: (326, 70), 4: (326, 70), 5: (326, 70),
-    6: (323, 70), 7: (323, 70), 8: (323, 70), 9: (323, 70), 10: (323, 70), 11: (323, 70),
-    12: (326, 70), 13: (326, 70), 14: (326, 70), 15: (326, 70), 16: (326, 70), 17: (326, 70),
-    18: (326, 70), 19: (326, 70), 20: (326, 70), 21: (326, 70), 22: (323, 70), 23: (323, 70)
-}
+# 渲染计划 (layouts/top_panel.json 由 psd_analyzer/output.json 编译而来)
+PANEL_PLAN = get_plan('top_panel')
 
-# rating 坐标表
-RATING_POSITIONS = {
-    1: (142, 31), 2: (142, 31), 3: (142, 31), 4: (142, 31), 5: (142, 31),
-    6: (142, 31), 7: (142, 31), 8: (142, 31), 9: (142, 31), 10: (142, 31), 11: (142, 31)
-}
+# 面板文字字体及用到的字号 (名字、称号、CREDIT(S)、版本号)，字号来自渲染计划
+PANEL_FONT_NAME = 'SEGAMaruGothicDB.ttf'
+PANEL_FONT_SIZES = tuple(slot["font_size"] for slot in PANEL_PLAN.slots.values() if "font_size" in slot)
 
 def find_asset(asset_name):
-    """在 assets 目录中递归查找素材文件"""
+    """在 assets 目录中查找素材文件 (经由 asset_index，只在目录变化时重新遍历)"""
     try:
         project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     except NameError:
         project_root = os.path.abspath('.')
     
     assets_path = os.path.join(project_root, 'assets')
-    
-    for root, _, files in os.walk(assets_path):
-        if asset_name in files:
-            return os.path.join(root, asset_name)
-    return None
+    return get_asset_index(assets_path).find(asset_name)
 
 def to_fullwidth(s):
     # 半角转全角
@@ -86,69 +60,64 @@ def truncate_to_fullwidth(s, max_len):
         length += add
     return result
 
-def draw_rating_number_img(rating, anchor=(304, 62)):
+def draw_rating_number_img(rating, anchor=None, slot=None):
     """
     生成右对齐的rating数字图片，右下角锚点为anchor，数字染色为#f6c304。
+    字形由 digit_sprites 切分、染色后缓存。
     :param rating: int, 最多5位
-    :param anchor: (x, y) 右下角锚点
+    :param anchor: (x, y) 右下角锚点，默认为槽位的锚点
+    :param slot: 数字高度、间距与锚点所在的槽位，默认为渲染计划中的rating槽位
     :return: (img, paste_x, paste_y)
     """
-    from PIL import Image
+    slot = slot or PANEL_PLAN.slot("rating")
     try:
         project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     except NameError:
         project_root = os.path.abspath('.')
     num_path = os.path.join(project_root, 'assets', 'UI_CMN_Num_26p.png')
-    num_img = Image.open(num_path).convert('RGBA')
-    cell_w, cell_h = 34, 40
-    target_h = 21
-    spacing = -2
-    # 修正数字分布：0 1 2 3 | 4 5 6 7 | 8 9
-    num_map = {
-        '0': (0, 0), '1': (1, 0), '2': (2, 0), '3': (3, 0),
-        '4': (0, 1), '5': (1, 1), '6': (2, 1), '7': (3, 1),
-        '8': (0, 2), '9': (1, 2)
-    }
     rating_str = str(rating)[:5]
-    digits = list(rating_str)
-    digit_imgs = []
-    for d in digits:
-        if d not in num_map:
-            continue
-        cx, cy = num_map[d]
-        crop = num_img.crop((cx*cell_w, cy*cell_h, (cx+1)*cell_w, (cy+1)*cell_h))
-        scale = target_h / cell_h
-        new_w = int(cell_w * scale)
-        digit_img = crop.resize((new_w, target_h), Image.LANCZOS)
-        # 染色为#f6c304
-        r, g, b = 246, 195, 4
-        datas = digit_img.getdata()
-        new_data = []
-        for item in datas:
-            if item[3] > 0:
-                new_data.append((r, g, b, item[3]))
-            else:
-                new_data.append(item)
-        digit_img.putdata(new_data)
-        digit_imgs.append(digit_img)
-    # 右对齐拼接
-    total_w = 0
-    for img in digit_imgs:
-        total_w += img.width
-    if len(digit_imgs) > 1:
-        total_w += spacing * (len(digit_imgs)-1)
-    result_img = Image.new('RGBA', (total_w, target_h), (0,0,0,0))
-    x = result_img.width
-    for img in reversed(digit_imgs):
-        x -= img.width
-        result_img.paste(img, (x, 0), img)
-        x -= spacing
+    result_img = get_digit_sprites(num_path).render(
+        rating_str, color=(246, 195, 4), height=slot["height"], spacing=slot["spacing"]
+    )
     # 计算粘贴坐标
-    px, py = anchor
+    px, py = anchor or slot["point"]
     paste_x = px - result_img.width
     paste_y = py - result_img.height
     return result_img, paste_x, paste_y
 
+def warm_up_fonts():
+    """
+    预加载面板用到的全部字号，返回成功加载的数量。
+    """
+    try:
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    except NameError:
+        project_root = os.path.abspath('.')
+    font_path = os.path.join(project_root, 'assets', 'fonts', PANEL_FONT_NAME)
+    return font_registry.preload_fonts((font_path, size) for size in PANEL_FONT_SIZES)
+
+def warm_up_assets():
+    """
+    预先解码面板中与玩家无关的固定素材 (背景、称号底板、名字背景、DX Rating皮肤等)，
+    图集中已有的跳过，返回asset_cache统计信息。
+    """
+    names = [
+        "UI_CMN_SubBG_Game.png",
+        "NameBackground.png",
+        "On.png",
+        "UI_CMN_Num_26p.png",
+        "UI_CMN_Shougou_Normal.png",
+        "UI_CMN_Shougou_Silver.png",
+        "UI_CMN_Shougou_Bronze.png",
+        "UI_CMN_Shougou_Gold.png",
+        "UI_CMN_Shougou_Rainbow.png",
+    ]
+    names += [slot["asset"] for slot in PANEL_PLAN.slot("dx_rating")["variants"].values()]
+    # 已打包进图集的素材无需解码
+    paths = [find_asset(name) for name in names if sprite_atlas.source_size(name) is None]
+    asset_cache.warm_up(path for path in paths if path)
+    return asset_cache.stats()
+
 def get_dx_rating_id_by_value(rating):
     """
     根据rating数值自动返回DX Rating皮肤ID (1~11)
@@ -176,6 +145,291 @@ def get_dx_rating_id_by_value(rating):
     else:
         return 11 # Rainbow
 
+def panel_font_path():
+    """面板文字字体的路径"""
+    try:
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    except NameError:
+        project_root = os.path.abspath('.')
+    return os.path.join(project_root, 'assets', 'fonts', PANEL_FONT_NAME)
+
+def slot_layer(slot_name, context, quality=DEFAULT_QUALITY, scale=1):
+    """
+    按渲染计划取得一个图片图层: 选取变体、展开素材名，按槽位缩放。
+    :param context: 素材名模板与变体选择用到的参数
+    :param quality: 渲染质量档位，决定图集之外素材的缩放滤镜
+    :param scale: 渲染缩放比例 (见 create_panel_image)
+    :return: (图片, 粘贴坐标)，图片为共享对象 (只读使用)；变体未知、素材缺失或处理出错时返回 None
+    """
+    stage = f"panel.{slot_name}"
+    plan = PANEL_PLAN.scaled(scale)
+    slot, asset_name = plan.resolve(slot_name, context)
+    if slot is None:
+        variant_by = plan.slot(slot_name)["variant_by"]
+        logger.warning("未知的%s: %s", variant_by, context.get(variant_by), extra={"stage": stage})
+        return None
+    asset_full_path = find_asset(asset_name)
+    if not asset_full_path:
+        missing_assets.report(asset_name, stage, logger)
+        return None
+    try:
+        src_size = sprite_atlas.source_size(asset_name) or asset_cache.get(asset_full_path).size
+        size, position = plan.place(slot, src_size)
+        # 预缩放图集中有该尺寸时直接引用，否则解码缩放并缓存
+        asset_image = sprite_atlas.get(asset_name, size)
+        if asset_image is None:
+            asset_image = asset_cache.get(asset_full_path, None if size == src_size else size,
+                                          resample_filter(quality))
+    except Exception as e:
+        logger.warning("处理图片 %s 时出错: %s", asset_name, e, extra={"asset": asset_name, "stage": stage})
+        return None
+    logger.debug("取得图层: %s at %s", asset_name, position, extra={"asset": asset_name, "stage": stage})
+    return asset_image, position
+
+def paste_slot(base_image, slot_name, context, quality=DEFAULT_QUALITY, scale=1):
+    """
+    按渲染计划粘贴一个图片图层，参数见 slot_layer。
+    """
+    layer = slot_layer(slot_name, context, quality, scale)
+    if layer is not None:
+        paste_layer(base_image, layer)
+
+def paste_layer(base_image, layer):
+    """以图层自身的 alpha 为蒙版粘贴 (img, position)"""
+    img, position = layer
+    base_image.paste(img, position, img)
+
+def atlas_sprites(scales=(1,)):
+    """
+    面板中按参数选取的小图层 (段位、段位认证板、称号底板、DX Rating皮肤) 及其缩放尺寸，
+    供 sprite_atlas.build_atlas 打包。只读取源文件头获取尺寸，缺失的素材跳过。
+    :param scales: 需要打包的渲染缩放比例 (见 create_panel_image 的 scale)
+    :return: [(素材名, 素材路径, (w, h)), ...]
+    """
+    try:
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    except NameError:
+        project_root = os.path.abspath('.')
+    index = get_asset_index(os.path.join(project_root, 'assets'))
+    sprites = []
+    for scale in scales:
+        plan = PANEL_PLAN.scaled(scale)
+        for slot_name in plan.order:
+            slot = plan.slot(slot_name)
+            if slot["kind"] != "image" or "variants" not in slot:
+                continue
+            for variant in slot["variants"].values():
+                meta = index.metadata(variant["asset"])
+                if meta:
+                    size, _ = plan.place(variant, (meta["width"], meta["height"]))
+                    sprites.append((variant["asset"], meta["path"], size))
+    return sprites
+
+def draw_name(base_image, slot, name):
+    """绘制玩家名字: 转全角并截断后以黑字绘制在槽位锚点处"""
+    if not name:
+        return
+    # 1. 转全角
+    name_full = to_fullwidth(name)
+    # 2. 只截断超出的部分，不补全
+    max_chars = slot["max_chars"]
+    if len(name_full) > max_chars:
+        name_full = name_full[:max_chars]
+    # 3. 加载字体
+    font_path = panel_font_path()
+    try:
+        font = font_registry.get_font(font_path, slot["font_size"])
+    except Exception:
+        missing_assets.report(font_path, "font", logger)
+        font = None
+    # 4. 绘制
+    draw = ImageDraw.Draw(base_image)
+    position = tuple(slot["point"])
+    if font:
+        draw.text(position, name_full, font=font, fill=(0,0,0,255))
+        logger.debug("绘制名字: %s", name_full, extra={"stage": "panel.name"})
+    else:
+        draw.text(position, name_full, fill=(0,0,0,255))
+        logger.debug("用默认字体绘制名字: %s", name_full, extra={"stage": "panel.name"})
+
+def draw_shougou_text(base_image, slot, shougou_text):
+    """绘制称号文本 (描边字)，以槽位锚点为中心"""
+    if not shougou_text:
+        return
+    # 截断到指定的全角字符数
+    shougou_text = truncate_to_fullwidth(shougou_text, slot["max_width"])
+    # 生成描边字图片
+    outline_img = draw_text_with_outline_img(
+        text=shougou_text,
+        font_path=panel_font_path(),
+        font_size=slot["font_size"],
+        letter_spacing=0,
+        outline_width=1
+    )
+    # 计算中心居中粘贴位置
+    px, py = slot["point"]
+    img_w, img_h = outline_img.size
+    paste_x = px - img_w // 2
+    paste_y = py - img_h // 2
+    base_image.paste(outline_img, (paste_x, paste_y), outline_img)
+    logger.debug("绘制称号: %s，居中于(%d,%d)", shougou_text, px, py, extra={"stage": "panel.shougou_text"})
+
+def draw_rating(base_image, slot, rating):
+    """绘制rating数字，右下角对齐到槽位锚点"""
+    if not rating:
+        return
+    rating_img, px, py = draw_rating_number_img(rating, anchor=tuple(slot["point"]), slot=slot)
+    base_image.paste(rating_img, (px, py), rating_img)
+    logger.debug("绘制rating: %s 右下角锚点%s", rating, tuple(slot["point"]), extra={"stage": "panel.rating"})
+
+def right_aligned_text_layer(slot, text):
+    """
+    生成右上角对齐的描边字图层 (CREDIT(S)、版本号)，锚点为文字右上角 (不含描边)。
+    槽位中的固定文本 (text 字段) 优先。
+    :return: (图片, 粘贴坐标)，图片为 outline_renderer 缓存的共享对象 (只读使用)；没有文本时返回 None
+    """
+    text = slot.get("text", text)
+    if not text:
+        return None
+    outline_width = slot["outline_width"]
+    text_img = outline_renderer.render(
+        text, panel_font_path(), slot["font_size"], slot["letter_spacing"], outline_width,
+        (255, 255, 255, 255), (0, 0, 0, 255)
+    )
+    px, py = slot["point"]
+    # 右上角对齐，上边考虑黑边
+    return text_img, (px - text_img.width, py - outline_width)
+
+def draw_right_aligned_text(base_image, slot, text):
+    """绘制右上角对齐的描边字 (CREDIT(S)、版本号)，见 right_aligned_text_layer"""
+    layer = right_aligned_text_layer(slot, text)
+    if layer is None:
+        return
+    paste_layer(base_image, layer)
+    logger.debug("绘制文字: %s 于右上角%s", slot.get("text", text), tuple(slot["point"]), extra={"stage": "panel.text"})
+
+# 渲染计划中文字槽位的绘制函数
+PANEL_TEXT_DRAWERS = {
+    "name": draw_name,
+    "shougou_text": draw_shougou_text,
+    "rating": draw_rating,
+    "credit": draw_right_aligned_text,
+    "version": draw_right_aligned_text,
+}
+
+# 可以生成独立图层 (img, position) 的文字槽位，可放入顶层叠加图
+PANEL_TEXT_LAYERS = {
+    "credit": right_aligned_text_layer,
+    "version": right_aligned_text_layer,
+}
+
+# --- 面板底图缓存 ---
+#
+# 渲染计划中 cache 为 "base" 的底层图层 (背景、边框、名牌、称号底板、名字背景) 只取决于几个装饰ID，
+# 按 PANEL_BASE_FIELDS 合成一次后缓存，渲染时复制底图即可；cache 为 "overlay" 且位于计划末尾的
+# 图层 (On、CREDIT(S)、版本号) 合成为一张裁切到其外接矩形的叠加图，最后整体粘贴。
+# 两者都保证与逐层绘制逐像素一致: 底图图层只有在与其下方的非底图图层都不重叠时才提前合成，
+# 叠加图只在各元素互不重叠时使用 (元素原样复制进叠加图，粘贴时的混合与逐个粘贴相同)，否则按原顺序绘制。
+# 满尺寸底图约 1.9MB，按字节上限 LRU 淘汰，命中与淘汰次数见 panel_base_cache.stats()。
+PANEL_BASE_CACHE_BYTES = 32 * 1024 * 1024
+panel_base_cache = AssetCache(max_bytes=PANEL_BASE_CACHE_BYTES)
+
+# 底图缓存键中的装饰参数，须覆盖 cache 为 base 的槽位用到的全部字段
+PANEL_BASE_FIELDS = ("frame_id", "nameplate_id", "shougou_type")
+
+def _layer_box(layer):
+    img, (x, y) = layer
+    return x, y, x + img.width, y + img.height
+
+def _overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+def overlay_slots(plan):
+    """:return: 渲染计划末尾连续的、cache 为 overlay 且能生成独立图层的槽位名元组"""
+    names = []
+    for slot_name in reversed(plan.order):
+        slot = plan.slot(slot_name)
+        if slot.get("cache") != "overlay" or (slot["kind"] != "image" and slot_name not in PANEL_TEXT_LAYERS):
+            break
+        names.append(slot_name)
+    return tuple(reversed(names))
+
+def base_slots(plan, order, layer):
+    """
+    本次渲染中合成进底图的槽位: cache 为 base，且与绘制顺序中位于其下方的非底图图层都不重叠。
+    不满足条件的 (例如名字背景与某些段位图标重叠时) 留在原顺序中绘制。
+    :param order: 参与判断的槽位名，按绘制顺序
+    :param layer: 函数，槽位名 -> slot_layer() 的结果
+    :return: 槽位名元组，按绘制顺序
+    """
+    hoisted = []
+    below = []  # 下方非底图图层的区域，None 表示区域未知 (文字)
+    for slot_name in order:
+        slot = plan.slot(slot_name)
+        if slot.get("cache") == "base" and slot["kind"] == "image":
+            if not below:
+                hoisted.append(slot_name)
+                continue
+            current = layer(slot_name)
+            if current is None or all(box is not None and not _overlaps(_layer_box(current), box)
+                                      for box in below):
+                hoisted.append(slot_name)
+                continue
+        if slot["kind"] == "image":
+            current = layer(slot_name)
+            if current is not None:
+                below.append(_layer_box(current))
+        else:
+            below.append(None)
+    return tuple(hoisted)
+
+def get_panel_base(plan, context, hoisted, layer, quality=DEFAULT_QUALITY):
+    """
+    :return: 由 hoisted 中的图层按顺序合成的满画布底图 (共享对象，调用方复制后再绘制)
+    """
+    def build():
+        base = Image.new('RGBA', plan.canvas, (0, 0, 0, 0))
+        for slot_name in hoisted:
+            current = layer(slot_name)
+            if current is not None:
+                paste_layer(base, current)
+        return base
+
+    key = ("base", plan.key, quality, hoisted) + tuple(context[field] for field in PANEL_BASE_FIELDS)
+    return panel_base_cache.get_or_load(key, build)
+
+def get_panel_overlay(plan, names, layer, texts, quality=DEFAULT_QUALITY):
+    """
+    将末尾的固定图层合成为一张叠加图。
+    :param names: overlay_slots() 的结果
+    :return: (叠加图, 粘贴坐标)；没有可见元素时返回 (None, None)；元素互相重叠时返回 None，由调用方逐层绘制
+    """
+    elements = []
+    for slot_name in names:
+        slot = plan.slot(slot_name)
+        if slot["kind"] == "image":
+            current = layer(slot_name)
+        else:
+            current = PANEL_TEXT_LAYERS[slot_name](slot, texts.get(slot_name))
+        if current is not None:
+            elements.append(current)
+    if not elements:
+        return None, None
+    boxes = [_layer_box(element) for element in elements]
+    if any(_overlaps(a, b) for i, a in enumerate(boxes) for b in boxes[i + 1:]):
+        return None
+    x0, y0 = min(box[0] for box in boxes), min(box[1] for box in boxes)
+    x1, y1 = max(box[2] for box in boxes), max(box[3] for box in boxes)
+
+    def build():
+        overlay = Image.new('RGBA', (x1 - x0, y1 - y0), (0, 0, 0, 0))
+        for img, (x, y) in elements:
+            overlay.paste(img, (x - x0, y - y0))
+        return overlay
+
+    key = ("overlay", plan.key, quality, names, tuple(texts.get(slot_name) for slot_name in names))
+    return panel_base_cache.get_or_load(key, build), (x0, y0)
+
 def create_panel_image(
     frame_id: int,
     nameplate_id: int,
@@ -187,7 +441,10 @@ def create_panel_image(
     shougou_text: str = '',
     version_text: str = 'Ver.DX1.55-E',
     rating: int = 0,
-    output_filename="generated_panel.png"):
+    output_filename="generated_panel.png",
+    encode=None,
+    quality=DEFAULT_QUALITY,
+    scale=1):
     """
     根据传入的参数，动态生成玩家信息面板图片。
 
@@ -202,242 +459,101 @@ def create_panel_image(
         shougou_text (str): 称号文本。
         version_text (str): 版本文本。
         rating (int): 评分。
-        output_filename (str): 输出图片的文件名。
+        output_filename (str | file-like): 输出图片的文件名 (相对于项目根目录) 或可写的文件对象，
+            默认 "generated_panel.png"；为 None 时不写入文件，只返回图片 (内存中使用时应传 None)。
+        encode (dict): 可选，写入时的编码参数，见 encoder.save_image。
+        quality (str): 渲染质量档位 "full" | "fast" | "draft"，见 quality.QUALITY_TIERS。
+        scale (float): 缩放比例 (例如 0.5)，直接以缩放后的坐标、字号与图层尺寸渲染。
+
+    Returns:
+        PIL.Image: 生成的面板图片 (1080x452 乘以 scale, RGBA)。
+
+    Raises:
+        ValueError: 质量档位未知或缩放比例超出允许范围时。
     """
+    quality = check_quality(quality)
+    plan = PANEL_PLAN.scaled(check_scale(scale))
     try:
         project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     except NameError:
         project_root = os.path.abspath('.')
 
-    output_path = os.path.join(project_root, output_filename)
-
-    # 1. 创建画布 (1080x452)
-    base_image = Image.new('RGBA', (1080, 452), (0, 0, 0, 0))
-
-    # 2. 定义一个辅助函数来粘贴图层
-    def paste_layer(asset_name, position):
-        asset_full_path = find_asset(asset_name)
-        if asset_full_path:
-            try:
-                asset_image = Image.open(asset_full_path).convert('RGBA')
-                base_image.paste(asset_image, position, asset_image)
-                print(f"  - 成功粘贴图层: {asset_name}")
-            except Exception as e:
-                print(f"  - 处理图片 {asset_name} 时出错: {e}")
-        else:
-            print(f"  - 警告: 未找到素材 '{asset_name}'。")
-
-    print("开始合成图片...")
-    
-    # 3. 按照从下到上的顺序粘贴各个图层
-    
-    # 背景
-    paste_layer("UI_CMN_SubBG_Game.png", (0, 0))
-    
-    # 边框 (Frame)
-    frame_name = f"UI_Frame_{str(frame_id).zfill(6)}.png"
-    paste_layer(frame_name, (0, 0))
-    
-    # 名牌 (Nameplate)
-    nameplate_name = f"UI_Plate_{str(nameplate_id).zfill(6)}.png"
-    paste_layer(nameplate_name, (30, 27))
-    
-    # DX Rating 皮肤（自动推断ID）
-    dx_rating_id = get_dx_rating_id_by_value(rating)
-    dx_rating_name = f"UI_CMN_DXRating_S_{str(dx_rating_id).zfill(2)}.png"
-    dx_rating_pos = RATING_POSITIONS.get(dx_rating_id, (139, 34))
-    paste_layer(dx_rating_name, dx_rating_pos)
-
-    # 段位 (Class)
-    class_name = f"UI_CMN_Class_S_{str(class_id).zfill(2)}.png"
-    asset_full_path = find_asset(class_name)
-    class_geom = CLASS_GEOM.get(class_id, (313, 9, 108, 65))
-    x, y, w, h = class_geom
-    if asset_full_path:
-        try:
-            class_image = Image.open(asset_full_path).convert('RGBA')
-            src_w, src_h = class_image.size
-            scale = min(w / src_w, h / src_h)
-            new_w, new_h = int(src_w * scale), int(src_h * scale)
-            class_image = class_image.resize((new_w, new_h), Image.LANCZOS)
-            base_image.paste(class_image, (x, y), class_image)
-            print(f"  - 成功粘贴段位: {class_name} at {(x, y)} (原始:{src_w}x{src_h} 缩放:{new_w}x{new_h})")
-        except Exception as e:
-            print(f"  - 处理段位时出错: {e}")
+    if isinstance(output_filename, (str, os.PathLike)):
+        output_path = os.path.join(project_root, output_filename)
     else:
-        print(f"  - 警告: 未找到段位素材 '{class_name}'。")
-
-    # 称号 (Shougou)
-    shougou_data = {
-        0:  {"file": "UI_CMN_Shougou_Normal.png",  "pos": (140, 111)},
-        4:  {"file": "UI_CMN_Shougou_Rainbow.png", "pos": (142, 110)},
-        1:  {"file": "UI_CMN_Shougou_Silver.png",  "pos": (142, 112)},
-        2:  {"file": "UI_CMN_Shougou_Bronze.png",  "pos": (140, 112)},
-        3:  {"file": "UI_CMN_Shougou_Gold.png",    "pos": (142, 112)},
+        output_path = output_filename
+
+    laps = tracer.laps("panel")
+    start = time.perf_counter()
+
+    # 1. 素材名模板与变体选择用到的参数
+    context = {
+        "frame_id": frame_id,
+        "nameplate_id": nameplate_id,
+        "dx_rating_id": get_dx_rating_id_by_value(rating),  # DX Rating 皮肤 (自动推断ID)
+        "class_id": class_id,
+        "shougou_type": shougou_type,
+        "dani_id": dani_id,
+        "icon_id": icon_id,
     }
-    if shougou_type in shougou_data:
-        shougou_info = shougou_data[shougou_type]
-        paste_layer(shougou_info["file"], shougou_info["pos"])
-    else:
-        print(f"  - 警告: 未知的称号类型 '{shougou_type}'。")
-        
-    # 名字背景 (NameBackground)
-    paste_layer("NameBackground.png", (145, 70))
-
-    # 段位认证板 (Dani Plate)
-    dani_name = f"UI_CMN_DaniPlate_{str(dani_id).zfill(2)}.png"
-    asset_full_path = find_asset(dani_name)
-    dani_pos = DANI_POSITIONS.get(dani_id, (325, 73))
-    if asset_full_path:
-        try:
-            dani_image = Image.open(asset_full_path).convert('RGBA')
-            dani_image = dani_image.resize((89, 41), Image.LANCZOS)
-            base_image.paste(dani_image, dani_pos, dani_image)
-            print(f"  - 成功粘贴段位认证板: {dani_name} at {dani_pos}")
-        except Exception as e:
-            print(f"  - 处理段位认证板时出错: {e}")
-    else:
-        print(f"  - 警告: 未找到段位认证板素材 '{dani_name}'。")
+    texts = {
+        "name": name,
+        "shougou_text": shougou_text,
+        "rating": rating,
+        "version": version_text,
+    }
+    layers = {}
 
-    # 头像 (Icon) - 这是最上层
-    icon_name = f"UI_Icon_{str(icon_id).zfill(6)}.png"
-    asset_full_path = find_asset(icon_name)
-    if asset_full_path:
-        try:
-            icon_image = Image.open(asset_full_path).convert('RGBA')
-            icon_image = icon_image.resize((100, 100), Image.LANCZOS)
-            base_image.paste(icon_image, (39, 35), icon_image)
-            print(f"  - 成功粘贴头像: {icon_name}")
-        except Exception as e:
-            print(f"  - 处理头像时出错: {e}")
-    else:
-        print(f"  - 警告: 未找到头像素材 '{icon_name}'。")
-
-    # 绘制名字
-    if name:
-        # 1. 转全角
-        name_full = to_fullwidth(name)
-        # 2. 只截断超出8位，不补全
-        if len(name_full) > 8:
-            name_full = name_full[:8]
-        # 3. 加载字体
-        try:
-            project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        except NameError:
-            project_root = os.path.abspath('.')
-        font_path = os.path.join(project_root, 'assets', 'fonts', 'SEGAMaruGothicDB.ttf')
-        try:
-            font = ImageFont.truetype(font_path, 30)
-        except Exception as e:
-            print(f"  - 警告: 加载字体失败: {e}")
-            font = None
-        # 4. 绘制
-        draw = ImageDraw.Draw(base_image)
-        if font:
-            draw.text((150, 75), name_full, font=font, fill=(0,0,0,255))
-            print(f"  - 成功绘制名字: {name_full}")
+    def layer(slot_name):
+        if slot_name not in layers:
+            layers[slot_name] = slot_layer(slot_name, context, quality, plan.scale)
+        return layers[slot_name]
+
+    def draw(slot_name):
+        slot = plan.slot(slot_name)
+        if slot["kind"] == "image":
+            current = layer(slot_name)
+            if current is not None:
+                paste_layer(base_image, current)
         else:
-            draw.text((150, 75), name_full, fill=(0,0,0,255))
-            print(f"  - 用默认字体绘制名字: {name_full}")
+            PANEL_TEXT_DRAWERS[slot_name](base_image, slot, texts.get(slot_name))
 
-    # 绘制称号（shougou_text）
-    if shougou_text:
-        # 截断到15个全角字符
-        shougou_text = truncate_to_fullwidth(shougou_text, 15)
-        try:
-            project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        except NameError:
-            project_root = os.path.abspath('.')
-        font_path = os.path.join(project_root, 'assets', 'fonts', 'SEGAMaruGothicDB.ttf')
-        # 生成描边字图片
-        outline_img = draw_text_with_outline_img(
-            text=shougou_text,
-            font_path=font_path,
-            font_size=15,  # 字高15px
-            letter_spacing=0, 
-            outline_width=1
-        )
-        # 计算中心居中粘贴位置
-        px, py = 277, 124
-        img_w, img_h = outline_img.size
-        paste_x = px - img_w // 2
-        paste_y = py - img_h // 2
-        base_image.paste(outline_img, (paste_x, paste_y), outline_img)
-        print(f"  - 成功绘制称号: {shougou_text}，居中于({px},{py})")
-
-    # 绘制rating数字
-    if rating:
-        rating_img, px, py = draw_rating_number_img(rating, anchor=(304, 62))
-        base_image.paste(rating_img, (px, py), rating_img)
-        print(f"  - 成功绘制rating: {rating} 右下角锚点(302,62)")
-
-    # 最顶层粘贴 On.png
-    try:
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    except NameError:
-        project_root = os.path.abspath('.')
-    on_path = os.path.join(project_root, 'assets', 'On.png')
-    if os.path.exists(on_path):
+    logger.debug("开始合成面板", extra={"stage": "panel"})
+
+    # 2. 复制缓存的底图 (1080x452，按 scale 缩放)
+    overlay_names = overlay_slots(plan)
+    order = plan.order[:len(plan.order) - len(overlay_names)]
+    hoisted = base_slots(plan, order, layer)
+    base_image = get_panel_base(plan, context, hoisted, layer, quality).copy()
+    laps.lap("base")
+
+    # 3. 按照渲染计划的顺序 (从下到上) 绘制其余图层与文字
+    for slot_name in order:
+        if slot_name not in hoisted:
+            draw(slot_name)
+            laps.lap(slot_name)
+
+    # 4. 粘贴右上角的固定叠加图 (元素重叠时逐层绘制)
+    overlay = get_panel_overlay(plan, overlay_names, layer, texts, quality)
+    if overlay is None:
+        for slot_name in overlay_names:
+            draw(slot_name)
+    elif overlay[0] is not None:
+        paste_layer(base_image, overlay)
+    laps.lap("overlay")
+
+    # 5. 保存最终生成的图片
+    if output_path is not None:
         try:
-            on_image = Image.open(on_path).convert('RGBA')
-            base_image.paste(on_image, (1018, 27), on_image)
-            print("  - 成功粘贴 On.png 在 (1018, 27)")
+            save_image(base_image, output_path, **(encode or {}))
+            logger.info("成功生成面板图片: %s", output_path, extra={"path": str(output_path), "stage": "panel.save"})
         except Exception as e:
-            print(f"  - 处理 On.png 时出错: {e}")
-    else:
-        print("  - 警告: 未找到 On.png")
+            logger.error("保存最终图片时出错: %s", e, extra={"path": str(output_path), "stage": "panel.save"})
+        laps.lap("save")
+    laps.done()
+    logger.debug("面板合成完成", extra={"stage": "panel", "duration": time.perf_counter() - start})
 
-    # 右上角绘制 CREDIT(S) 24
-    try:
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    except NameError:
-        project_root = os.path.abspath('.')
-    font_path = os.path.join(project_root, 'assets', 'fonts', 'SEGAMaruGothicDB.ttf')
-    credit_text = 'CREDIT(S) 24'
-    credit_img = draw_text_with_outline_img(
-        text=credit_text,
-        font_path=font_path,
-        font_size=22,
-        letter_spacing=1,
-        outline_width=1
-    )
-    img_w, img_h = credit_img.size
-    px = 1080 - 93  # 画布宽-93
-    py = 33+3
-    paste_x = px - img_w  # 右上角对齐
-    paste_y = py
-    base_image.paste(credit_img, (paste_x, paste_y), credit_img)
-    print(f"  - 成功绘制CREDIT(S) 24于右上角({px},{py})")
-
-    # 右上角绘制 version_text
-    if version_text:
-        try:
-            project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        except NameError:
-            project_root = os.path.abspath('.')
-        font_path = os.path.join(project_root, 'assets', 'fonts', 'SEGAMaruGothicDB.ttf')
-        outline_width = 1
-        version_img = draw_text_with_outline_img(
-            text=version_text,
-            font_path=font_path,
-            font_size=17,
-            letter_spacing=1,
-            outline_width=outline_width
-        )
-        img_w, img_h = version_img.size
-        px = 1080 - 25  # 画布宽-25
-        py = 70+7
-        paste_x = px - img_w  # 右上角对齐
-        paste_y = py - outline_width  # 上边考虑黑边
-        base_image.paste(version_img, (paste_x, paste_y), version_img)
-        print(f"  - 成功绘制版本号: {version_text} 于右上角({px},{py})")
-
-    # 4. 保存最终生成的图片
-    try:
-        base_image.save(output_path)
-        print(f"成功生成面板图片: {output_path}")
-    except Exception as e:
-        print(f"保存最终图片时出错: {e}")
+    return base_image
 
 def draw_text_with_outline(
     base_image,
@@ -462,22 +578,11 @@ def draw_text_with_outline(
     :param fill: 字体颜色
     :param outline_fill: 描边颜色
     """
-    from PIL import ImageDraw, ImageFont
-
-    font = ImageFont.truetype(font_path, font_size)
-    draw = ImageDraw.Draw(base_image)
-
+    text_img = outline_renderer.render(
+        text, font_path, font_size, letter_spacing, outline_width, fill, outline_fill
+    )
     x, y = position
-    # 逐字绘制，支持字距
-    for i, char in enumerate(text):
-        char_x = x + i * (font.getsize(char)[0] + letter_spacing)
-        # 先画描边
-        for dx in range(-outline_width, outline_width+1):
-            for dy in range(-outline_width, outline_width+1):
-                if dx != 0 or dy != 0:
-                    draw.text((char_x+dx, y+dy), char, font=font, fill=outline_fill)
-        # 再画白字
-        draw.text((char_x, y), char, font=font, fill=fill)
+    base_image.paste(text_img, (x - outline_width, y - outline_width), text_img)
 
 def draw_text_with_outline_img(
     text,
@@ -490,6 +595,7 @@ def draw_text_with_outline_img(
 ):
     """
     生成带黑色描边的白字图片，返回PIL.Image对象（透明底）。
+    描边字形与整串结果由 outline_renderer 缓存，重复的文本几乎无开销。
     :param text: 文本内容
     :param font_path: 字体路径
     :param font_size: 字体大小
@@ -499,39 +605,9 @@ def draw_text_with_outline_img(
     :param outline_fill: 描边颜色
     :return: PIL.Image
     """
-    from PIL import ImageDraw, ImageFont, Image
-    font = ImageFont.truetype(font_path, font_size)
-    # 计算整体宽高（支持字距）
-    total_width = 0
-    max_height = 0
-    char_sizes = []
-    for char in text:
-        bbox = font.getbbox(char)
-        w = bbox[2] - bbox[0]
-        h = bbox[3] - bbox[1]
-        char_sizes.append((w, h))
-        total_width += w + letter_spacing
-        max_height = max(max_height, h)
-    if len(text) > 0:
-        total_width -= letter_spacing  # 最后一个字不加字距
-    # 获取字体 metrics
-    ascent, descent = font.getmetrics()
-    img_height = max_height + 2 * outline_width + descent
-    img = Image.new('RGBA', (total_width + 2*outline_width, img_height), (0,0,0,0))
-    draw = ImageDraw.Draw(img)
-    x = outline_width
-    y = outline_width
-    for i, char in enumerate(text):
-        w, h = char_sizes[i]
-        # 画描边
-        for dx in range(-outline_width, outline_width+1):
-            for dy in range(-outline_width, outline_width+1):
-                if dx != 0 or dy != 0:
-                    draw.text((x+dx, y+dy), char, font=font, fill=outline_fill)
-        # 画白字
-        draw.text((x, y), char, font=font, fill=fill)
-        x += w + letter_spacing
-    return img
+    return outline_renderer.render(
+        text, font_path, font_size, letter_spacing, outline_width, fill, outline_fill
+    ).copy()
 
 if __name__ == '__main__':
     # --- 使用示例 ---
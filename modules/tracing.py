@@ -0,0 +1,245 @@
+import os
+import sys
+import time
+import threading
+import tracemalloc
+
+# 直方图桶: 第 i 个桶收录耗时 < 2^i 微秒的样本
+HISTOGRAM_BUCKETS = 32
+
+
+class StageStats:
+    """单个阶段的统计: 次数、总耗时、极值、log2 直方图及 Python 堆分配量"""
+
+    __slots__ = ("count", "total", "min", "max", "buckets", "alloc_total", "alloc_max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+        self.alloc_total = 0
+        self.alloc_max = 0
+
+    def add(self, seconds, alloc=None):
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        index = min(int(seconds * 1e6).bit_length(), HISTOGRAM_BUCKETS - 1)
+        self.buckets[index] += 1
+        if alloc is not None:
+            self.alloc_total += alloc
+            self.alloc_max = max(self.alloc_max, alloc)
+
+    def percentile(self, q):
+        """由直方图估计分位数 (返回所在桶的上界，秒)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for index, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return min((1 << index) / 1e6, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "min_ms": (self.min or 0.0) * 1000,
+            "max_ms": self.max * 1000,
+            "p50_ms": self.percentile(0.50) * 1000,
+            "p90_ms": self.percentile(0.90) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "alloc_mean_bytes": self.alloc_total // self.count if self.count else 0,
+            "alloc_max_bytes": self.alloc_max,
+            # 键为桶上界 (微秒)
+            "histogram_us": {str(1 << i): n for i, n in enumerate(self.buckets) if n},
+        }
+
+
+class _NullStage:
+    """关闭时返回的空实现，避免任何计时开销"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def lap(self, name):
+        pass
+
+    def done(self, name=None):
+        pass
+
+
+_NULL = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("tracer", "name", "start", "alloc_start")
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.alloc_start = self.tracer._alloc_mark()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.tracer.record(self.name, elapsed, self.tracer._alloc_since(self.alloc_start))
+        return False
+
+
+class _Laps:
+    """
+    顺序流水线的分段计时: 每次 lap(name) 记录自上一次 lap 以来的耗时，
+    done() 额外记录从开始到结束的总耗时。
+    """
+
+    __slots__ = ("tracer", "prefix", "start", "last", "alloc_start")
+
+    def __init__(self, tracer, prefix):
+        self.tracer = tracer
+        self.prefix = prefix
+        self.alloc_start = tracer._alloc_mark()
+        self.start = self.last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.tracer.record(f"{self.prefix}.{name}", now - self.last, self.tracer._alloc_since(self.alloc_start))
+        self.alloc_start = self.tracer._alloc_mark()
+        self.last = time.perf_counter()
+
+    def done(self, name="total"):
+        self.tracer.record(f"{self.prefix}.{name}", time.perf_counter() - self.start)
+
+
+class Tracer:
+    """
+    渲染流水线的分阶段计时。
+
+    关闭时 (默认) stage()/laps() 直接返回共享的空对象，开销只有一次属性判断。
+    开启后每个阶段的耗时 (可选: tracemalloc 统计的 Python 堆分配峰值) 汇总到按阶段名区分的
+    直方图中，也可注册回调逐条接收 (name, seconds, alloc_bytes)。
+    统计只在当前进程内累积，进程池中的工作进程各自独立。
+    分配量为阶段内 tracemalloc 的峰值增量；阶段嵌套时内层会重置峰值，外层的分配量只是近似值。
+    注意 tracemalloc 只跟踪 Python 内存分配器: Pillow 的像素缓冲区由其 C 代码直接 malloc，
+    不计入其中，因此该数值反映的是 Python 对象的分配，不是图片占用的内存。
+
+    环境变量 B50_TRACE=1 可在启动时开启，B50_TRACE=alloc 同时统计 Python 堆分配。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.allocations = False
+        self._stats = {}
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def enable(self, allocations=False):
+        """
+        开启计时。
+        :param allocations: 是否统计各阶段的 Python 堆分配峰值 (启用 tracemalloc，渲染明显变慢；
+                            不含 Pillow 的像素缓冲区)
+        """
+        self.allocations = allocations
+        if allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if self.allocations and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.allocations = False
+
+    def stage(self, name):
+        """
+        计时上下文管理器: with tracer.stage("encode"): ...
+        """
+        if not self.enabled:
+            return _NULL
+        return _Stage(self, name)
+
+    def laps(self, prefix):
+        """
+        顺序流水线的分段计时器:
+            laps = tracer.laps("song_cell")
+            ...; laps.lap("jacket")
+            ...; laps.lap("title")
+            laps.done()
+        """
+        if not self.enabled:
+            return _NULL
+        return _Laps(self, prefix)
+
+    def record(self, name, seconds, alloc=None):
+        """记录一个样本，也可供外部计时直接调用"""
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = StageStats()
+            stats.add(seconds, alloc)
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback(name, seconds, alloc)
+
+    def add_callback(self, callback):
+        """注册回调 callback(name, seconds, alloc_bytes)，alloc_bytes 未统计时为 None"""
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        with self._lock:
+            self._callbacks.remove(callback)
+
+    def snapshot(self):
+        """:return: {阶段名: 统计字典}"""
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in sorted(self._stats.items())}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def report(self, file=None):
+        """以表格形式输出各阶段统计"""
+        file = file or sys.stderr
+        snapshot = self.snapshot()
+        print(f"{'stage':<28}{'count':>7}{'total ms':>11}{'mean ms':>10}{'p50 ms':>9}{'p99 ms':>9}{'py KB':>10}",
+              file=file)
+        for name, s in snapshot.items():
+            print(f"{name:<28}{s['count']:>7}{s['total_ms']:>11.2f}{s['mean_ms']:>10.3f}"
+                  f"{s['p50_ms']:>9.3f}{s['p99_ms']:>9.3f}{s['alloc_max_bytes'] / 1024:>10.1f}", file=file)
+
+    # --- 内部实现 ---
+
+    def _alloc_mark(self):
+        if not self.allocations:
+            return None
+        tracemalloc.reset_peak()
+        return tracemalloc.get_traced_memory()[0]
+
+    def _alloc_since(self, mark):
+        if mark is None:
+            return None
+        return max(tracemalloc.get_traced_memory()[1] - mark, 0)
+
+
+# 进程级共享实例
+tracer = Tracer()
+
+_env = os.environ.get("B50_TRACE", "").lower()
+if _env in ("1", "true", "yes", "alloc"):
+    tracer.enable(allocations=_env == "alloc")
@@ -0,0 +1,451 @@
+import os
+import time
+import signal
+import pickle
+import logging
+import threading
+import traceback
+import multiprocessing
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from multiprocessing.connection import wait
+from multiprocessing.reduction import send_handle, recv_handle
+
+logger = logging.getLogger(__name__)
+
+# 是否支持 fork (预热后复制进程)；不支持的平台退回 ProcessPoolExecutor
+FORK_SUPPORTED = hasattr(os, 'fork') and 'fork' in multiprocessing.get_all_start_methods()
+
+
+class WorkerCrashed(RuntimeError):
+    """工作进程在执行任务时意外退出"""
+
+
+class RemoteError(RuntimeError):
+    """任务异常无法在进程间传递时的替代异常 (保留原异常的描述与回溯文本)"""
+
+
+# --- 工作进程与孵化进程 (在子进程中执行) ---
+
+def _worker_main(conn, max_jobs):
+    """
+    工作进程主循环: 接收 (任务ID, 序列化的调用) 并回传 (任务ID, 是否成功, 结果或异常, 是否退役)。
+    执行满 max_jobs 个任务后主动退出，由监督者补充新的工作进程。
+    """
+    jobs = 0
+    while True:
+        try:
+            message = conn.recv_bytes()
+        except (EOFError, OSError):
+            return
+        if not message:
+            return
+        task_id, payload = pickle.loads(message)
+        try:
+            fn, args, kwargs = pickle.loads(payload)
+            ok, value = True, fn(*args, **kwargs)
+        except BaseException as e:
+            e.remote_traceback = traceback.format_exc()
+            ok, value = False, e
+        jobs += 1
+        retire = bool(max_jobs) and jobs >= max_jobs
+        try:
+            data = pickle.dumps((task_id, ok, value, retire))
+        except Exception as e:
+            error = RemoteError(f"{value!r}" if not ok else f"任务结果无法序列化: {e!r}")
+            error.remote_traceback = getattr(value, "remote_traceback", None)
+            data = pickle.dumps((task_id, False, error, retire))
+        try:
+            conn.send_bytes(data)
+        except (EOFError, OSError):
+            return
+        if retire:
+            return
+
+
+def _zygote_main(control, warm_up, max_jobs, supervisor_end=None):
+    """
+    孵化进程: 预热一次 (字体、素材索引、图集、静态模板等) 后常驻，
+    按监督者的请求 fork 工作进程。工作进程以写时复制方式继承预热好的状态，
+    与监督者之间的连接通过 control 传回 (文件描述符传递)。
+    孵化进程是单线程的，在这里 fork 不会继承其他线程持有的锁。
+    :param supervisor_end: fork 时继承的监督者一端的副本，立即关闭，
+                           使监督者进程未调用 shutdown 就退出时 control 读到 EOF，孵化进程随之退出
+    """
+    if supervisor_end is not None:
+        supervisor_end.close()
+    # 自动回收退出的工作进程
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    try:
+        if warm_up is not None:
+            warm_up()
+    except BaseException as e:
+        control.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    control.send(("ready", os.getpid()))
+    while True:
+        try:
+            worker_id = control.recv()
+        except (EOFError, OSError):
+            return
+        if worker_id is None:
+            return
+        parent_end, child_end = multiprocessing.Pipe(duplex=True)
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                control.close()
+                parent_end.close()
+                _worker_main(child_end, max_jobs)
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        child_end.close()
+        send_handle(control, parent_end.fileno(), pid)
+        control.send((worker_id, pid))
+        parent_end.close()
+
+
+def _process_memory(pid):
+    """
+    :return: {"rss_bytes", "private_bytes"}；private 为进程独占 (未与孵化进程共享) 的内存，
+             读取失败 (非Linux等) 时返回空字典
+    """
+    memory = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line and not line.startswith(' '))
+    except OSError:
+        return memory
+
+    def kb(name):
+        value = fields.get(name, '').split()
+        return int(value[0]) * 1024 if value else 0
+
+    memory["rss_bytes"] = kb("Rss")
+    memory["private_bytes"] = kb("Private_Clean") + kb("Private_Dirty")
+    return memory
+
+
+# --- 监督者 (在主进程中执行) ---
+
+class _Worker:
+    __slots__ = ("id", "pid", "conn", "task", "jobs", "started_at", "busy_since", "last_job_at")
+
+    def __init__(self, worker_id, pid, conn):
+        self.id = worker_id
+        self.pid = pid
+        self.conn = conn
+        self.task = None
+        self.jobs = 0
+        self.started_at = time.time()
+        self.busy_since = None
+        self.last_job_at = None
+
+
+class WorkerSupervisor(Executor):
+    """
+    预热后 fork 的工作进程池，实现 concurrent.futures.Executor 接口 (submit/map/shutdown)。
+
+    启动时先 fork 一个孵化进程完成全部预热 (warm_up)，再由它 fork 出 workers 个工作进程；
+    工作进程以写时复制方式共享预热好的字体、素材索引、图集映射与静态模板，
+    首个任务无需再付冷启动开销。每个工作进程执行 max_jobs_per_worker 个任务后退役，
+    由孵化进程补充一个新的 (同样已预热)，以限制长期运行时的内存增长；
+    意外退出的工作进程同样会被替换，其正在执行的任务以 WorkerCrashed 失败。
+
+    所有与工作进程的通信都在一个调度线程中完成；submit 可在任意线程中调用。
+    仅支持可 fork 的平台 (见 create_executor)。
+    """
+
+    def __init__(self, workers=None, warm_up=None, max_jobs_per_worker=None):
+        """
+        :param workers: 工作进程数，默认为CPU核数
+        :param warm_up: 在孵化进程中执行一次的预热函数 (需可被 fork 继承，无需可序列化)
+        :param max_jobs_per_worker: 每个工作进程执行多少个任务后退役，None 表示不限
+        """
+        if not FORK_SUPPORTED:
+            raise RuntimeError("当前平台不支持 fork，请使用 create_executor")
+        self.workers = workers or os.cpu_count() or 1
+        self.warm_up = warm_up
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "spawned": 0, "recycled": 0, "crashed": 0}
+        self.started_at = None
+        self.warm_up_seconds = None
+        self._ctx = multiprocessing.get_context('fork')
+        self._pending = deque()
+        self._workers = {}
+        self._spawning = 0
+        self._next_worker_id = 0
+        self._next_task_id = 0
+        self._zygote = None
+        self._control = None
+        self._thread = None
+        self._wakeup_reader = None
+        self._wakeup_writer = None
+        self._wake_pending = False
+        self._shutdown = False
+        self._lock = threading.Lock()
+        self._started = threading.Event()
+
+    # --- 生命周期 ---
+
+    def start(self):
+        """
+        启动孵化进程并等待预热与全部工作进程就绪 (阻塞)。
+        应在创建其他线程之前调用；submit 时也会自动启动。
+        :raises RuntimeError: 预热失败时
+        """
+        with self._lock:
+            if self._thread is not None:
+                return self
+            start = time.perf_counter()
+            self._control, zygote_end = self._ctx.Pipe(duplex=True)
+            self._zygote = self._ctx.Process(
+                target=_zygote_main, args=(zygote_end, self.warm_up, self.max_jobs_per_worker, self._control),
+                name="b50-zygote", daemon=True,
+            )
+            self._zygote.start()
+            zygote_end.close()
+            status, detail = self._control.recv()
+            if status != "ready":
+                self._zygote.join()
+                raise RuntimeError(f"工作进程预热失败: {detail}")
+            self.warm_up_seconds = time.perf_counter() - start
+            self._wakeup_reader, self._wakeup_writer = self._ctx.Pipe(duplex=False)
+            for _ in range(self.workers):
+                self._spawn()
+            while self._spawning:
+                self._receive_worker()
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name="b50-supervisor", daemon=True)
+            self._thread.start()
+        logger.info("工作进程已就绪: %d 个 (预热 %.2fs)", self.workers, self.warm_up_seconds,
+                    extra={"count": self.workers, "duration": self.warm_up_seconds})
+        return self
+
+    def submit(self, fn, /, *args, **kwargs):
+        """
+        提交任务，fn 与参数需可序列化 (模块级函数)。
+        :return: concurrent.futures.Future
+        """
+        if self._thread is None:
+            self.start()
+        payload = pickle.dumps((fn, args, kwargs))
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("工作进程池已关闭，不能再提交任务")
+            self._pending.append((future, payload))
+            self.counters["submitted"] += 1
+        self._wake()
+        return future
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        """
+        关闭进程池: 不再接受新任务，已提交的任务执行完后结束全部工作进程与孵化进程。
+        :param cancel_futures: 为 True 时取消尚未开始执行的任务
+        """
+        with self._lock:
+            self._shutdown = True
+            if cancel_futures:
+                while self._pending:
+                    future, _ = self._pending.popleft()
+                    future.cancel()
+        if self._thread is None:
+            return
+        self._wake()
+        if wait:
+            self._thread.join()
+
+    def health(self):
+        """
+        :return: 进程池状态: 计数、排队任务数及每个工作进程的
+                 pid/状态/已执行任务数/运行时长/忙碌时长/内存 (Linux 下含独占内存)
+        """
+        now = time.time()
+        with self._lock:
+            workers = [{
+                "id": w.id,
+                "pid": w.pid,
+                "state": "busy" if w.task is not None else "idle",
+                "jobs": w.jobs,
+                "uptime": now - w.started_at,
+                "busy_for": now - w.busy_since if w.busy_since else 0.0,
+                "idle_for": now - (w.last_job_at or w.started_at) if w.task is None else 0.0,
+            } for w in self._workers.values()]
+            status = {
+                "status": "stopping" if self._shutdown else ("ok" if self._thread else "not_started"),
+                "workers": self.workers,
+                "alive": len(self._workers),
+                "pending": len(self._pending),
+                "max_jobs_per_worker": self.max_jobs_per_worker,
+                "warm_up_seconds": self.warm_up_seconds,
+                "zygote_pid": self._zygote.pid if self._zygote else None,
+                **self.counters,
+            }
+        for worker in workers:
+            worker.update(_process_memory(worker["pid"]))
+        status["worker_details"] = workers
+        return status
+
+    # --- 调度线程 ---
+
+    def _wake(self):
+        """
+        唤醒调度线程。未被读取的唤醒至多一个，且在锁外写入:
+        大量 submit 不会写满管道，写入阻塞时也不会持有调度线程需要的锁。
+        """
+        with self._lock:
+            if self._wakeup_writer is None or self._wake_pending:
+                return
+            self._wake_pending = True
+            writer = self._wakeup_writer
+        try:
+            writer.send_bytes(b"")
+        except (OSError, ValueError):  # 调度线程已结束并关闭了管道
+            pass
+
+    def _spawn(self):
+        """请求孵化进程 fork 一个新工作进程 (结果由 _receive_worker 接收)"""
+        self._control.send(self._next_worker_id)
+        self._next_worker_id += 1
+        self._spawning += 1
+        self.counters["spawned"] += 1
+
+    def _receive_worker(self):
+        fd = recv_handle(self._control)
+        worker_id, pid = self._control.recv()
+        self._spawning -= 1
+        self._workers[worker_id] = _Worker(worker_id, pid, multiprocessing.connection.Connection(fd))
+
+    def _run(self):
+        try:
+            while True:
+                self._dispatch()
+                with self._lock:
+                    finished = self._shutdown and not self._pending and not any(
+                        w.task for w in self._workers.values())
+                if finished:
+                    break
+                conns = [w.conn for w in self._workers.values()] + [self._wakeup_reader]
+                if self._spawning:
+                    conns.append(self._control)
+                for conn in wait(conns):
+                    if conn is self._wakeup_reader:
+                        conn.recv_bytes()
+                        with self._lock:
+                            self._wake_pending = False
+                    elif conn is self._control:
+                        with self._lock:
+                            self._receive_worker()
+                    else:
+                        self._handle_result(conn)
+        except Exception:
+            logger.exception("工作进程调度线程异常退出")
+            self._fail_all(RuntimeError("工作进程调度线程异常退出"))
+        finally:
+            self._stop_processes()
+
+    def _dispatch(self):
+        """把排队的任务分给空闲的工作进程"""
+        with self._lock:
+            idle = [w for w in self._workers.values() if w.task is None]
+            while idle and self._pending:
+                future, payload = self._pending.popleft()
+                if not future.running() and not future.set_running_or_notify_cancel():
+                    continue
+                worker = idle.pop()
+                task_id = self._next_task_id
+                self._next_task_id += 1
+                try:
+                    worker.conn.send_bytes(pickle.dumps((task_id, payload)))
+                except (OSError, EOFError):
+                    # 工作进程已退出: 任务放回队首，由 _handle_result 替换该进程
+                    self._pending.appendleft((future, payload))
+                    continue
+                worker.task = (task_id, future)
+                worker.busy_since = time.time()
+
+    def _handle_result(self, conn):
+        worker = next(w for w in self._workers.values() if w.conn is conn)
+        try:
+            task_id, ok, value, retire = pickle.loads(conn.recv_bytes())
+        except (EOFError, OSError):
+            self._replace(worker, crashed=True)
+            return
+        _, future = worker.task
+        with self._lock:
+            worker.task = None
+            worker.jobs += 1
+            worker.busy_since = None
+            worker.last_job_at = time.time()
+            self.counters["completed" if ok else "failed"] += 1
+        if ok:
+            future.set_result(value)
+        else:
+            future.set_exception(value)
+        if retire:
+            self._replace(worker, crashed=False)
+
+    def _replace(self, worker, crashed):
+        """移除退出的工作进程，未关闭时补充一个新的"""
+        with self._lock:
+            self._workers.pop(worker.id, None)
+            task = worker.task
+            if crashed:
+                self.counters["crashed"] += 1
+            else:
+                self.counters["recycled"] += 1
+            shutting_down = self._shutdown and not self._pending
+        worker.conn.close()
+        if task is not None:
+            task[1].set_exception(WorkerCrashed(f"工作进程 {worker.pid} 意外退出"))
+        if crashed:
+            logger.warning("工作进程意外退出: pid=%d", worker.pid, extra={"stage": "worker"})
+        else:
+            logger.debug("工作进程已退役: pid=%d (%d 个任务)", worker.pid, worker.jobs, extra={"stage": "worker"})
+        if not shutting_down:
+            self._spawn()
+
+    def _fail_all(self, error):
+        with self._lock:
+            futures = [future for future, _ in self._pending]
+            futures += [w.task[1] for w in self._workers.values() if w.task]
+            self._pending.clear()
+        for future in futures:
+            if not future.done():
+                future.set_exception(error)
+
+    def _stop_processes(self):
+        for worker in list(self._workers.values()):
+            try:
+                worker.conn.send_bytes(b"")
+            except OSError:
+                pass
+            worker.conn.close()
+        self._workers.clear()
+        try:
+            self._control.send(None)
+        except OSError:
+            pass
+        self._zygote.join(timeout=5)
+        if self._zygote.is_alive():
+            self._zygote.terminate()
+        self._control.close()
+        with self._lock:
+            self._wakeup_writer.close()
+            self._wakeup_writer = None
+        self._wakeup_reader.close()
+
+
+def create_executor(workers=None, warm_up=None, max_jobs_per_worker=None):
+    """
+    创建渲染用的进程池: 支持 fork 的平台使用预热后 fork 的 WorkerSupervisor，
+    否则退回以 warm_up 为 initializer 的 ProcessPoolExecutor (每个进程各自预热，不回收)。
+    """
+    if FORK_SUPPORTED:
+        return WorkerSupervisor(workers, warm_up, max_jobs_per_worker)
+    return ProcessPoolExecutor(max_workers=workers, initializer=warm_up)
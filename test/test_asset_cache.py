@@ -0,0 +1,63 @@
+import os
+from PIL import Image
+from modules import asset_cache as asset_cache_module
+from modules.asset_cache import AssetCache
+
+
+def write_png(path, color, size=(8, 4), mtime_ns=None):
+    Image.new('RGBA', size, color).save(path)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return str(path)
+
+
+def test_one_count_per_call(tmp_path):
+    path = write_png(tmp_path / "a.png", (255, 0, 0, 255))
+    cache = AssetCache()
+    cache.get(path, (4, 2))
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (0, 1)
+    cache.get(path, (4, 2))
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+    cache.get(path)  # 缩放时已解码的原图
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (2, 1)
+    cache.get(path, (2, 1))
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (2, 2)
+    assert cache.stats()["entries"] == 3
+
+
+def test_same_size_shares_original(tmp_path):
+    path = write_png(tmp_path / "a.png", (255, 0, 0, 255))
+    cache = AssetCache()
+    original = cache.get(path)
+    assert cache.get(path, original.size) is original
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] == 8 * 4 * 4
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_replaced_asset_is_redecoded(tmp_path):
+    path = write_png(tmp_path / "a.png", (255, 0, 0, 255), mtime_ns=10 ** 18)
+    cache = AssetCache(check_interval=0)
+    assert cache.get(path).getpixel((0, 0)) == (255, 0, 0, 255)
+    write_png(path, (0, 0, 255, 255), mtime_ns=2 * 10 ** 18)
+    assert cache.get(path).getpixel((0, 0)) == (0, 0, 255, 255)
+    assert cache.get(path, (4, 2)).getpixel((0, 0)) == (0, 0, 255, 255)
+
+
+def test_stat_throttled(tmp_path, monkeypatch):
+    path = write_png(tmp_path / "a.png", (255, 0, 0, 255))
+    calls = []
+    real_stamp = asset_cache_module._source_stamp
+    monkeypatch.setattr(asset_cache_module, "_source_stamp", lambda p: calls.append(p) or real_stamp(p))
+
+    cache = AssetCache(check_interval=3600)
+    first = cache.get(path)
+    write_png(path, (0, 0, 255, 255), mtime_ns=2 * 10 ** 18)
+    for _ in range(5):
+        assert cache.get(path) is first  # 检查间隔内沿用上次的结果
+    assert calls == [path]
+
+    once = AssetCache(check_interval=None)
+    for _ in range(5):
+        once.get(path)
+    assert calls == [path, path]
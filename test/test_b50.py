@@ -0,0 +1,140 @@
+import pytest
+from PIL import ImageChops
+from modules import b50
+from modules.b50 import (
+    BACKGROUND_COLOR, COLUMNS, canvas_size, cell_position, generate_b50, panel_rect, scaled_metrics, update_b50,
+)
+from modules.render_cache import RenderCache
+from modules.selection import NEW_SECTION_SIZE, OLD_SECTION_SIZE
+from modules.song_cell import generate_song_cell
+from modules.top_panel import create_panel_image
+
+PLAYER = {
+    "frame_id": 250401, "nameplate_id": 400401, "shougou_type": 3, "class_id": 25,
+    "dani_id": 23, "icon_id": 400401, "name": "リズ", "shougou_text": "世紀末",
+}
+
+
+@pytest.fixture(autouse=True)
+def memory_only_cache(monkeypatch):
+    """单元格缓存只用内存层，不读写项目目录下的磁盘缓存"""
+    monkeypatch.setattr(b50, "cell_cache", RenderCache(cache_dir=None))
+
+
+def make_records(old_count, new_count):
+    """定数各不相同的成绩，旧版本在前，排名即为列表顺序"""
+    records = []
+    for is_new, count in ((False, old_count), (True, new_count)):
+        for i in range(count):
+            records.append({
+                "song_id": len(records) + 1,
+                "cover_id": "000011" if i % 2 else "001394",
+                "difficulty": 3,
+                "is_dx": i % 2,
+                "song_title": f"{'new' if is_new else 'old'} {i}",
+                "achievement": 1005000,
+                "dx_score": 1234,
+                "dx_total": 2000,
+                "base": 14.5 - i * 0.1,
+                "is_new": is_new,
+            })
+    return records
+
+
+def cell_rect(is_new, index, scale=1):
+    x, y = cell_position(is_new, index, scale)
+    cell_w, cell_h = scaled_metrics(scale)[3]
+    return x, y, x + cell_w, y + cell_h
+
+
+def assert_same_image(a, b):
+    assert a.size == b.size
+    assert ImageChops.difference(a, b).getbbox(alpha_only=False) is None
+
+
+@pytest.mark.parametrize("scale", [1, 0.5])
+def test_changed_cell_only(scale):
+    records = make_records(6, 3)
+    previous = generate_b50(PLAYER, records, scale=scale)
+    updated = [dict(r) for r in records]
+    updated[4]["song_title"] = "renamed"  # 内容变化，排名与Rating不变
+
+    image, dirty = update_b50(previous, records, updated, PLAYER, scale=scale)
+    assert dirty == [cell_rect(False, 4, scale)]
+    assert_same_image(image, generate_b50(PLAYER, updated, scale=scale))
+
+
+def test_rank_shift_and_cleared_slot():
+    records = make_records(6, 3)
+    previous = generate_b50(PLAYER, records)
+    updated = records[:1] + records[2:]  # 去掉旧版本第2名: 之后的格位前移，最后一格清空
+
+    image, dirty = update_b50(previous, records, updated, PLAYER)
+    rect = panel_rect(previous.width)
+    expected = [rect] + [cell_rect(False, i) for i in range(1, 5)] + [cell_rect(False, 5)]
+    assert dirty == expected
+    assert_same_image(image, generate_b50(PLAYER, updated))
+
+
+def test_new_section_insert():
+    records = make_records(4, 2)
+    previous = generate_b50(PLAYER, records)
+    extra = dict(records[-1], song_id=99, song_title="new top", base=15.0)
+    updated = records + [extra]  # 新版本区块第1名，原有两格后移一位
+
+    image, dirty = update_b50(previous, records, updated, PLAYER)
+    expected = [panel_rect(previous.width)] + [cell_rect(True, i) for i in range(3)]
+    assert dirty == expected
+    assert_same_image(image, generate_b50(PLAYER, updated))
+
+
+def test_player_change_only_rerenders_panel():
+    records = make_records(6, 3)
+    previous_player = dict(PLAYER, rating=16000)
+    previous = generate_b50(previous_player, records)
+    player = dict(previous_player, name="ミク")
+
+    image, dirty = update_b50(previous, records, records, player, previous_player=previous_player)
+    assert dirty == [panel_rect(previous.width)]
+    assert_same_image(image, generate_b50(player, records))
+
+
+def test_no_change():
+    records = make_records(3, 1)
+    previous = generate_b50(PLAYER, records)
+    image, dirty = update_b50(previous, records, [dict(r) for r in records], PLAYER)
+    assert dirty == []
+    assert_same_image(image, previous)
+
+
+@pytest.mark.parametrize("scale", [0.25, 0.5, 1, 1.5])
+def test_canvas_size_matches_rendered_layers(scale):
+    margin, _, _, cell_size, panel_size = scaled_metrics(scale)
+    params = dict(make_records(1, 0)[0], section_rank=1, scale=scale)
+    params.pop("is_new")
+    params.pop("song_id")
+    assert generate_song_cell(**params).size == cell_size
+    assert create_panel_image(**dict(PLAYER, output_filename=None, scale=scale)).size == panel_size
+
+    # 每行最后一格与最后一行紧贴外边距 (新版本区块的最后一格位于行末)
+    assert NEW_SECTION_SIZE % COLUMNS == 0
+    width, height = canvas_size(scale)
+    x, y = cell_position(True, NEW_SECTION_SIZE - 1, scale)
+    assert (x + cell_size[0] + margin, y + cell_size[1] + margin) == (width, height)
+    x0, y0, x1, y1 = panel_rect(width, scale)
+    assert y0 == margin and x0 >= margin and x1 <= width - margin
+
+
+def test_half_scale_composite():
+    records = make_records(OLD_SECTION_SIZE, NEW_SECTION_SIZE)
+    image = generate_b50(PLAYER, records, scale=0.5)
+    assert image.size == canvas_size(0.5)
+    margin, _, _, (cell_w, cell_h), _ = scaled_metrics(0.5)
+    # 外边距内只有背景，最后一格右下角有内容
+    width, height = image.size
+    for box in ((0, 0, width, margin), (0, height - margin, width, height),
+                (0, 0, margin, height), (width - margin, 0, width, height)):
+        assert image.crop(box).getcolors() == [((box[2] - box[0]) * (box[3] - box[1]), BACKGROUND_COLOR)]
+    x, y = cell_position(True, NEW_SECTION_SIZE - 1, 0.5)
+    assert (x + cell_w, y + cell_h) == (width - margin, height - margin)
+    assert image.getpixel((x + cell_w - 1, y + cell_h - 1)) != BACKGROUND_COLOR
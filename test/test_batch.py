@@ -0,0 +1,90 @@
+import os
+import json
+import threading
+from concurrent.futures import Executor, Future
+from PIL import Image
+from modules.batch import run_batch
+
+PANEL = {
+    "frame_id": 250401, "nameplate_id": 400401, "shougou_type": 3, "class_id": 25,
+    "dani_id": 23, "icon_id": 400401, "name": "test", "rating": 16145,
+}
+
+
+def panel_job(job_id, **extra):
+    return json.dumps({"id": job_id, "type": "panel", "params": dict(PANEL, scale=0.25), **extra})
+
+
+class ReverseExecutor(Executor):
+    """
+    收齐 expected 个任务后按提交的逆序执行，每次 advance.release() 完成一个，
+    用于确定性地检查结果的输出顺序。
+    """
+
+    def __init__(self, expected, crash=()):
+        self.expected = expected
+        self.crash = set(crash)
+        self.advance = threading.Semaphore(0)
+        self.pending = []
+
+    def submit(self, fn, job):
+        future = Future()
+        self.pending.append((future, fn, job))
+        if len(self.pending) == self.expected:
+            threading.Thread(target=self._run_reversed, daemon=True).start()
+        return future
+
+    def _run_reversed(self):
+        for future, fn, job in reversed(self.pending):
+            self.advance.acquire()
+            if job["id"] in self.crash:
+                future.set_exception(RuntimeError("工作进程异常退出"))
+            else:
+                future.set_result(fn(job))
+
+
+def test_sequential_with_error_lines(tmp_path):
+    lines = [
+        panel_job("a"),
+        "",
+        "{not json",
+        json.dumps({"id": "b", "type": "poster"}),
+        panel_job("c", encode={"format": "WEBP", "quality": 80}),
+        json.dumps({"id": "d", "type": "panel", "params": {"name": "x"}}),
+        panel_job("e", encode={"preset": "nope"}),
+    ]
+    results = list(run_batch(lines, output_dir=str(tmp_path)))
+    assert [(r["id"], r["status"]) for r in results] == [
+        ("a", "ok"), ("3", "error"), ("4", "error"), ("c", "ok"), ("d", "error"), ("7", "error"),
+    ]
+    assert "第3行" in results[1]["error"]
+    assert results[4]["error"].startswith("JobError")
+    assert results[3]["output"] == os.path.join(str(tmp_path), "c.webp")
+    with Image.open(results[0]["output"]) as img:
+        assert img.format == "PNG"
+        assert img.size == (270, 113)
+    with Image.open(results[3]["output"]) as img:
+        assert img.format == "WEBP"
+
+
+def test_pooled_ordered_and_unordered(tmp_path):
+    lines = [panel_job(job_id) for job_id in "abcd"] + ["{bad"]
+    executor = ReverseExecutor(4, crash={"b"})
+    for _ in range(4):
+        executor.advance.release()
+    ordered = list(run_batch(lines, output_dir=str(tmp_path), max_in_flight=10, executor=executor))
+    assert [(r["id"], r["status"]) for r in ordered] == [
+        ("a", "ok"), ("b", "error"), ("c", "ok"), ("d", "ok"), ("5", "error"),
+    ]
+    assert "RuntimeError" in ordered[1]["error"]
+
+    executor = ReverseExecutor(4)
+    results = run_batch(lines, output_dir=str(tmp_path), ordered=False, max_in_flight=10, executor=executor)
+    # 解析失败的行立即完成，其余按完成顺序 (逆序) 产出
+    unordered = [next(results)]
+    for _ in range(4):
+        executor.advance.release()
+        unordered.append(next(results))
+    assert [r["id"] for r in unordered] == ["5", "d", "c", "b", "a"]
+    assert all(r["status"] == "ok" for r in unordered[1:])
+    assert next(results, None) is None
@@ -0,0 +1,69 @@
+import os
+from PIL import Image, ImageChops
+from modules.jacket_pack import PACK_WIDTH, JacketPack, build_jacket_pack, pack_path, pack_width, scale_jacket
+
+
+def make_jacket(path, seed, mtime):
+    img = Image.new('RGBA', (64, 64))
+    img.putdata([((x * seed) % 256, (y * seed) % 256, seed % 256, 255) for y in range(64) for x in range(64)])
+    img.save(path)
+    os.utime(path, ns=(mtime * 10 ** 9, mtime * 10 ** 9))
+    return str(path)
+
+
+def same(a, b):
+    return a.size == b.size and ImageChops.difference(a, b).getbbox(alpha_only=False) is None
+
+
+def test_incremental_build(tmp_path):
+    jackets = tmp_path / "jackets"
+    (jackets / "sub").mkdir(parents=True)
+    a = make_jacket(jackets / "UI_Jacket_000011.png", 3, 1000)
+    b = make_jacket(jackets / "sub" / "UI_Jacket_1394.png", 5, 1000)
+    make_jacket(jackets / "other.png", 7, 1000)
+    path = str(tmp_path / "jackets.pack")
+
+    counts = build_jacket_pack(str(jackets), path)
+    assert (counts["total"], counts["added"], counts["reused"]) == (2, 2, 0)
+    pack = JacketPack(path)
+    assert same(pack.get("11", a), scale_jacket(a))
+    assert same(pack.get(1394, b), scale_jacket(b))
+    assert pack.get("999999") is None
+
+    counts = build_jacket_pack(str(jackets), path)
+    assert (counts["total"], counts["added"], counts["updated"], counts["reused"]) == (2, 0, 0, 2)
+
+    # 源文件被替换: 已打开的封面包视为过期；增量重建只重新缩放这一张
+    make_jacket(a, 9, 2000)
+    assert JacketPack(path).get("11", a) is None
+    os.remove(b)
+    counts = build_jacket_pack(str(jackets), path)
+    assert (counts["total"], counts["updated"], counts["removed"]) == (1, 1, 1)
+    pack.reload()
+    assert same(pack.get("11", a), scale_jacket(a))
+    assert pack.get("1394") is None
+
+    counts = build_jacket_pack(str(jackets), path, full=True)
+    assert (counts["added"], counts["reused"]) == (1, 0)
+
+
+def test_per_width_packs(tmp_path):
+    jackets = tmp_path / "jackets"
+    jackets.mkdir()
+    a = make_jacket(jackets / "UI_Jacket_000011.png", 3, 1000)
+    path = str(tmp_path / "jackets.pack")
+    half = pack_width(0.5)
+    assert half < PACK_WIDTH
+    assert pack_path(PACK_WIDTH, path) == path
+    assert pack_path(half, path) == str(tmp_path / f"jackets_w{half}.pack")
+
+    build_jacket_pack(str(jackets), path)
+    pack = JacketPack(path)
+    assert pack.get("11", a, width=half) is None  # 该宽度尚未打包
+    assert pack.stats()["widths"] == [PACK_WIDTH]
+
+    build_jacket_pack(str(jackets), pack_path(half, path), width=half)
+    pack.reload()
+    assert same(pack.get("11", a, width=half), scale_jacket(a, half))
+    assert pack.get("11", a).width == PACK_WIDTH
+    assert pack.stats()["widths"] == [half, PACK_WIDTH]
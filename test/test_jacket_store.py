@@ -0,0 +1,64 @@
+import os
+import threading
+from PIL import Image, ImageChops
+from modules.jacket_store import JacketStore, render_jacket_strip
+
+
+def make_jacket(tmp_path):
+    path = str(tmp_path / "jacket.png")
+    img = Image.new('RGBA', (128, 128))
+    img.putdata([(x * 2, y * 2, (x * y) % 256, 255) for y in range(128) for x in range(128)])
+    img.save(path)
+    return path
+
+
+def strip_files(cache_dir):
+    return [entry.path for entry in os.scandir(cache_dir) if entry.name.endswith('.png')]
+
+
+def test_disk_round_trip(tmp_path):
+    source = make_jacket(tmp_path)
+    cache_dir = str(tmp_path / "strips")
+    store = JacketStore(cache_dir=cache_dir)
+    strip = store.get("900001", source)
+    assert store.get("900001", source) is strip
+    assert ImageChops.difference(strip, render_jacket_strip(source)).getbbox(alpha_only=False) is None
+    assert (store.stats()["renders"], store.stats()["disk_hits"]) == (1, 0)
+
+    os.remove(source)  # 磁盘层命中时不再读取原始封面
+    reloaded = JacketStore(cache_dir=cache_dir)
+    assert ImageChops.difference(reloaded.get("900001", source), strip).getbbox(alpha_only=False) is None
+    assert (reloaded.stats()["renders"], reloaded.stats()["disk_hits"]) == (0, 1)
+
+
+def test_disk_eviction_to_cap(tmp_path):
+    source = make_jacket(tmp_path)
+    probe_dir = str(tmp_path / "probe")
+    JacketStore(cache_dir=probe_dir).get("900000", source)
+    entry_size = os.path.getsize(strip_files(probe_dir)[0])
+
+    cache_dir = str(tmp_path / "strips")
+    cap = int(entry_size * 3.5)
+    store = JacketStore(cache_dir=cache_dir, disk_bytes=cap)
+    for cover_id in range(900001, 900009):
+        store.get(cover_id, source)
+        assert sum(os.path.getsize(path) for path in strip_files(cache_dir)) <= cap
+
+    stats = store.stats()
+    assert stats["renders"] == 8
+    assert stats["disk_evictions"] > 0
+    assert stats["disk_bytes"] == sum(os.path.getsize(path) for path in strip_files(cache_dir))
+    assert os.path.exists(store._disk_path(store.key(900008)))
+    assert not os.path.exists(store._disk_path(store.key(900001)))
+
+
+def test_counters_under_threads(tmp_path):
+    source = make_jacket(tmp_path)
+    store = JacketStore(cache_dir=None)
+    threads = [threading.Thread(target=lambda i=i: [store.get(910000 + i * 4 + j, source) for j in range(4)])
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.stats()["renders"] == 16
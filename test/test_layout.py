@@ -0,0 +1,117 @@
+import json
+import pytest
+from modules.layout import (
+    LAYOUTS_DIR, MAX_SCALE, MIN_SCALE, LayoutError, LayoutStore, check_scale, compile_layout,
+    get_plan, load_binding,
+)
+
+
+def layer_rect(analysis, name, index=0):
+    layer = [layer for layer in analysis["layers"] if layer["name"] == name][index]
+    return [layer["position"]["x"], layer["position"]["y"], layer["size"]["width"], layer["size"]["height"]]
+
+
+@pytest.fixture(scope="module")
+def panel():
+    binding, analysis, _ = load_binding("top_panel")
+    return binding, analysis, compile_layout(analysis, binding)
+
+
+@pytest.fixture(scope="module")
+def cell():
+    binding, analysis, _ = load_binding("song_cell")
+    return binding, analysis, compile_layout(analysis, binding)
+
+
+def test_panel_plan_from_checked_in_analysis(panel):
+    binding, analysis, plan = panel
+    assert plan["canvas"] == [analysis["document_size"]["width"], analysis["document_size"]["height"]]
+    assert plan["order"] == list(binding["slots"])
+    slots = plan["slots"]
+
+    assert slots["frame"]["rect"] == layer_rect(analysis, "frame")
+    assert slots["frame"]["asset"] == "UI_Frame_{frame_id:06d}.png"
+    # index 选第二个同名图层，position 覆盖坐标
+    assert slots["name_background"]["rect"] == [145, 70] + layer_rect(analysis, "NameBackground", 1)[2:]
+    # 显式变体
+    assert slots["shougou"]["variants"]["4"]["rect"] == layer_rect(analysis, "UI_CMN_Shougou_Rainbow")
+    # range 变体: 图层名模板与公共字段，default 使用槽位级图层
+    assert sorted(slots["class"]["variants"], key=int) == [str(i) for i in range(26)]
+    assert slots["class"]["variants"]["7"]["rect"] == layer_rect(analysis, "UI_CMN_Class_S_07")
+    dani = slots["dani"]
+    assert dani["variants"]["5"]["rect"] == [layer_rect(analysis, "UI_CMN_DaniPlate_05")[0], 70, 89, 41]
+    assert dani["default"]["rect"] == [layer_rect(analysis, "ranks")[0], 73, 89, 41]
+    # 显式 point 的锚点保留原坐标
+    assert slots["rating"]["point"] == [304, 62]
+    assert slots["version"]["point"] == [1055, 77]
+    assert slots["dx_rating"]["variants"]["3"]["rect"][:2] == [142, 31]
+
+
+def test_cell_plan_geometry(cell):
+    _, analysis, plan = cell
+    slots = plan["slots"]
+    x, y, w, h = layer_rect(analysis, "Rectangle 1")
+    assert slots["difficulty_bar"]["rect"] == [x, y, w, 216]
+
+    # scale: 以中心缩放
+    x, y, w, h = layer_rect(analysis, "UI_MSS_MBase_Icon_Blank", 1)
+    new_w, new_h = int(w * 1.2), int(h * 1.2)
+    assert slots["blank_fs"]["rect"] == [x + w // 2 - new_w // 2, y + h // 2 - new_h // 2, new_w, new_h]
+    assert slots["blank_fs"]["resize"] == [new_w, new_h]
+
+    # fit: 预先算好目标框，偏移留到放置时
+    x, y, w, h = layer_rect(analysis, "UI_GAM_Rank_SSSp")
+    rank = slots["rank_icon"]
+    assert rank["rect"] == [x, y, w, h]
+    assert rank["target"] == [int(w * 0.95), int(h * 0.95)]
+    assert rank["offset"] == [5, 0]
+
+    x, y, w, h = layer_rect(analysis, "#1")
+    assert slots["section_rank"]["point"] == [x + w, y]
+
+
+def test_store_matches_compile_and_caches_on_disk(tmp_path, panel):
+    _, _, plan = panel
+    store = LayoutStore(LAYOUTS_DIR, cache_dir=str(tmp_path))
+    assert store.get("top_panel").plan == json.loads(json.dumps(plan))
+    assert store.compiles == 1
+
+    reloaded = LayoutStore(LAYOUTS_DIR, cache_dir=str(tmp_path))
+    assert reloaded.get("top_panel").plan == store.get("top_panel").plan
+    assert reloaded.get("top_panel").key == store.get("top_panel").key
+    assert reloaded.compiles == 0
+
+
+def test_compile_errors():
+    analysis = {"document_size": {"width": 10, "height": 10},
+                "layers": [{"name": "a", "position": {"x": 0, "y": 0}, "size": {"width": 5, "height": 5}}]}
+    with pytest.raises(LayoutError):
+        compile_layout(analysis, {"slots": {"s": {"layer": "missing"}}})
+    with pytest.raises(LayoutError):
+        compile_layout(analysis, {"slots": {"s": {"layer": "a", "index": 1}}})
+    with pytest.raises(LayoutError):
+        compile_layout(analysis, {"slots": {"s": {"layer": "a", "anchor": "top"}}})
+    with pytest.raises(LayoutError):
+        compile_layout(analysis, {"slots": {"s": {"font_size": 3}}})
+
+
+@pytest.mark.parametrize("value, expected", [(MIN_SCALE, MIN_SCALE), (MAX_SCALE, MAX_SCALE), (1, 1.0), ("0.5", 0.5)])
+def test_check_scale_accepts(value, expected):
+    assert check_scale(value) == expected
+
+
+@pytest.mark.parametrize("value", [0.2, 2.01, 0, -1, 1e4, float("nan"), "x", None])
+def test_check_scale_rejects(value):
+    with pytest.raises(ValueError):
+        check_scale(value)
+    with pytest.raises(ValueError):
+        get_plan("song_cell", value)
+
+
+def test_scaled_plan():
+    plan = get_plan("top_panel")
+    half = get_plan("top_panel", 0.5)
+    assert half.canvas == (540, 226)
+    assert half.scale == 0.5
+    assert get_plan("top_panel", 0.5) is half
+    assert half.slot("name")["font_size"] == round(plan.slot("name")["font_size"] * 0.5)
@@ -0,0 +1,58 @@
+import os
+import pytest
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+from modules.outline_text import OutlineTextRenderer
+from modules.top_panel import panel_font_path
+
+FONT_PATH = panel_font_path()
+
+pytestmark = pytest.mark.skipif(not os.path.exists(FONT_PATH), reason="缺少面板字体")
+
+
+def reference_outline_text(text, font_path, font_size, letter_spacing, outline_width,
+                           fill=(255, 255, 255, 255), outline_fill=(0, 0, 0, 255)):
+    """原实现: 逐字按 (2w+1)²-1 个偏移重复 draw.text 描边，再画字体颜色"""
+    font = ImageFont.truetype(font_path, font_size)
+    widths = []
+    max_height = 0
+    for char in text:
+        left, top, right, bottom = font.getbbox(char)
+        widths.append(right - left)
+        max_height = max(max_height, bottom - top)
+    total_width = sum(widths) + letter_spacing * max(len(text) - 1, 0)
+    _, descent = font.getmetrics()
+    img = Image.new('RGBA', (total_width + 2 * outline_width, max_height + 2 * outline_width + descent), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    x = y = outline_width
+    for char, width in zip(text, widths):
+        for dx in range(-outline_width, outline_width + 1):
+            for dy in range(-outline_width, outline_width + 1):
+                if dx or dy:
+                    draw.text((x + dx, y + dy), char, font=font, fill=outline_fill)
+        draw.text((x, y), char, font=font, fill=fill)
+        x += width + letter_spacing
+    return img
+
+
+# 面板中的实际配置: 称号、CREDIT(S)、版本号，以及更粗的描边
+CONFIGS = [(15, 0, 1), (22, 1, 1), (17, 1, 1), (22, 0, 2), (30, 2, 3)]
+TEXTS = ["末", "世紀末 abc", "CREDIT(S) 24", "Ver.DX1.55-E", "ｊｇｙ（）Ｑ", "たいへんよくできました", ""]
+
+
+@pytest.mark.parametrize("font_size, letter_spacing, outline_width", CONFIGS)
+def test_render_matches_reference(font_size, letter_spacing, outline_width):
+    renderer = OutlineTextRenderer()
+    for text in TEXTS:
+        expected = reference_outline_text(text, FONT_PATH, font_size, letter_spacing, outline_width)
+        actual = renderer.render(text, FONT_PATH, font_size, letter_spacing, outline_width)
+        assert actual.size == expected.size, text
+        if expected.width:
+            assert ImageChops.difference(actual, expected).getbbox(alpha_only=False) is None, text
+
+
+def test_glyph_cache_is_bounded():
+    renderer = OutlineTextRenderer(max_strings=4, max_glyphs=8)
+    renderer.render("あいうえおかきくけこさしすせそ", FONT_PATH, 15, 0, 1)
+    renderer.render("0123456789", FONT_PATH, 15, 0, 1)
+    assert len(renderer._glyphs) <= 8
+    assert len(renderer._strings) <= 4
@@ -0,0 +1,111 @@
+import os
+import pytest
+from PIL import Image, ImageChops
+from modules.packfile import ALIGNMENT, HEADER, LazyPack, PackError, PackFile, write_pack
+from modules.sprite_atlas import SpriteAtlas, build_atlas
+
+
+def gradient(size):
+    img = Image.new('RGBA', size)
+    img.putdata([(x * 16 % 256, y * 16 % 256, (x + y) % 256, 128 + x % 128)
+                 for y in range(size[1]) for x in range(size[0])])
+    return img
+
+
+def set_mtime(path, seconds):
+    os.utime(path, ns=(seconds * 10 ** 9, seconds * 10 ** 9))
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "test.pack")
+    images = {"a": gradient((5, 3)), "b": gradient((16, 16)), "c": gradient((1, 1))}
+    count = write_pack(path, ((key, {"size": list(img.size)}, img.tobytes()) for key, img in images.items()),
+                       meta={"version": 7})
+    assert count == 3
+
+    pack = PackFile(path)
+    assert pack.meta == {"version": 7}
+    assert len(pack) == 3 and "b" in pack and "z" not in pack
+    for key, img in images.items():
+        assert pack.entries[key]["offset"] % ALIGNMENT == 0
+        assert bytes(pack.view(key)) == img.tobytes()
+        assert ImageChops.difference(pack.image(key), img).getbbox(alpha_only=False) is None
+    assert not os.path.exists(f"{path}.{os.getpid()}.tmp")
+
+
+def test_failed_write_keeps_old_pack(tmp_path):
+    path = str(tmp_path / "test.pack")
+    write_pack(path, [("a", {}, b"old")])
+
+    def entries():
+        yield "a", {}, b"new"
+        raise RuntimeError("中断")
+
+    with pytest.raises(RuntimeError):
+        write_pack(path, entries())
+    assert bytes(PackFile(path).view("a")) == b"old"
+    assert os.listdir(tmp_path) == ["test.pack"]
+
+
+def test_corrupt_packs(tmp_path):
+    short = tmp_path / "short.pack"
+    short.write_bytes(b"B50")
+    wrong = tmp_path / "wrong.pack"
+    wrong.write_bytes(HEADER.pack(b"NOTAPACK", 1, 0, 0))
+    broken = tmp_path / "broken.pack"
+    broken.write_bytes(HEADER.pack(b"B50PACK\0", 1, HEADER.size, 5) + b"{oops")
+    for path in (short, wrong, broken):
+        with pytest.raises(PackError):
+            PackFile(str(path))
+        assert LazyPack(str(path)).get() is None
+    assert LazyPack(str(tmp_path / "missing.pack")).get() is None
+
+
+def test_lazy_pack_reload(tmp_path):
+    path = str(tmp_path / "test.pack")
+    lazy = LazyPack(path)
+    assert lazy.get() is None
+
+    write_pack(path, [("a", {}, b"first")])
+    set_mtime(path, 1000)
+    assert lazy.get() is None  # 未 reload 前沿用首次检查的结果
+    first = lazy.reload()
+    assert bytes(first.view("a")) == b"first"
+    assert lazy.reload() is first  # mtime 未变不重新映射
+
+    write_pack(path, [("a", {}, b"second")])
+    set_mtime(path, 2000)
+    assert bytes(lazy.reload().view("a")) == b"second"
+    assert bytes(first.view("a")) == b"first"  # 旧映射仍然有效
+
+
+def test_sprite_atlas_round_trip_and_stale_sources(tmp_path):
+    sources = {}
+    for name, size in (("icon.png", (40, 20)), ("badge.png", (12, 12))):
+        sources[name] = str(tmp_path / name)
+        gradient(size).save(sources[name])
+    path = str(tmp_path / "sprites.atlas")
+    result = build_atlas([("icon.png", sources["icon.png"], (20, 10)),
+                          ("icon.png", sources["icon.png"], (40, 20)),
+                          ("badge.png", sources["badge.png"], (6, 6)),
+                          ("gone.png", str(tmp_path / "gone.png"), (4, 4))], path)
+    assert result == {"sprites": 3, "sources": 2, "missing": ["gone.png"]}
+
+    atlas = SpriteAtlas(path)
+    with Image.open(sources["icon.png"]) as src:
+        expected = src.convert('RGBA').resize((20, 10), Image.Resampling.LANCZOS)
+    assert ImageChops.difference(atlas.get("icon.png", (20, 10)), expected).getbbox(alpha_only=False) is None
+    assert atlas.source_size("icon.png") == (40, 20)
+    assert atlas.get("icon.png").size == (40, 20)
+    assert atlas.get("icon.png", (8, 4)) is None  # 未打包的尺寸
+    assert atlas.get("gone.png") is None
+
+    # 源文件在打包后被替换: 新进程 (新实例) 视为过期，重新打包后恢复
+    gradient((40, 20)).transpose(Image.Transpose.FLIP_LEFT_RIGHT).save(sources["icon.png"])
+    set_mtime(sources["icon.png"], 3000)
+    assert SpriteAtlas(path).get("icon.png", (20, 10)) is None
+    assert SpriteAtlas(path).get("badge.png", (6, 6)) is not None
+    build_atlas([("icon.png", sources["icon.png"], (20, 10))], path)
+    atlas.reload()
+    assert atlas.get("icon.png", (20, 10)) is not None
+    assert atlas.get("badge.png", (6, 6)) is None
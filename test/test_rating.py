@@ -0,0 +1,94 @@
+import math
+import random
+import pytest
+from modules import rating
+from modules.rating import (
+    RATING_TABLE, RANK_TABLE, calculate_rating, get_rank_by_achievement, rank_to_asset_name, rate_batch,
+)
+
+
+def linear_rating(achievement, base):
+    """原实现: 线性扫描 RATING_TABLE"""
+    if achievement == 0:
+        return 0
+    offset = 0
+    for record in RATING_TABLE:
+        if record["min"] <= achievement <= record["max"]:
+            offset = record["offset"]
+            break
+    return math.floor(min(achievement, 1005000) * offset * base / 1000000 / 10)
+
+
+def linear_rank(achievement):
+    """原实现: 线性扫描 RANK_TABLE"""
+    last_rank = "D"
+    for threshold, rank in RANK_TABLE:
+        if achievement < threshold:
+            break
+        last_rank = rank
+    return last_rank
+
+
+def boundary_achievements():
+    """全部区间端点及其两侧，外加 97.0000%、100.5000%、100.4999% 等常见边界与随机值"""
+    values = {0, 1, -1, 970000, 1005000, 1004999, 1010000, 999999, 1000000}
+    for record in RATING_TABLE:
+        for edge in (record["min"], record["max"]):
+            if edge != float('inf'):
+                values.update((edge - 1, edge, edge + 1))
+    for threshold, _ in RANK_TABLE:
+        values.update((threshold - 1, threshold, threshold + 1))
+    rng = random.Random(0)
+    values.update(rng.randint(0, 1010000) for _ in range(2000))
+    return sorted(values)
+
+
+ACHIEVEMENTS = boundary_achievements()
+BASES = [1.0, 7.5, 12.7, 13.0, 14.9, 15.0]
+
+
+def test_single_lookups_match_linear_scan():
+    for achievement in ACHIEVEMENTS:
+        assert get_rank_by_achievement(achievement) == linear_rank(achievement), achievement
+        for base in BASES:
+            assert calculate_rating(achievement, base) == linear_rating(achievement, base), (achievement, base)
+
+
+def _expected_batch():
+    achievements = [a for a in ACHIEVEMENTS for _ in BASES]
+    bases = BASES * len(ACHIEVEMENTS)
+    ratings = [linear_rating(a, b) for a, b in zip(achievements, bases)]
+    ranks = [linear_rank(a) for a in achievements]
+    return achievements, bases, ratings, ranks
+
+
+def test_batch_fallback_matches_linear_scan(monkeypatch):
+    monkeypatch.setattr(rating, "np", None)
+    achievements, bases, ratings, ranks = _expected_batch()
+    batch = rate_batch(achievements, bases)
+    assert batch.ratings == ratings
+    assert batch.ranks == ranks
+    assert batch.rank_assets == [rank_to_asset_name(r) for r in ranks]
+
+
+def test_batch_numpy_matches_linear_scan():
+    if rating.np is None:
+        pytest.skip("未安装 numpy")
+    achievements, bases, ratings, ranks = _expected_batch()
+    batch = rate_batch(achievements, bases)
+    assert batch.ratings.tolist() == ratings
+    assert batch.ranks.tolist() == ranks
+    assert batch.rank_assets.tolist() == [rank_to_asset_name(r) for r in ranks]
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_batch_length_mismatch(monkeypatch, use_numpy):
+    if not use_numpy:
+        monkeypatch.setattr(rating, "np", None)
+    elif rating.np is None:
+        pytest.skip("未安装 numpy")
+    with pytest.raises(ValueError):
+        rate_batch([1000000, 1005000], [13.0])
+    with pytest.raises(ValueError):
+        rate_batch([1000000], [13.0, 14.0])
+    assert len(rate_batch((1000000, 1005000), (13.0, 14.0)).ranks) == 2
@@ -0,0 +1,78 @@
+import os
+import random
+import pytest
+from PIL import Image, ImageChops
+from modules import render_cache
+from modules.render_cache import RenderCache, cell_cache_key
+
+PARAMS = {
+    "cover_id": "11", "difficulty": 3, "is_dx": 1, "song_title": "test",
+    "achievement": 1005000, "dx_score": 1234, "dx_total": 2000, "base": 14.5, "section_rank": 1,
+}
+
+
+def noise_render(**params):
+    """替代 generate_song_cell: 以参数为种子生成难以压缩的小图，便于控制磁盘占用"""
+    rng = random.Random(repr(sorted(params.items())))
+    return Image.frombytes('RGBA', (32, 32), bytes(rng.getrandbits(8) for _ in range(32 * 32 * 4)))
+
+
+def disk_files(cache_dir):
+    return sorted(os.path.join(root, name) for root, _, names in os.walk(cache_dir) for name in names)
+
+
+def test_key_covers_render_inputs(monkeypatch):
+    base = cell_cache_key(PARAMS)
+    assert cell_cache_key(dict(PARAMS)) == base
+    assert cell_cache_key(dict(PARAMS, cover_id="000011")) == base  # 封面ID补零后相同
+    assert cell_cache_key(dict(PARAMS, quality="draft")) != base
+    assert cell_cache_key(dict(PARAMS, scale=0.5)) != base
+    assert cell_cache_key(dict(PARAMS, section_rank=2)) != base
+    assert cell_cache_key(PARAMS, asset_version="1.55") != base
+    monkeypatch.setattr(render_cache, "LAYOUT_VERSION", render_cache.LAYOUT_VERSION + 1)
+    assert cell_cache_key(PARAMS) != base
+
+
+def test_key_rejects_invalid_params():
+    with pytest.raises(ValueError):
+        cell_cache_key(dict(PARAMS, quality="ultra"))
+    with pytest.raises(ValueError):
+        cell_cache_key(dict(PARAMS, scale=10))
+
+
+def test_disk_round_trip(tmp_path):
+    first = RenderCache(cache_dir=str(tmp_path), render=noise_render)
+    img = first.get_cell(PARAMS)
+    assert first.get_cell(PARAMS) is img
+    assert first.stats()["misses"] == 1
+    assert first.stats()["memory_hits"] == 1
+    assert len(disk_files(tmp_path)) == 1
+
+    # 新实例 (相当于另一个进程) 从磁盘层读取，不再渲染
+    second = RenderCache(cache_dir=str(tmp_path), render=noise_render)
+    cached = second.get_cell(PARAMS)
+    assert second.stats()["misses"] == 0
+    assert second.stats()["disk_hits"] == 1
+    assert ImageChops.difference(cached, img).getbbox(alpha_only=False) is None
+    with open(disk_files(tmp_path)[0], 'rb') as f:
+        assert second.get_cell_bytes(PARAMS) == f.read()
+
+
+def test_disk_eviction_to_cap(tmp_path):
+    probe = RenderCache(cache_dir=str(tmp_path / "probe"), render=noise_render)
+    probe.get_cell(PARAMS)
+    entry_size = os.path.getsize(disk_files(tmp_path / "probe")[0])
+
+    cap = entry_size * 5
+    cache = RenderCache(cache_dir=str(tmp_path / "cells"), render=noise_render, disk_bytes=cap)
+    for rank in range(1, 21):
+        cache.get_cell(dict(PARAMS, section_rank=rank))
+        files = disk_files(tmp_path / "cells")
+        assert sum(os.path.getsize(path) for path in files) <= cap
+
+    stats = cache.stats()
+    assert stats["disk_evictions"] > 0
+    assert stats["disk_bytes"] == sum(os.path.getsize(path) for path in files)
+    # 最近写入的单元格保留在磁盘层
+    assert os.path.exists(cache._disk_path(cache.key(dict(PARAMS, section_rank=20))))
+    assert not os.path.exists(cache._disk_path(cache.key(dict(PARAMS, section_rank=1))))
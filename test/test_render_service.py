@@ -0,0 +1,135 @@
+import json
+import asyncio
+from concurrent.futures import Executor, Future
+from modules.render_service import RenderService
+
+PANEL = {
+    "frame_id": 250401, "nameplate_id": 400401, "shougou_type": 3, "class_id": 25,
+    "dani_id": 23, "icon_id": 400401, "name": "test", "rating": 16145,
+}
+
+
+class FakeExecutor(Executor):
+    """在当前线程执行任务；hold 为 True 时任务挂起，直到 release()"""
+
+    def __init__(self):
+        self.hold = False
+        self.held = []
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append(fn.__name__)
+        future = Future()
+        if self.hold:
+            self.held.append((future, fn, args))
+        else:
+            self._run(future, fn, args)
+        return future
+
+    def release(self):
+        held, self.held = self.held, []
+        for future, fn, args in held:
+            self._run(future, fn, args)
+
+    @staticmethod
+    def _run(future, fn, args):
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+
+
+async def send(service, raw):
+    """发送原始请求，返回 (状态码, 响应体)"""
+    reader, writer = await asyncio.open_connection(service.host, service.port)
+    writer.write(raw)
+    await writer.drain()
+    status_line = await reader.readline()
+    headers = {}
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    writer.close()
+    return int(status_line.split()[1]), body
+
+
+def request(method, path, body=None):
+    payload = json.dumps(body).encode() if body is not None else b''
+    return (f"{method} {path} HTTP/1.1\r\nContent-Length: {len(payload)}\r\n"
+            "Connection: close\r\n\r\n").encode() + payload
+
+
+def run_with_service(scenario, **kwargs):
+    async def main():
+        executor = FakeExecutor()
+        service = RenderService(port=0, executor=executor, workers=1, **kwargs)
+        await service.start()
+        try:
+            return await scenario(service, executor)
+        finally:
+            executor.hold = False
+            executor.release()
+            await service.shutdown(grace=5)
+    return asyncio.run(main())
+
+
+def test_routes_and_validation():
+    async def scenario(service, executor):
+        results = {}
+        for name, raw in {
+            "ok": request("POST", "/render/panel", PANEL),
+            "health": request("GET", "/health"),
+            "unknown_path": request("GET", "/nothing"),
+            "unknown_job": request("POST", "/render/poster", {}),
+            "render_get": request("GET", "/render/panel"),
+            "health_post": request("POST", "/health", {}),
+            "bad_json": b"POST /render/panel HTTP/1.1\r\nContent-Length: 3\r\n\r\n{x}",
+            "bad_scale": request("POST", "/render/panel", dict(PANEL, scale=1e4)),
+            "bad_quality": request("POST", "/render/panel", dict(PANEL, quality="ultra")),
+            "bad_encode": request("POST", "/render/panel?format=tiff", PANEL),
+            "missing_params": request("POST", "/render/panel", {"name": "x"}),
+        }.items():
+            results[name] = await send(service, raw)
+        return results, list(executor.submitted)
+
+    results, submitted = run_with_service(scenario)
+    status = {name: code for name, (code, _) in results.items()}
+    assert status == {
+        "ok": 200, "health": 200, "unknown_path": 404, "unknown_job": 404, "render_get": 405,
+        "health_post": 405, "bad_json": 400, "bad_scale": 400, "bad_quality": 400,
+        "bad_encode": 400, "missing_params": 400,
+    }
+    assert results["ok"][1].startswith(b'\x89PNG')
+    assert json.loads(results["health"][1])["status"] == "ok"
+    # 参数校验失败的请求不会提交到进程池
+    assert submitted.count("render_job") == 2
+
+
+def test_backpressure():
+    async def scenario(service, executor):
+        executor.hold = True
+        first = asyncio.ensure_future(send(service, request("POST", "/render/panel", PANEL)))
+        while not executor.held:
+            await asyncio.sleep(0.01)
+        rejected = await send(service, request("POST", "/render/panel", PANEL))
+        executor.release()
+        return rejected, await first, service.counters["rejected"]
+
+    rejected, first, count = run_with_service(scenario, max_pending=1)
+    assert rejected[0] == 429
+    assert first[0] == 200
+    assert count == 1
+
+
+def test_header_limits():
+    async def scenario(service, executor):
+        many = b"GET /health HTTP/1.1\r\n" + b"X-A: 1\r\n" * 20 + b"\r\n"
+        large = b"GET /health HTTP/1.1\r\nX-A: " + b"a" * 600 + b"\r\n\r\n"
+        body = b"POST /render/panel HTTP/1.1\r\nContent-Length: 99999\r\n\r\n"
+        return [await send(service, raw) for raw in (many, large, body)]
+
+    many, large, body = run_with_service(scenario, max_header_lines=10, max_header_bytes=512, max_body=1024)
+    assert many[0] == 431
+    assert large[0] == 431
+    assert body[0] == 413
@@ -0,0 +1,75 @@
+import random
+import pytest
+from modules.rating import calculate_rating
+from modules.selection import B50Selector, CELL_FIELDS, chart_key, select_b50
+
+
+def make_records(seed, count):
+    """随机成绩: 乐曲、难度、达成率与定数的取值范围都很小，制造大量同谱面成绩与同Rating并列"""
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        records.append({
+            "song_id": rng.randint(1, 40),
+            "cover_id": "000001",
+            "difficulty": rng.randint(2, 4),
+            "is_dx": rng.randint(0, 1),
+            "song_title": f"r{i}",  # 唯一，用于区分成绩
+            "achievement": rng.choice([970000, 990000, 995000, 1000000, 1005000, 1010000]),
+            "dx_score": rng.randint(0, 3000),
+            "dx_total": 3000,
+            "base": rng.choice([12.0, 12.5, 13.0, 13.7, 14.0]),
+            "fc_indicator": 0,
+            "fs_indicator": 0,
+            "is_new": rng.random() < 0.3,
+        })
+    return records
+
+
+def reference_sections(records, old_size, new_size):
+    """
+    用完整排序得到期望结果: 同一谱面取最好的一条 (并列时取先出现的)，
+    再按 Rating、达成率、定数从高到低、谱面标识从小到大排序后取前K条。
+    """
+    def sort_key(record):
+        rating = calculate_rating(record["achievement"], record["base"])
+        return (-rating, -record["achievement"], -record["base"], chart_key(record))
+
+    sections = []
+    for is_new, size in ((False, old_size), (True, new_size)):
+        best = {}
+        for record in records:
+            if bool(record["is_new"]) != is_new:
+                continue
+            key = chart_key(record)
+            if key not in best or sort_key(record) < sort_key(best[key]):
+                best[key] = record
+        top = sorted(best.values(), key=sort_key)[:size]
+        sections.append([
+            dict({k: r[k] for k in CELL_FIELDS if k in r}, section_rank=rank)
+            for rank, r in enumerate(top, start=1)
+        ])
+    return tuple(sections)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_select_b50_matches_full_sort(seed):
+    records = make_records(seed, 400)
+    assert select_b50(records) == reference_sections(records, 35, 15)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_small_sections_match_full_sort(seed):
+    records = make_records(100 + seed, 200)
+    assert select_b50(records, 3, 2) == reference_sections(records, 3, 2)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_incremental_add_matches_full_sort(seed):
+    records = make_records(200 + seed, 300)
+    selector = B50Selector(10, 5)
+    selector.extend(records[:100])
+    for count, record in enumerate(records[100:], start=101):
+        selector.add(record)
+        if count % 25 == 0 or count == len(records):
+            assert selector.sections() == reference_sections(records[:count], 10, 5)
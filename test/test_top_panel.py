@@ -0,0 +1,85 @@
+import os
+import pytest
+from PIL import Image, ImageChops
+from modules import top_panel
+from modules.asset_cache import AssetCache
+from modules.top_panel import (
+    PANEL_BASE_CACHE_BYTES, PANEL_PLAN, PANEL_TEXT_DRAWERS, create_panel_image,
+    get_dx_rating_id_by_value, panel_font_path, paste_layer, slot_layer,
+)
+
+pytestmark = pytest.mark.skipif(not os.path.exists(panel_font_path()), reason="缺少面板字体")
+
+PLAYER = {
+    "frame_id": 250401, "nameplate_id": 400401, "icon_id": 400401, "shougou_type": 3,
+    "class_id": 25, "dani_id": 23, "name": "リズ", "shougou_text": "世紀末", "rating": 16145,
+}
+
+
+def reference_panel(frame_id, nameplate_id, shougou_type, class_id, dani_id, icon_id, name='',
+                    shougou_text='', version_text='Ver.DX1.55-E', rating=0, quality="full", scale=1):
+    """不使用底图/叠加图缓存: 按渲染计划的顺序逐层绘制"""
+    plan = PANEL_PLAN.scaled(scale)
+    context = {
+        "frame_id": frame_id, "nameplate_id": nameplate_id, "dx_rating_id": get_dx_rating_id_by_value(rating),
+        "class_id": class_id, "shougou_type": shougou_type, "dani_id": dani_id, "icon_id": icon_id,
+    }
+    texts = {"name": name, "shougou_text": shougou_text, "rating": rating, "version": version_text}
+    image = Image.new('RGBA', plan.canvas, (0, 0, 0, 0))
+    for slot_name in plan.order:
+        slot = plan.slot(slot_name)
+        if slot["kind"] == "image":
+            layer = slot_layer(slot_name, context, quality, plan.scale)
+            if layer is not None:
+                paste_layer(image, layer)
+        else:
+            PANEL_TEXT_DRAWERS[slot_name](image, slot, texts.get(slot_name))
+    return image
+
+
+def render(**params):
+    return create_panel_image(output_filename=None, **params)
+
+
+def assert_same_image(a, b):
+    assert a.size == b.size
+    assert ImageChops.difference(a, b).getbbox(alpha_only=False) is None
+
+
+@pytest.mark.parametrize("class_id", [0, 7, 13, 25])
+@pytest.mark.parametrize("shougou_type", [0, 4])
+@pytest.mark.parametrize("scale", [1, 0.5])
+def test_cached_layers_match_sequential_drawing(class_id, shougou_type, scale):
+    # 段位图标与名字背景是否重叠随段位变化，覆盖底图提前合成与留在原顺序两种情况
+    params = dict(PLAYER, class_id=class_id, shougou_type=shougou_type, rating=class_id * 600, scale=scale)
+    render(**params)  # 第一次填充缓存
+    assert_same_image(render(**params), reference_panel(**params))
+
+
+@pytest.mark.parametrize("quality", ["fast", "draft"])
+def test_quality_tiers_match_sequential_drawing(quality):
+    params = dict(PLAYER, quality=quality)
+    assert_same_image(render(**params), reference_panel(**params))
+
+
+def test_missing_frame_matches_sequential_drawing():
+    params = dict(PLAYER, frame_id=999999, version_text='')
+    assert_same_image(render(**params), reference_panel(**params))
+
+
+def test_non_base_fields_reuse_base(monkeypatch):
+    monkeypatch.setattr(top_panel, "panel_base_cache", AssetCache(max_bytes=PANEL_BASE_CACHE_BYTES))
+    first = render(**PLAYER)
+    misses = top_panel.panel_base_cache.stats()["misses"]
+
+    renamed = render(**dict(PLAYER, name="maimai"))
+    rerated = render(**dict(PLAYER, rating=12000))
+    # 底图与叠加图都命中缓存，结果仍随名字/Rating变化
+    assert top_panel.panel_base_cache.stats()["misses"] == misses
+    for image in (renamed, rerated):
+        assert ImageChops.difference(image, first).getbbox(alpha_only=False) is not None
+    assert_same_image(renamed, reference_panel(**dict(PLAYER, name="maimai")))
+    assert_same_image(rerated, reference_panel(**dict(PLAYER, rating=12000)))
+
+    # 复制出的底图上的绘制不会污染缓存
+    assert_same_image(render(**PLAYER), first)
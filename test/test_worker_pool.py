@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import signal
+import threading
+import subprocess
+import pytest
+from modules.worker_pool import FORK_SUPPORTED, WorkerCrashed, WorkerSupervisor
+
+pytestmark = pytest.mark.skipif(not FORK_SUPPORTED, reason="需要 fork")
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _crash():
+    os._exit(3)
+
+
+def test_many_submits_do_not_deadlock():
+    """大量 submit 远超唤醒管道容量时调度线程不能与 submit 互相等待"""
+    count = 40000
+    results = {}
+    executor = WorkerSupervisor(1).start()
+
+    def run():
+        futures = [executor.submit(abs, -i) for i in range(count)]
+        results["sum"] = sum(f.result() for f in futures)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=120)
+    assert not thread.is_alive(), "submit/调度线程死锁"
+    assert results["sum"] == sum(range(count))
+    executor.shutdown()
+
+
+def test_map_keeps_order_and_recycles_workers():
+    with WorkerSupervisor(2, max_jobs_per_worker=5) as executor:
+        assert list(executor.map(abs, [-i for i in range(50)])) == list(range(50))
+        health = executor.health()
+    assert health["completed"] == 50
+    assert health["recycled"] >= 8
+
+
+def test_crashed_worker_is_replaced():
+    with WorkerSupervisor(1) as executor:
+        with pytest.raises(WorkerCrashed):
+            executor.submit(_crash).result(timeout=30)
+        assert executor.submit(abs, -7).result(timeout=30) == 7
+        assert executor.health()["crashed"] == 1
+
+
+ORPHAN_SCRIPT = """
+import os, sys, signal
+sys.path.insert(0, {root!r})
+from modules.worker_pool import WorkerSupervisor
+executor = WorkerSupervisor(2).start()
+executor.submit(abs, -1).result()
+health = executor.health()
+print(health["zygote_pid"], *[w["pid"] for w in health["worker_details"]], flush=True)
+os.kill(os.getpid(), signal.SIGKILL)
+"""
+
+
+def _alive(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except OSError:
+        return False
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="需要 /proc")
+def test_processes_exit_when_parent_dies_without_shutdown():
+    proc = subprocess.run([sys.executable, "-c", ORPHAN_SCRIPT.format(root=PROJECT_ROOT)],
+                          stdout=subprocess.PIPE, timeout=60)
+    assert proc.returncode == -signal.SIGKILL
+    pids = [int(pid) for pid in proc.stdout.split()]
+    assert len(pids) == 3
+    deadline = time.time() + 20
+    while time.time() < deadline and any(_alive(pid) for pid in pids):
+        time.sleep(0.1)
+    alive = [pid for pid in pids if _alive(pid)]
+    for pid in alive:
+        os.kill(pid, signal.SIGKILL)
+    assert not alive, "父进程退出后孵化进程/工作进程仍在运行"